@@ -0,0 +1,89 @@
+import heapq
+
+import numpy as np
+
+from graph.csr_graph import CSRGraph
+from graph.graph_utils import haversine_one_to_many
+
+# La heurística se achica un poco para que el redondeo (pesos float32,
+# cuerda vs haversine en el KD-tree) no la vuelva inadmisible
+HEURISTIC_SLACK = 1e-6
+
+
+def great_circle_heuristic(lats, lons, target: int) -> np.ndarray:
+    """
+    Distancia en línea recta (km) de cada nodo al destino. Como los pesos de
+    las aristas son distancias haversine, es admisible y consistente.
+    """
+    h = haversine_one_to_many(lats[target], lons[target], lats, lons)
+    return h * (1.0 - HEURISTIC_SLACK)
+
+
+def astar(graph: CSRGraph, start, end, lats=None, lons=None, heuristic=None, bound=None):
+    """
+    A* sobre el grafo CSR.
+
+    graph: CSRGraph
+    start, end: IDs de nodo (string)
+    lats, lons: coordenadas alineadas con los ids enteros del grafo; con
+      ellas se usa la heurística de círculo máximo.
+    heuristic: array ya calculado (h[i] = cota inferior de i -> end). Sin
+      heurística ni coordenadas se comporta como Dijkstra con corte
+      temprano (sirve para comparar nodos visitados).
+    bound: otra cota inferior opcional, bound[i] (p.ej. LandmarkBound de
+      los landmarks ALT, que se calcula a pedido en vez de para todo el
+      grafo). Se usa el máximo entre las dos.
+
+    Devuelve (distancia, ruta, nodos_asentados).
+    """
+    s = graph.ids.index_of(start)
+    t = graph.ids.index_of(end)
+
+    if heuristic is None and lats is not None:
+        heuristic = great_circle_heuristic(lats, lons, t)
+    h = heuristic.tolist() if heuristic is not None else None
+
+    n = graph.num_nodes
+    distances = [float("inf")] * n
+    parent = [-1] * n
+    settled = bytearray(n)
+    distances[s] = 0.0
+
+    indptr, indices, weights = graph.indptr, graph.indices, graph.weights
+    h_start = h[s] if h else 0.0
+    if bound is not None:
+        h_start = max(h_start, bound[s])
+    pq = [(h_start, s)]
+    settled_count = 0
+
+    while pq:
+        _f, node = heapq.heappop(pq)
+        if settled[node]:
+            continue
+        settled[node] = 1
+        settled_count += 1
+
+        if node == t:
+            break
+
+        dist = distances[node]
+        start_e, end_e = indptr[node], indptr[node + 1]
+        for neighbor, weight in zip(indices[start_e:end_e].tolist(), weights[start_e:end_e].tolist()):
+            new_cost = dist + weight
+
+            if new_cost < distances[neighbor]:
+                distances[neighbor] = new_cost
+                parent[neighbor] = node
+                estimate = h[neighbor] if h else 0.0
+                if bound is not None:
+                    estimate = max(estimate, bound[neighbor])
+                heapq.heappush(pq, (new_cost + estimate, neighbor))
+
+    # Reconstruir ruta
+    route = []
+    curr = t
+    while curr >= 0:
+        route.append(graph.ids.id_of(curr))
+        curr = parent[curr]
+
+    return distances[t], list(reversed(route)), settled_count
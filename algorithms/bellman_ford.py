@@ -1,33 +1,116 @@
-def bellman_ford(graph, start, end):
-    # Convertir en lista de aristas
-    edges = []
-    for node in graph:
-        for neigh, w in graph[node]:
-            edges.append((node, neigh, w))
-
-    # Inicialización
-    dist = {node: float("inf") for node in graph}
-    dist[start] = 0
-    parent = {node: None for node in graph}
-
-    V = len(graph)
-
-    # Relaxar V-1 veces
-    for _ in range(V - 1):
-        changed = False
-        for u, v, w in edges:
-            if dist[u] + w < dist[v]:
-                dist[v] = dist[u] + w
-                parent[v] = u
-                changed = True
-        if not changed:
-            break
+from collections import deque
+
+import numpy as np
+
+from graph.csr_graph import CSRGraph
+
+BELLMAN_FORD_MODES = ("sweep", "spfa")
+
+
+def bellman_ford(graph, start, end, mode: str = "sweep"):
+    """
+    Bellman-Ford sobre los arrays del CSR.
+
+    graph: CSRGraph o dict { node: [(neighbor, weight), ...] }
+    mode:
+      - "sweep": en cada pasada se relajan todas las aristas a la vez con
+        NumPy (mínimo por nodo destino sobre el grafo invertido).
+      - "spfa": cola de nodos cuya distancia cambió; solo se relajan las
+        aristas que salen de ellos. ValueError si hay un ciclo negativo
+        alcanzable desde start (un nodo entra n veces a la cola).
+    Los arrays por arista (grafo invertido, origen de cada arista) quedan
+    guardados en el CSRGraph, así que no se rearman en cada consulta.
+
+    Devuelve (distancia, ruta) como dijkstra().
+    """
+    if mode not in BELLMAN_FORD_MODES:
+        raise ValueError(f"mode inválido: {mode}")
+    if not isinstance(graph, CSRGraph):
+        graph = CSRGraph.from_dict(graph)
+
+    s = graph.ids.index_of(start)
+    t = graph.ids.index_of(end)
+
+    if mode == "spfa":
+        dist, parent = _spfa(graph, s)
+    else:
+        dist, parent = _sweeps(graph, s)
 
     # Reconstrucción de ruta
     route = []
-    curr = end
-    while curr is not None:
-        route.append(curr)
+    curr = t
+    while curr >= 0:
+        route.append(graph.ids.id_of(curr))
         curr = parent[curr]
 
-    return dist[end], list(reversed(route))
+    return float(dist[t]), list(reversed(route))
+
+
+def _sweeps(graph: CSRGraph, s: int):
+    """Hasta V-1 pasadas vectorizadas; corta cuando una pasada no mejora nada."""
+    n = graph.num_nodes
+    reverse = graph.reverse()
+    # Aristas agrupadas por destino: reverse.indices = origen, in_dst = destino
+    in_src, in_weights, in_dst = reverse.indices, reverse.weights, reverse.edge_sources()
+    has_in = np.diff(reverse.indptr) > 0
+    starts = reverse.indptr[:-1][has_in]
+
+    dist = np.full(n, np.inf)
+    dist[s] = 0.0
+    parent = np.full(n, -1, dtype=np.int64)
+
+    for _ in range(max(n - 1, 0)):
+        candidate = dist[in_src] + in_weights
+        best = np.full(n, np.inf)
+        if len(starts):
+            best[has_in] = np.minimum.reduceat(candidate, starts)
+
+        improved = best < dist
+        if not improved.any():
+            break
+
+        dist = np.where(improved, best, dist)
+        # Padre: origen de la arista que dio el mínimo
+        hit = improved[in_dst] & (candidate == dist[in_dst])
+        parent[in_dst[hit]] = in_src[hit]
+
+    return dist, parent
+
+
+def _spfa(graph: CSRGraph, s: int):
+    """
+    SPFA: Bellman-Ford con cola de nodos modificados. Sin ciclos negativos
+    ningún nodo entra más de n - 1 veces a la cola; si uno llega a n, la
+    cola no terminaría nunca.
+    """
+    n = graph.num_nodes
+    dist = [float("inf")] * n
+    parent = [-1] * n
+    in_queue = bytearray(n)
+    enqueued = [0] * n
+    dist[s] = 0.0
+
+    indptr, indices, weights = graph.indptr, graph.indices, graph.weights
+    queue = deque([s])
+    in_queue[s] = 1
+    enqueued[s] = 1
+
+    while queue:
+        node = queue.popleft()
+        in_queue[node] = 0
+        d = dist[node]
+
+        start_e, end_e = indptr[node], indptr[node + 1]
+        for neighbor, weight in zip(indices[start_e:end_e].tolist(), weights[start_e:end_e].tolist()):
+            new_cost = d + weight
+            if new_cost < dist[neighbor]:
+                dist[neighbor] = new_cost
+                parent[neighbor] = node
+                if not in_queue[neighbor]:
+                    enqueued[neighbor] += 1
+                    if enqueued[neighbor] >= n:
+                        raise ValueError("Hay un ciclo negativo alcanzable desde el origen")
+                    in_queue[neighbor] = 1
+                    queue.append(neighbor)
+
+    return dist, parent
@@ -0,0 +1,85 @@
+import heapq
+
+from graph.csr_graph import CSRGraph
+
+
+def bidirectional_dijkstra(graph, start, end, return_settled: bool = False):
+    """
+    Dijkstra bidireccional: una búsqueda desde start sobre el grafo y otra
+    desde end sobre el grafo invertido (CSRGraph.reverse, que se arma una
+    vez por grafo). Se detiene cuando la suma de los mínimos de ambas
+    fronteras ya no puede mejorar el mejor camino encontrado.
+
+    graph: CSRGraph o dict { node: [(neighbor, weight), ...] }
+    Devuelve (distancia, ruta) como dijkstra(); con return_settled=True
+    agrega la cantidad de nodos asentados por ambas búsquedas.
+    """
+    if not isinstance(graph, CSRGraph):
+        graph = CSRGraph.from_dict(graph)
+
+    s = graph.ids.index_of(start)
+    t = graph.ids.index_of(end)
+    inf = float("inf")
+
+    if s == t:
+        return (0.0, [start], 1) if return_settled else (0.0, [start])
+
+    reverse = graph.reverse()
+    # Índice 0: búsqueda hacia adelante, 1: hacia atrás
+    adjacency = (
+        (graph.indptr, graph.indices, graph.weights),
+        (reverse.indptr, reverse.indices, reverse.weights),
+    )
+    distances = ({s: 0.0}, {t: 0.0})
+    parent = ({s: -1}, {t: -1})
+    settled = (set(), set())
+    heaps = ([(0.0, s)], [(0.0, t)])
+
+    best = inf
+    meet = -1
+
+    while heaps[0] and heaps[1]:
+        if heaps[0][0][0] + heaps[1][0][0] >= best:
+            break
+
+        # Se avanza por la frontera más chica
+        side = 0 if len(heaps[0]) <= len(heaps[1]) else 1
+        dist, node = heapq.heappop(heaps[side])
+        if node in settled[side]:
+            continue
+        settled[side].add(node)
+
+        own, other = distances[side], distances[1 - side]
+        indptr, indices, weights = adjacency[side]
+        start_e, end_e = indptr[node], indptr[node + 1]
+        for neighbor, weight in zip(indices[start_e:end_e].tolist(), weights[start_e:end_e].tolist()):
+            new_cost = dist + weight
+
+            if new_cost < own.get(neighbor, inf):
+                own[neighbor] = new_cost
+                parent[side][neighbor] = node
+                heapq.heappush(heaps[side], (new_cost, neighbor))
+
+            # ¿Las dos búsquedas se tocan en neighbor?
+            if neighbor in other and new_cost + other[neighbor] < best:
+                best = new_cost + other[neighbor]
+                meet = neighbor
+
+    # Reconstruir ruta: start -> meet (adelante) y meet -> end (atrás)
+    if meet < 0:
+        route = [end]
+    else:
+        route = []
+        curr = meet
+        while curr >= 0:
+            route.append(graph.ids.id_of(curr))
+            curr = parent[0][curr]
+        route.reverse()
+        curr = parent[1][meet]
+        while curr >= 0:
+            route.append(graph.ids.id_of(curr))
+            curr = parent[1][curr]
+
+    if return_settled:
+        return best, route, len(settled[0]) + len(settled[1])
+    return best, route
@@ -0,0 +1,79 @@
+import numpy as np
+from scipy.sparse import csgraph
+
+from graph.csr_graph import CSRGraph, IdInterner
+
+# Arrays que se guardan con el snapshot
+COMPONENT_ARRAYS = ("labels", "sizes")
+
+
+class ComponentIndex:
+    """
+    Componentes débilmente conexas del grafo (etiqueta por nodo + tamaño
+    de cada componente).
+
+    Si dos nodos están en componentes distintas no hay camino entre ellos
+    (en ningún sentido), así que las consultas de ruta pueden responder
+    "inalcanzable" sin explorar. Estar en la misma componente no garantiza
+    un camino dirigido: en ese caso se corre el algoritmo normalmente.
+    """
+
+    def __init__(self, ids: IdInterner, labels, sizes):
+        self.ids = ids
+        self.labels = labels
+        self.sizes = sizes
+
+    @property
+    def count(self) -> int:
+        return len(self.sizes)
+
+    @classmethod
+    def build(cls, graph: CSRGraph) -> "ComponentIndex":
+        _count, labels = csgraph.connected_components(graph.to_scipy(), directed=True, connection="weak")
+        labels = labels.astype(np.int32)
+        return cls(graph.ids, labels, np.bincount(labels).astype(np.int32))
+
+    # -----------------------------
+    # Persistencia (arrays planos para el snapshot)
+    # -----------------------------
+    def to_arrays(self) -> dict:
+        return {"labels": self.labels, "sizes": self.sizes}
+
+    @classmethod
+    def from_arrays(cls, ids: IdInterner, arrays: dict) -> "ComponentIndex":
+        return cls(ids, arrays["labels"], arrays["sizes"])
+
+    # -----------------------------
+    # Consultas
+    # -----------------------------
+    def pair_info(self, start: str, end: str) -> dict | None:
+        """
+        {"same", "start_size", "end_size", "count"} para el par, o None si
+        alguno de los dos no está en el grafo.
+        """
+        s = self.ids.get(start)
+        t = self.ids.get(end)
+        if s is None or t is None:
+            return None
+
+        label_s, label_t = int(self.labels[s]), int(self.labels[t])
+        return {
+            "same": label_s == label_t,
+            "start_size": int(self.sizes[label_s]),
+            "end_size": int(self.sizes[label_t]),
+            "count": self.count,
+        }
+
+    def reachable(self, start: str, end: str) -> bool:
+        """False solo si es seguro que no hay camino (componentes distintas)."""
+        info = self.pair_info(start, end)
+        return info is None or info["same"]
+
+    def summary(self, top: int = 20) -> dict:
+        """Cantidad de componentes y tamaños de las `top` más grandes."""
+        sizes = np.sort(np.asarray(self.sizes))[::-1]
+        return {
+            "count": self.count,
+            "largest": sizes[:top].tolist(),
+            "isolated_nodes": int((sizes == 1).sum()),
+        }
@@ -0,0 +1,347 @@
+import heapq
+import time
+
+import numpy as np
+
+from graph.csr_graph import CSRGraph, IdInterner
+
+# Nodos que puede asentar una búsqueda de testigos antes de rendirse (si no
+# encuentra testigo se agrega el atajo, que siempre es correcto)
+WITNESS_SETTLE_LIMIT = 200
+
+# Arrays que se guardan con el snapshot
+CH_ARRAYS = (
+    "rank",
+    "up_indptr", "up_indices", "up_weights", "up_middle",
+    "down_indptr", "down_indices", "down_weights", "down_middle",
+)
+
+
+class ContractionHierarchy:
+    """
+    Jerarquía de contracción sobre un CSRGraph dirigido.
+
+    Los nodos se contraen de a uno (orden por diferencia de aristas, con
+    actualización perezosa) y por cada camino u -> v -> w que no tenga un
+    testigo más corto se agrega el atajo u -> w (con v como nodo del medio).
+
+    Quedan dos grafos con los ids del grafo original:
+    - up: aristas u -> w con rank[w] > rank[u] (búsqueda desde el origen).
+    - down: aristas u -> w con rank[u] > rank[w], guardadas al revés (w -> u)
+      para la búsqueda desde el destino.
+    middle[e] es el nodo contraído que reemplaza el atajo e (-1 si la arista
+    es original); con eso la ruta se desempaqueta a la secuencia original.
+
+    La construcción es Python puro (una búsqueda de testigos por vecino
+    entrante de cada nodo, repetida por la actualización perezosa): ~5 s
+    para 1.400 nodos y ~10.000 atajos, y crece más que linealmente. Se
+    arma fuera de las requests (ver GRAPH_CH_PRECOMPUTE) y se persiste.
+    """
+
+    def __init__(self, rank, up: CSRGraph, up_middle, down: CSRGraph, down_middle):
+        self.rank = rank
+        self.up = up
+        self.up_middle = up_middle
+        self.down = down
+        self.down_middle = down_middle
+        # Adyacencias como arrays planos + indptr en lista (consultas sin
+        # el costo de indexar memmaps nodo por nodo); se arman al consultar
+        self._sides = None
+
+    @property
+    def ids(self) -> IdInterner:
+        return self.up.ids
+
+    @property
+    def num_shortcuts(self) -> int:
+        return int((self.up_middle >= 0).sum() + (self.down_middle >= 0).sum())
+
+    # -----------------------------
+    # Preprocesamiento
+    # -----------------------------
+    @classmethod
+    def build(cls, graph: CSRGraph) -> "ContractionHierarchy":
+        t0 = time.time()
+        n = graph.num_nodes
+
+        # Grafo restante (sin nodos contraídos): out[u][w] = (peso, medio)
+        out = [dict() for _ in range(n)]
+        inc = [dict() for _ in range(n)]
+        src = graph.edge_sources().tolist()
+        for u, w, weight in zip(src, graph.indices.tolist(), graph.weights.tolist()):
+            if u == w:
+                continue
+            if weight < out[u].get(w, (float("inf"),))[0]:
+                out[u][w] = (weight, -1)
+                inc[w][u] = (weight, -1)
+
+        contracted = bytearray(n)
+        deleted_neighbors = [0] * n
+
+        def shortcuts_for(v):
+            """Atajos (u, w, peso) necesarios para contraer v."""
+            needed = []
+            targets = out[v]
+            if not targets:
+                return needed
+            max_out = max(weight for weight, _m in targets.values())
+            for u, (w_uv, _m) in inc[v].items():
+                dist = _witness_search(out, u, v, w_uv + max_out, targets)
+                for w, (w_vw, _m2) in targets.items():
+                    if w == u:
+                        continue
+                    cost = w_uv + w_vw
+                    if dist.get(w, float("inf")) > cost:
+                        needed.append((u, w, cost))
+            return needed
+
+        def priority(v):
+            """(prioridad, atajos): diferencia de aristas + vecinos ya contraídos."""
+            shortcuts = shortcuts_for(v)
+            edge_diff = len(shortcuts) - len(out[v]) - len(inc[v])
+            return edge_diff + deleted_neighbors[v], shortcuts
+
+        pq = [(priority(v)[0], v) for v in range(n)]
+        heapq.heapify(pq)
+
+        rank = np.zeros(n, dtype=np.int32)
+        up_edges, down_edges = [], []
+        order = 0
+
+        while pq:
+            _p, v = heapq.heappop(pq)
+            if contracted[v]:
+                continue
+            # Actualización perezosa: si ya no es el mínimo, vuelve a la cola
+            current, shortcuts = priority(v)
+            if pq and current > pq[0][0]:
+                heapq.heappush(pq, (current, v))
+                continue
+
+            for u, w, cost in shortcuts:
+                if cost < out[u].get(w, (float("inf"),))[0]:
+                    out[u][w] = (cost, v)
+                    inc[w][u] = (cost, v)
+
+            # Las aristas que le quedan a v van a nodos de rango mayor
+            for w, (weight, middle) in out[v].items():
+                up_edges.append((v, w, weight, middle))
+                del inc[w][v]
+                deleted_neighbors[w] += 1
+            for u, (weight, middle) in inc[v].items():
+                down_edges.append((v, u, weight, middle))
+                del out[u][v]
+                deleted_neighbors[u] += 1
+            out[v], inc[v] = {}, {}
+
+            contracted[v] = 1
+            rank[v] = order
+            order += 1
+
+        ch = cls(rank, *_csr_with_middle(graph.ids, n, up_edges), *_csr_with_middle(graph.ids, n, down_edges))
+        print(
+            f"✔️ Jerarquía de contracción: {n} nodos, {ch.num_shortcuts} atajos "
+            f"en {(time.time() - t0) * 1000:.0f} ms"
+        )
+        return ch
+
+    # -----------------------------
+    # Persistencia (arrays planos para el snapshot)
+    # -----------------------------
+    def to_arrays(self) -> dict:
+        return {
+            "rank": self.rank,
+            "up_indptr": self.up.indptr,
+            "up_indices": self.up.indices,
+            "up_weights": self.up.weights,
+            "up_middle": self.up_middle,
+            "down_indptr": self.down.indptr,
+            "down_indices": self.down.indices,
+            "down_weights": self.down.weights,
+            "down_middle": self.down_middle,
+        }
+
+    @classmethod
+    def from_arrays(cls, ids: IdInterner, arrays: dict) -> "ContractionHierarchy":
+        return cls(
+            arrays["rank"],
+            CSRGraph(ids, arrays["up_indptr"], arrays["up_indices"], arrays["up_weights"]),
+            arrays["up_middle"],
+            CSRGraph(ids, arrays["down_indptr"], arrays["down_indices"], arrays["down_weights"]),
+            arrays["down_middle"],
+        )
+
+    # -----------------------------
+    # Consultas
+    # -----------------------------
+    def query(self, start, end, return_settled: bool = False):
+        """
+        Búsqueda bidireccional hacia arriba (up desde start, down desde end).
+        Devuelve (distancia, ruta) como dijkstra(); con return_settled=True
+        agrega la cantidad de nodos asentados.
+        """
+        s = self.ids.index_of(start)
+        t = self.ids.index_of(end)
+        inf = float("inf")
+
+        if self._sides is None:
+            self._sides = tuple(
+                (g.indptr.tolist(), np.asarray(g.indices), np.asarray(g.weights))
+                for g in (self.up, self.down)
+            )
+        sides = self._sides
+        distances = ({s: 0.0}, {t: 0.0})
+        # parent[side][v] = (nodo anterior, índice de la arista usada)
+        parent = ({s: (-1, -1)}, {t: (-1, -1)})
+        done = (set(), set())
+        heaps = ([(0.0, s)], [(0.0, t)])
+
+        best = 0.0 if s == t else inf
+        meet = s if s == t else -1
+
+        forward, backward = heaps
+        while True:
+            # Cada lado para cuando su mínimo ya no puede mejorar el mejor camino
+            if forward and forward[0][0] >= best:
+                forward.clear()
+            if backward and backward[0][0] >= best:
+                backward.clear()
+            if forward and (not backward or forward[0][0] <= backward[0][0]):
+                side = 0
+            elif backward:
+                side = 1
+            else:
+                break
+
+            dist, node = heapq.heappop(heaps[side])
+            if node in done[side]:
+                continue
+            done[side].add(node)
+
+            other = distances[1 - side]
+            if node in other and dist + other[node] < best:
+                best = dist + other[node]
+                meet = node
+
+            own = distances[side]
+
+            # Stall-on-demand: si se llega a node más barato bajando desde un
+            # vecino de rango mayor, node no está en un camino mínimo y no se expande
+            indptr, indices, weights = sides[1 - side]
+            start_e, end_e = indptr[node], indptr[node + 1]
+            if any(
+                own.get(neighbor, inf) + weight < dist
+                for neighbor, weight in zip(indices[start_e:end_e].tolist(), weights[start_e:end_e].tolist())
+            ):
+                continue
+
+            indptr, indices, weights = sides[side]
+            start_e, end_e = indptr[node], indptr[node + 1]
+            for e, (neighbor, weight) in enumerate(
+                zip(indices[start_e:end_e].tolist(), weights[start_e:end_e].tolist()), start_e
+            ):
+                new_cost = dist + weight
+                if new_cost < own.get(neighbor, inf):
+                    own[neighbor] = new_cost
+                    parent[side][neighbor] = (node, e)
+                    heapq.heappush(heaps[side], (new_cost, neighbor))
+
+        if meet < 0:
+            route = [end]
+        else:
+            route = [self.ids.id_of(i) for i in self._unpack_route(parent, meet)]
+
+        if return_settled:
+            return best, route, len(done[0]) + len(done[1])
+        return best, route
+
+    def _unpack_route(self, parent, meet: int) -> list[int]:
+        # Aristas del camino en la jerarquía: (origen, destino, medio)
+        edges = []
+        node = meet
+        while True:
+            prev, e = parent[0][node]
+            if prev < 0:
+                break
+            edges.append((prev, node, int(self.up_middle[e])))
+            node = prev
+        edges.reverse()
+
+        node = meet
+        while True:
+            nxt, e = parent[1][node]
+            if nxt < 0:
+                break
+            # En down la arista está guardada al revés (nxt -> node)
+            edges.append((node, nxt, int(self.down_middle[e])))
+            node = nxt
+
+        route = [edges[0][0]] if edges else [meet]
+        for u, w, middle in edges:
+            self._unpack_edge(u, w, middle, route)
+        return route
+
+    def _unpack_edge(self, u: int, w: int, middle: int, route: list[int]) -> None:
+        """Agrega a route los nodos originales de u -> w (sin u)."""
+        stack = [(u, w, middle)]
+        while stack:
+            u, w, middle = stack.pop()
+            if middle < 0:
+                route.append(w)
+                continue
+            # Primero u -> middle, después middle -> w (pila: al revés)
+            stack.append((middle, w, self._edge_middle(middle, w)))
+            stack.append((u, middle, self._edge_middle(u, middle)))
+
+    def _edge_middle(self, u: int, w: int) -> int:
+        # middle se contrajo antes que sus dos vecinos, así que ambas
+        # aristas cuelgan de él: u -> middle en down, middle -> w en up
+        if self.rank[u] < self.rank[w]:
+            graph, middles, a, b = self.up, self.up_middle, u, w
+        else:
+            graph, middles, a, b = self.down, self.down_middle, w, u
+        start_e, end_e = int(graph.indptr[a]), int(graph.indptr[a + 1])
+        e = start_e + int(np.flatnonzero(graph.indices[start_e:end_e] == b)[0])
+        return int(middles[e])
+
+
+def _witness_search(out, source: int, skip: int, limit: float, targets) -> dict:
+    """
+    Dijkstra local desde source sin pasar por skip, hasta `limit` km o hasta
+    asentar todos los targets. `out` solo tiene nodos sin contraer (al
+    contraer un nodo se borran sus aristas), así que no hace falta filtrar.
+    """
+    inf = float("inf")
+    dist = {source: 0.0}
+    done = set()
+    pq = [(0.0, source)]
+    remaining = len(targets) - (source in targets)
+    while pq and len(done) < WITNESS_SETTLE_LIMIT and remaining > 0:
+        d, node = heapq.heappop(pq)
+        if d > limit:
+            break
+        if node in done:
+            continue
+        done.add(node)
+        if node in targets and node != source:
+            remaining -= 1
+        for neighbor, edge in out[node].items():
+            new_cost = d + edge[0]
+            if new_cost < dist.get(neighbor, inf) and neighbor != skip:
+                dist[neighbor] = new_cost
+                heapq.heappush(pq, (new_cost, neighbor))
+    return dist
+
+
+def _csr_with_middle(ids: IdInterner, n: int, edges: list):
+    """CSRGraph + array de nodos medios alineado con sus aristas."""
+    if edges:
+        src, dst, weights, middle = (np.array(col) for col in zip(*edges))
+    else:
+        src = dst = middle = np.zeros(0, dtype=np.int64)
+        weights = np.zeros(0, dtype=np.float64)
+
+    # from_arrays ordena por origen de forma estable: mismo orden para middle
+    order = np.argsort(src, kind="stable")
+    graph = CSRGraph.from_arrays(ids, src[order], dst[order], weights[order])
+    return graph, middle[order].astype(np.int32)
@@ -1,11 +1,17 @@
 import heapq
 
+from scipy.sparse import csgraph
+
+from graph.csr_graph import CSRGraph
+
 def dijkstra(graph, start, end):
     """
-    graph: dict { node: [(neighbor, weight), ...] }
+    graph: dict { node: [(neighbor, weight), ...] } o CSRGraph
     start: string ID
     end: string ID
     """
+    if isinstance(graph, CSRGraph):
+        return _dijkstra_csr(graph, start, end)
 
     pq = []
     heapq.heappush(pq, (0, start))
@@ -38,3 +44,25 @@ def dijkstra(graph, start, end):
         curr = parent[curr]
 
     return distances[end], list(reversed(route))
+
+
+def _dijkstra_csr(graph: CSRGraph, start, end):
+    """
+    Misma búsqueda, pero sobre los arrays CSR con ids enteros:
+    scipy.sparse.csgraph recorre indptr/indices/weights en C.
+    """
+    s = graph.ids.index_of(start)
+    t = graph.ids.index_of(end)
+
+    distances, predecessors = csgraph.dijkstra(
+        graph.to_scipy(), directed=True, indices=s, return_predecessors=True
+    )
+
+    # Reconstruir ruta
+    route = []
+    curr = t
+    while curr >= 0:
+        route.append(graph.ids.id_of(curr))
+        curr = predecessors[curr]
+
+    return float(distances[t]), list(reversed(route))
@@ -1,40 +1,154 @@
+import time
+
 import numpy as np
 
-def floyd_warshall(graph):
-    nodes = list(graph.keys())
-    index = {nodes[i]: i for i in range(len(nodes))}
-    n = len(nodes)
+from graph.csr_graph import CSRGraph, IdInterner
 
-    dist = np.full((n, n), float("inf"))
-    next_hop = [[None] * n for _ in range(n)]
+# Arrays que se guardan con el snapshot
+FW_ARRAYS = ("nodes", "dist", "next_hop")
 
-    # Inicialización
-    for u in nodes:
-        dist[index[u]][index[u]] = 0
-        for v, w in graph[u]:
-            dist[index[u]][index[v]] = w
-            next_hop[index[u]][index[v]] = v
 
-    # DP
+def _floyd_warshall_dense(dist: np.ndarray) -> np.ndarray:
+    """
+    Floyd-Warshall in-place sobre la matriz densa `dist` (inf = sin arista).
+    Por cada k se hace una sola pasada vectorizada (broadcast fila k +
+    columna k). Devuelve next_hop (int32, -1 = sin camino).
+    """
+    n = len(dist)
+    next_hop = np.where(np.isfinite(dist), np.arange(n, dtype=np.int32)[None, :], -1).astype(np.int32)
+
+    via = np.empty_like(dist)
+    better = np.empty(dist.shape, dtype=bool)
     for k in range(n):
-        for i in range(n):
-            for j in range(n):
-                if dist[i][k] + dist[k][j] < dist[i][j]:
-                    dist[i][j] = dist[i][k] + dist[k][j]
-                    next_hop[i][j] = next_hop[i][k]
+        rows = np.flatnonzero(np.isfinite(dist[:, k]))
+        cols = np.flatnonzero(np.isfinite(dist[k]))
+
+        # Pocos caminos pasan por k (subgrafos desconectados, primeras
+        # iteraciones): basta con el bloque filas × columnas alcanzables
+        if 2 * len(rows) < n or 2 * len(cols) < n:
+            block_via = dist[rows, k, None] + dist[k, cols]
+            r, c = np.nonzero(block_via < dist[np.ix_(rows, cols)])
+            dist[rows[r], cols[c]] = block_via[r, c]
+            next_hop[rows[r], cols[c]] = next_hop[rows[r], k]
+            continue
+
+        np.add(dist[:, k, None], dist[k], out=via)
+        np.less(via, dist, out=better)
+        np.copyto(dist, via, where=better)
+        np.copyto(next_hop, next_hop[:, k, None], where=better)
+
+    return next_hop
+
+
+def _dense_matrix(graph: CSRGraph, nodes: np.ndarray) -> np.ndarray:
+    """Matriz de pesos float32 del subgrafo inducido por `nodes` (posiciones)."""
+    n = len(nodes)
+    local = np.full(graph.num_nodes, -1, dtype=np.int64)
+    local[nodes] = np.arange(n)
+
+    src = local[graph.edge_sources()]
+    dst = local[graph.indices]
+    keep = (src >= 0) & (dst >= 0)
+
+    dist = np.full((n, n), np.inf, dtype=np.float32)
+    # Aristas repetidas: se queda la más corta
+    np.minimum.at(dist, (src[keep], dst[keep]), graph.weights[keep].astype(np.float32))
+    np.fill_diagonal(dist, 0.0)
+    return dist
+
+
+class AllPairsShortestPaths:
+    """
+    Resultado de Floyd-Warshall sobre el subgrafo inducido por `nodes`
+    (posiciones en el grafo; los caminos solo usan nodos del subconjunto).
+
+    dist es n×n float32 y next_hop n×n int32 con índices locales (-1 sin
+    camino). Cargado del snapshot, ambos son memmaps de solo lectura.
+    """
+
+    def __init__(self, ids: IdInterner, nodes, dist, next_hop):
+        self.ids = ids
+        self.nodes = nodes
+        self.dist = dist
+        self.next_hop = next_hop
+        self._local = {int(pos): i for i, pos in enumerate(np.asarray(nodes).tolist())}
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.nodes.nbytes + self.dist.nbytes + self.next_hop.nbytes)
+
+    @classmethod
+    def build(cls, graph: CSRGraph, nodes=None) -> "AllPairsShortestPaths":
+        t0 = time.time()
+        if nodes is None:
+            nodes = np.arange(graph.num_nodes, dtype=np.int32)
+        nodes = np.asarray(nodes, dtype=np.int32)
+
+        dist = _dense_matrix(graph, nodes)
+        next_hop = _floyd_warshall_dense(dist)
+
+        print(f"✔️ Floyd-Warshall de {len(nodes)} nodos en {(time.time() - t0) * 1000:.0f} ms")
+        return cls(graph.ids, nodes, dist, next_hop)
+
+    # -----------------------------
+    # Persistencia (arrays planos para el snapshot)
+    # -----------------------------
+    def to_arrays(self) -> dict:
+        return {name: getattr(self, name) for name in FW_ARRAYS}
+
+    @classmethod
+    def from_arrays(cls, ids: IdInterner, arrays: dict) -> "AllPairsShortestPaths":
+        return cls(ids, *(arrays[name] for name in FW_ARRAYS))
+
+    # -----------------------------
+    # Consultas
+    # -----------------------------
+    def __contains__(self, node_id) -> bool:
+        return self.ids.get(node_id, -1) in self._local
+
+    def distance(self, start: str, end: str) -> float:
+        """Distancia start -> end dentro del subconjunto (inf si no hay camino)."""
+        return float(self.dist[self._local[self.ids.index_of(start)], self._local[self.ids.index_of(end)]])
+
+    def path(self, start: str, end: str) -> list[str] | None:
+        """Ruta start -> end (None si no hay camino), igual que get_fw_path."""
+        i = self._local[self.ids.index_of(start)]
+        j = self._local[self.ids.index_of(end)]
+        if self.next_hop[i, j] < 0:
+            return None
+
+        route = [i]
+        while i != j:
+            i = int(self.next_hop[i, j])
+            route.append(i)
+        return [self.ids.id_of(int(self.nodes[p])) for p in route]
+
+
+def floyd_warshall(graph, nodes=None):
+    """
+    graph: CSRGraph o dict { node: [(neighbor, weight), ...] }
+    nodes: ids a incluir (subgrafo inducido); None = todo el grafo.
+    Devuelve (lista de ids, matriz de distancias, next_hop con índices de
+    esa lista).
+    """
+    if not isinstance(graph, CSRGraph):
+        graph = CSRGraph.from_dict(graph)
+    positions = None if nodes is None else [graph.ids.index_of(node) for node in nodes]
 
-    return nodes, dist, next_hop
+    result = AllPairsShortestPaths.build(graph, positions)
+    node_ids = [graph.ids.id_of(int(p)) for p in result.nodes.tolist()]
+    return node_ids, result.dist, result.next_hop
 
 
 def get_fw_path(start, end, nodes, next_hop):
     idx = {nodes[i]: i for i in range(len(nodes))}
     i, j = idx[start], idx[end]
 
-    if next_hop[i][j] is None:
+    if next_hop[i][j] < 0:
         return None
 
     path = [start]
-    while start != end:
-        start = next_hop[idx[start]][j]
-        path.append(start)
+    while i != j:
+        i = int(next_hop[i][j])
+        path.append(nodes[i])
     return path
@@ -1,5 +1,8 @@
 from typing import List, Dict, Any
-from utils.geo_utils import distancia_km
+
+import numpy as np
+
+from graph.graph_utils import haversine_blocks
 
 
 def _severity_rank(sev: str) -> int:
@@ -45,17 +48,16 @@ def greedy_assign(
         }
     """
 
-    # Copia de capacidades (por id)
-    capacities: Dict[str, int] = {}
-    for h in hospitals:
-        hid = h["id"]
+    # Copia de capacidades (alineadas con el orden de `hospitals`)
+    capacities = np.zeros(len(hospitals), dtype=np.int64)
+    for j, h in enumerate(hospitals):
         cap = h.get("capacity", None)
 
         # Si no hay capacidad definida o es <= 0, asumimos "muy grande"
         if cap is None or int(cap) <= 0:
             cap = 10**9
 
-        capacities[hid] = int(cap)
+        capacities[j] = int(cap)
 
     # Pacientes ordenados por severidad
     patients_sorted = sorted(
@@ -65,41 +67,40 @@ def greedy_assign(
 
     results: List[Dict[str, Any]] = []
 
-    for p in patients_sorted:
-        pid = p["id"]
-        plat, plon = float(p["lat"]), float(p["lon"])
-
-        best_h = None
-        best_d = None
-
-        for h in hospitals:
-            hid = h["id"]
-            if capacities.get(hid, 0) <= 0:
-                continue
-
-            d = distancia_km(
-                plat,
-                plon,
-                float(h["lat"]),
-                float(h["lon"]),
-            )
-
-            if best_d is None or d < best_d:
-                best_d = d
-                best_h = hid
-
-        if best_h is None:
-            results.append({
-                "patient": pid,
-                "hospital": None,
-                "distance": None,
-            })
-        else:
-            capacities[best_h] = capacities.get(best_h, 0) - 1
-            results.append({
-                "patient": pid,
-                "hospital": best_h,
-                "distance": best_d,
-            })
+    if not hospitals:
+        return [
+            {"patient": p["id"], "hospital": None, "distance": None}
+            for p in patients_sorted
+        ]
+
+    # Distancias paciente -> hospital por bloques de pacientes (vectorizado)
+    blocks = haversine_blocks(
+        [float(p["lat"]) for p in patients_sorted],
+        [float(p["lon"]) for p in patients_sorted],
+        [float(h["lat"]) for h in hospitals],
+        [float(h["lon"]) for h in hospitals],
+    )
+
+    for start, end, block in blocks:
+        for row, p in zip(block, patients_sorted[start:end]):
+            pid = p["id"]
+
+            # Solo hospitales con capacidad disponible
+            dists = np.where(capacities > 0, row, np.inf)
+            j = int(np.argmin(dists))
+
+            if not np.isfinite(dists[j]):
+                results.append({
+                    "patient": pid,
+                    "hospital": None,
+                    "distance": None,
+                })
+            else:
+                capacities[j] -= 1
+                results.append({
+                    "patient": pid,
+                    "hospital": hospitals[j]["id"],
+                    "distance": float(dists[j]),
+                })
 
     return results
@@ -0,0 +1,163 @@
+import time
+
+import numpy as np
+from scipy.sparse import csgraph
+
+from algorithms.dijkstra import dijkstra
+from graph.csr_graph import CSRGraph, IdInterner
+
+# Hospitales por llamada a csgraph.dijkstra (acota la matriz float64 temporal)
+BUILD_CHUNK = 32
+
+# Tolerancia relativa entre el largo de la ruta reconstruida y la distancia
+# de la tabla (float32); si se pasa, se recalcula con Dijkstra
+ROUTE_TOLERANCE = 1e-5
+
+# Arrays que se guardan con el snapshot
+TABLE_ARRAYS = ("hospitals", "dist", "nearest", "nearest_dist")
+
+
+class HospitalDistanceTable:
+    """
+    Distancia por la red de cada nodo a cada hospital.
+
+    - hospitals: posiciones (ids enteros) de los H hospitales.
+    - dist: matriz H×n float32, dist[h, v] = camino mínimo v -> hospital h
+      (inf si no hay camino).
+    - nearest / nearest_dist: índice (en hospitals) del hospital más cercano
+      de cada nodo y su distancia (-1 / inf si no llega a ninguno).
+
+    Se calcula con un Dijkstra multi-origen desde los hospitales sobre el
+    grafo invertido, así que las consultas paciente -> hospital son lecturas
+    de la matriz.
+    """
+
+    def __init__(self, ids: IdInterner, hospitals, dist, nearest, nearest_dist):
+        self.ids = ids
+        self.hospitals = hospitals
+        self.dist = dist
+        self.nearest = nearest
+        self.nearest_dist = nearest_dist
+        self._row_of = {int(pos): row for row, pos in enumerate(np.asarray(hospitals).tolist())}
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.dist.nbytes + self.nearest.nbytes + self.nearest_dist.nbytes + self.hospitals.nbytes)
+
+    @classmethod
+    def build(cls, graph: CSRGraph, hospital_positions) -> "HospitalDistanceTable":
+        t0 = time.time()
+        hospitals = np.asarray(hospital_positions, dtype=np.int32)
+        n = graph.num_nodes
+
+        reverse = graph.reverse().to_scipy()
+        dist = np.empty((len(hospitals), n), dtype=np.float32)
+        for start in range(0, len(hospitals), BUILD_CHUNK):
+            chunk = hospitals[start:start + BUILD_CHUNK]
+            dist[start:start + len(chunk)] = csgraph.dijkstra(reverse, directed=True, indices=chunk)
+
+        if len(hospitals):
+            nearest = dist.argmin(axis=0).astype(np.int32)
+            nearest_dist = dist[nearest, np.arange(n)]
+            nearest[np.isinf(nearest_dist)] = -1
+        else:
+            nearest = np.full(n, -1, dtype=np.int32)
+            nearest_dist = np.full(n, np.inf, dtype=np.float32)
+
+        print(
+            f"✔️ Tabla de distancias a hospitales: {len(hospitals)}×{n} "
+            f"en {(time.time() - t0) * 1000:.0f} ms"
+        )
+        return cls(graph.ids, hospitals, dist, nearest, nearest_dist)
+
+    # -----------------------------
+    # Persistencia (arrays planos para el snapshot)
+    # -----------------------------
+    def to_arrays(self) -> dict:
+        return {name: getattr(self, name) for name in TABLE_ARRAYS}
+
+    @classmethod
+    def from_arrays(cls, ids: IdInterner, arrays: dict) -> "HospitalDistanceTable":
+        return cls(ids, *(arrays[name] for name in TABLE_ARRAYS))
+
+    # -----------------------------
+    # Consultas
+    # -----------------------------
+    def _row(self, hospital_id: str) -> int:
+        row = self._row_of.get(self.ids.get(hospital_id, -1))
+        if row is None:
+            raise KeyError(f"{hospital_id} no es un hospital del grafo")
+        return row
+
+    def distance(self, node_id: str, hospital_id: str) -> float:
+        """Distancia por la red node -> hospital (inf si no hay camino)."""
+        return float(self.dist[self._row(hospital_id), self.ids.index_of(node_id)])
+
+    def nearest_hospital(self, node_id: str):
+        """(id del hospital más cercano o None, distancia)."""
+        pos = self.ids.index_of(node_id)
+        row = int(self.nearest[pos])
+        if row < 0:
+            return None, float("inf")
+        return self.ids.id_of(int(self.hospitals[row])), float(self.nearest_dist[pos])
+
+    def distances_from(self, node_id: str) -> dict:
+        """{hospital_id: distancia} de node a cada hospital."""
+        column = self.dist[:, self.ids.index_of(node_id)].tolist()
+        return {self.ids.id_of(int(h)): d for h, d in zip(self.hospitals.tolist(), column)}
+
+    def route(self, graph: CSRGraph, node_id: str, hospital_id: str):
+        """
+        (distancia, ruta) node -> hospital sin volver a correr Dijkstra: en
+        cada paso se sigue la arista que minimiza peso + distancia restante.
+        El redondeo float32 de la tabla (o empates en aristas de peso 0)
+        puede desviar ese descenso; si vuelve a un nodo, no llega al hospital
+        o la ruta sale más larga que la distancia de la tabla, se recalcula
+        con un Dijkstra entre los dos nodos.
+        """
+        row = self._row(hospital_id)
+        remaining = self.dist[row]
+        pos = self.ids.index_of(node_id)
+        target = int(self.hospitals[row])
+        total = float(remaining[pos])
+        if np.isinf(total):
+            return float("inf"), [hospital_id]
+
+        route = [pos]
+        visited = {pos}
+        length = 0.0
+        while pos != target:
+            neighbors, weights = graph.neighbors(pos)
+            if not len(neighbors):
+                break
+            step = np.argmin(weights + remaining[neighbors])
+            length += float(weights[step])
+            pos = int(neighbors[step])
+            if pos in visited:
+                break
+            visited.add(pos)
+            route.append(pos)
+
+        if route[-1] != target or length > total * (1.0 + ROUTE_TOLERANCE):
+            print(f"⚠️ Ruta de tabla inconsistente {node_id} -> {hospital_id}; se recalcula con Dijkstra")
+            return dijkstra(graph, node_id, hospital_id)
+
+        return total, [self.ids.id_of(p) for p in route]
+
+    def catchment(self):
+        """
+        Área de influencia por la red: para cada hospital (en el orden de
+        hospitals), posiciones de los nodos no-hospital cuyo hospital más
+        cercano es ese. Devuelve (lista de arrays, nodos sin hospital alcanzable).
+        """
+        is_hospital = np.zeros(len(self.nearest), dtype=bool)
+        is_hospital[self.hospitals] = True
+        nodes = np.flatnonzero(~is_hospital)
+
+        rows = self.nearest[nodes]
+        order = np.argsort(rows, kind="stable")
+        nodes, rows = nodes[order], rows[order]
+        # Fila -1 (sin hospital) primero, después 0..H-1
+        bounds = np.searchsorted(rows, np.arange(-1, len(self.hospitals) + 1))
+        areas = [nodes[bounds[r + 1]:bounds[r + 2]] for r in range(len(self.hospitals))]
+        return areas, nodes[bounds[0]:bounds[1]]
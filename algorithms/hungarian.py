@@ -1,6 +1,5 @@
-import numpy as np
 from scipy.optimize import linear_sum_assignment
-from graph.graph_utils import haversine
+from graph.graph_utils import haversine_matrix
 from typing import List, Dict, Any
 
 
@@ -8,14 +7,12 @@ def hungarian(
     patients: List[Dict[str, Any]],
     hospitals: List[Dict[str, Any]],
 ) -> List[Dict[str, Any]]:
-    P = len(patients)
-    H = len(hospitals)
-
-    cost = np.zeros((P, H))
-
-    for i, p in enumerate(patients):
-        for j, h in enumerate(hospitals):
-            cost[i][j] = haversine(p["lat"], p["lon"], h["lat"], h["lon"])
+    cost = haversine_matrix(
+        [float(p["lat"]) for p in patients],
+        [float(p["lon"]) for p in patients],
+        [float(h["lat"]) for h in hospitals],
+        [float(h["lon"]) for h in hospitals],
+    )
 
     row_ind, col_ind = linear_sum_assignment(cost)
 
@@ -1,4 +1,12 @@
+import numpy as np
+
+from graph.csr_graph import CSRGraph
+
+
 def kruskal(graph):
+    if isinstance(graph, CSRGraph):
+        return _kruskal_csr(graph)
+
     edges = []
     for u in graph:
         for v, w in graph[u]:
@@ -38,3 +46,41 @@ def kruskal(graph):
             cost += w
 
     return mst, cost
+
+
+def _kruskal_csr(graph: CSRGraph):
+    """Kruskal sobre los arrays CSR: orden de aristas con NumPy, union-find con enteros."""
+    n = graph.num_nodes
+    parent = list(range(n))
+    rank = [0] * n
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    order = np.argsort(graph.weights, kind="stable")
+    src = graph.edge_sources()[order].tolist()
+    dst = graph.indices[order].tolist()
+    weights = graph.weights[order].tolist()
+    id_of = graph.ids.ids
+
+    mst = []
+    cost = 0
+
+    for u, v, w in zip(src, dst, weights):
+        ru, rv = find(u), find(v)
+        if ru == rv:
+            continue
+        if rank[ru] < rank[rv]:
+            ru, rv = rv, ru
+        parent[rv] = ru
+        if rank[ru] == rank[rv]:
+            rank[ru] += 1
+        mst.append((id_of[u], id_of[v], w))
+        cost += w
+        if len(mst) == n - 1:
+            break
+
+    return mst, cost
@@ -0,0 +1,196 @@
+import time
+
+import numpy as np
+from scipy.sparse import csgraph
+
+from graph.csr_graph import CSRGraph, IdInterner
+
+# Las cotas se achican un poco: las distancias se guardan en float32 y la
+# resta de dos valores grandes puede pasarse por el redondeo
+BOUND_SLACK = 1e-6
+
+# Nodos por bloque al evaluar la cota para A* (ver LandmarkBound)
+BOUND_BLOCK = 128
+
+# Arrays que se guardan con el snapshot
+LANDMARK_ARRAYS = ("landmarks", "from_landmark", "to_landmark")
+
+
+class LandmarkIndex:
+    """
+    Índice ALT (A*, landmarks, desigualdad triangular).
+
+    - landmarks: posiciones de los L landmarks, elegidos por punto más
+      lejano (cada uno maximiza la distancia mínima, sin dirección, a los
+      ya elegidos).
+    - from_landmark[l, v] = d(landmark l -> v), to_landmark[l, v] =
+      d(v -> landmark l), ambos L×n float32 (inf si no hay camino).
+
+    Para cualquier par (s, t):
+      d(s, t) >= max_l max(d(l, t) - d(l, s), d(s, l) - d(t, l))
+      d(s, t) <= min_l d(s, l) + d(l, t)
+    así que una estimación cuesta O(L) y la cota inferior sirve como
+    heurística admisible para A*.
+    """
+
+    def __init__(self, ids: IdInterner, landmarks, from_landmark, to_landmark):
+        self.ids = ids
+        self.landmarks = landmarks
+        self.from_landmark = from_landmark
+        self.to_landmark = to_landmark
+        # Vistas ndarray planas (sin el overhead de np.memmap al indexar)
+        self._from = np.asarray(from_landmark)
+        self._to = np.asarray(to_landmark)
+
+        finite = [a[np.isfinite(a)] for a in (from_landmark, to_landmark)]
+        scale = max((float(a.max()) for a in finite if a.size), default=0.0)
+        self._slack = scale * BOUND_SLACK
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.landmarks.nbytes + self.from_landmark.nbytes + self.to_landmark.nbytes)
+
+    @classmethod
+    def build(cls, graph: CSRGraph, count: int) -> "LandmarkIndex":
+        t0 = time.time()
+        n = graph.num_nodes
+        count = min(count, n)
+
+        forward = graph.to_scipy()
+        backward = graph.reverse().to_scipy()
+
+        landmarks = np.zeros(count, dtype=np.int32)
+        from_landmark = np.empty((count, n), dtype=np.float32)
+        to_landmark = np.empty((count, n), dtype=np.float32)
+
+        # La selección usa distancias sin dirección: en el KNN dirigido muchos
+        # pares no tienen camino en algún sentido y "lo más lejano" sería
+        # siempre un nodo inalcanzable. Solo cuenta como infinitamente lejos
+        # un nodo de otra componente (débil), que así recibe su landmark.
+        nearest = np.full(n, np.inf)
+        if count:
+            # Primer landmark: el nodo más lejano de un nodo cualquiera
+            seed = csgraph.dijkstra(forward, directed=False, indices=0)
+            seed[np.isinf(seed)] = -1.0
+            candidate = int(seed.argmax())
+
+        for i in range(count):
+            landmarks[i] = candidate
+            from_landmark[i] = csgraph.dijkstra(forward, directed=True, indices=candidate)
+            to_landmark[i] = csgraph.dijkstra(backward, directed=True, indices=candidate)
+
+            nearest = np.minimum(nearest, csgraph.dijkstra(forward, directed=False, indices=candidate))
+            nearest[landmarks[:i + 1]] = -1.0
+            candidate = int(nearest.argmax())
+
+        print(f"✔️ Landmarks ALT: {count} sobre {n} nodos en {(time.time() - t0) * 1000:.0f} ms")
+        return cls(graph.ids, landmarks, from_landmark, to_landmark)
+
+    # -----------------------------
+    # Persistencia (arrays planos para el snapshot)
+    # -----------------------------
+    def to_arrays(self) -> dict:
+        return {name: getattr(self, name) for name in LANDMARK_ARRAYS}
+
+    @classmethod
+    def from_arrays(cls, ids: IdInterner, arrays: dict) -> "LandmarkIndex":
+        return cls(ids, *(arrays[name] for name in LANDMARK_ARRAYS))
+
+    # -----------------------------
+    # Cotas
+    # -----------------------------
+    def _columns(self, s, t):
+        """Columnas (L×k, float64) de s y t en ambas tablas; s y t escalares o arrays."""
+        s, t = np.broadcast_arrays(np.asarray(s), np.asarray(t))
+        f, b = self.from_landmark, self.to_landmark
+        return (
+            f[:, s].astype(np.float64), f[:, t].astype(np.float64),
+            b[:, s].astype(np.float64), b[:, t].astype(np.float64),
+        )
+
+    def _lower_bound(self, from_s, from_t, to_s, to_t) -> np.ndarray:
+        """
+        Cota inferior de d(s, t) a partir de las columnas de s y t (L×k o
+        L×1, se combinan por broadcasting); inf = seguro que no hay camino.
+        Sin landmarks la cota es 0.
+        """
+        shape = np.broadcast_shapes(from_s.shape, from_t.shape)[1:]
+        if not len(self.landmarks):
+            return np.zeros(shape)
+        with np.errstate(invalid="ignore"):
+            bounds = np.fmax(from_t - from_s, to_s - to_t)
+        # inf - inf (ambos inalcanzables desde/hacia el landmark) no aporta nada
+        bounds = np.where(np.isnan(bounds), -np.inf, bounds).max(axis=0)
+        return np.maximum(bounds - self._slack, 0.0)
+
+    def _lower(self, s, t) -> np.ndarray:
+        return self._lower_bound(*self._columns(s, t))
+
+    def _upper(self, s, t) -> np.ndarray:
+        """Cota superior de d(s, t): pasar por el mejor landmark (inf sin landmarks)."""
+        _from_s, from_t, to_s, _to_t = self._columns(s, t)
+        if not len(self.landmarks):
+            return np.full(to_s.shape[1:], np.inf)
+        return (to_s + from_t).min(axis=0) + self._slack
+
+    def estimate(self, start: str, end: str) -> tuple[float, float]:
+        """(cota inferior, cota superior) de d(start, end) en O(L)."""
+        s = self.ids.index_of(start)
+        t = self.ids.index_of(end)
+        if s == t:
+            return 0.0, 0.0
+        return float(self._lower(s, t)), float(self._upper(s, t))
+
+    def estimate_many(self, pairs: list[tuple[str, str]]):
+        """Cotas (lower, upper) para muchos pares a la vez (arrays alineados con pairs)."""
+        s = np.array([self.ids.index_of(a) for a, _b in pairs], dtype=np.int64)
+        t = np.array([self.ids.index_of(b) for _a, b in pairs], dtype=np.int64)
+        same = s == t
+        lower, upper = self._lower(s, t), self._upper(s, t)
+        lower[same] = 0.0
+        upper[same] = 0.0
+        return lower, upper
+
+    def heuristic(self, target: int) -> "LandmarkBound":
+        """Cota inferior hasta target para astar(bound=...), evaluada a pedido."""
+        return LandmarkBound(self, target)
+
+
+class LandmarkBound:
+    """
+    bound[v] = cota inferior de d(v, target) según los landmarks.
+
+    No se calcula para todo el grafo: la primera vez que A* toca un nodo se
+    evalúa el bloque de BOUND_BLOCK posiciones que lo contiene (rebanadas
+    contiguas de las tablas, float32; BOUND_SLACK ya cubre el redondeo).
+    El costo queda acotado por los nodos que visita la búsqueda y por el
+    cálculo completo, O(L·n), si la búsqueda recorre todo el grafo.
+    """
+
+    def __init__(self, index: LandmarkIndex, target: int):
+        self._from = index._from
+        self._to = index._to
+        self._from_t = self._from[:, [target]]
+        self._to_t = self._to[:, [target]]
+        self._slack = np.float32(index._slack)
+        self._blocks: dict[int, list] = {}
+
+    def _block(self, block: int) -> list:
+        lo = block * BOUND_BLOCK
+        hi = lo + BOUND_BLOCK
+        if not len(self._from):
+            return [0.0] * BOUND_BLOCK
+        with np.errstate(invalid="ignore"):
+            bounds = np.fmax(self._from_t - self._from[:, lo:hi], self._to[:, lo:hi] - self._to_t)
+        # fmax.reduce ignora los nan (inf - inf); si son todos nan queda 0
+        bounds = np.fmax(np.fmax.reduce(bounds, axis=0) - self._slack, np.float32(0))
+        values = bounds.tolist()
+        self._blocks[block] = values
+        return values
+
+    def __getitem__(self, node: int) -> float:
+        block = node // BOUND_BLOCK
+        values = self._blocks.get(block)
+        if values is None:
+            values = self._block(block)
+        return values[node - block * BOUND_BLOCK]
@@ -1,7 +1,7 @@
 from typing import List, Dict, Any
 import networkx as nx
 
-from utils.geo_utils import distancia_km
+from graph.graph_utils import haversine_matrix
 
 
 def min_cost_flow(
@@ -51,14 +51,21 @@ def min_cost_flow(
         G.add_node(pid, demand=0)
         G.add_edge(S, pid, capacity=1, weight=0)
 
+    # Matriz de distancias P x H (vectorizada, una sola vez)
+    dist = haversine_matrix(
+        [float(p["lat"]) for p in patients],
+        [float(p["lon"]) for p in patients],
+        [float(h["lat"]) for h in hospitals],
+        [float(h["lon"]) for h in hospitals],
+    )
+    hospital_index = {h["id"]: j for j, h in enumerate(hospitals)}
+
     # paciente -> hospital
-    for p in patients:
+    for i, p in enumerate(patients):
         pid = p["id"]
-        plat, plon = float(p["lat"]), float(p["lon"])
-        for h in hospitals:
+        for j, h in enumerate(hospitals):
             hid = h["id"]
-            hlat, hlon = float(h["lat"]), float(h["lon"])
-            d = distancia_km(plat, plon, hlat, hlon)
+            d = float(dist[i, j])
             # coste entero (para network_simplex) proporcional a distancia
             cost = int(max(1, round(d * 100)))
             # hospital como nodo (demanda 0)
@@ -99,7 +106,7 @@ def min_cost_flow(
         return results
 
     # Interpretar flujos: paciente -> hospital con flujo > 0
-    for p in patients:
+    for i, p in enumerate(patients):
         pid = p["id"]
         assigned_h = None
 
@@ -116,11 +123,8 @@ def min_cost_flow(
                 "distance": None,
             })
         else:
-            # calcular distancia real
-            p_lat, p_lon = float(p["lat"]), float(p["lon"])
-            h = next(hh for hh in hospitals if hh["id"] == assigned_h)
-            h_lat, h_lon = float(h["lat"]), float(h["lon"])
-            d_real = distancia_km(p_lat, p_lon, h_lat, h_lon)
+            # distancia real (ya calculada en la matriz)
+            d_real = float(dist[i, hospital_index[assigned_h]])
 
             results.append({
                 "patient": p["id"],
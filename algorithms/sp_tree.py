@@ -0,0 +1,102 @@
+import heapq
+import threading
+import weakref
+from array import array
+
+from graph.csr_graph import CSRGraph
+
+
+class ShortestPathTree:
+    """
+    Árbol de caminos mínimos desde un origen, explorado a pedido.
+
+    Es un Dijkstra que se puede pausar: guarda el heap (la frontera) y los
+    nodos ya asentados entre consultas. ensure(target) sigue sacando nodos
+    del heap justo desde donde quedó la consulta anterior hasta asentar
+    target, así que cada nodo y cada arista se procesan una sola vez en
+    toda la vida del árbol, por más destinos que se pidan.
+
+    El bucle es Python (como astar), así que un árbol completo en frío
+    cuesta más que el Dijkstra en C de scipy (~5 ms contra ~0.3 ms con
+    1.400 nodos); a cambio, un destino cercano solo explora su radio y
+    las consultas repetidas desde el mismo origen no vuelven a recorrer
+    nada.
+
+    dist y parent son arrays compactos (float64 / int32) de n elementos;
+    solo son definitivos para los nodos asentados.
+
+    El grafo se guarda como referencia débil: un árbol que quedó en una
+    cache no mantiene vivo un grafo viejo (con sus memmaps del snapshot y
+    sus arrays derivados) después de un cambio de versión o de una
+    actualización incremental.
+    """
+
+    def __init__(self, graph: CSRGraph, source: int):
+        n = graph.num_nodes
+        self._graph = weakref.ref(graph)
+        self.source = source
+        self.dist = array("d", [float("inf")]) * n
+        self.parent = array("i", [-1]) * n
+        self.settled = bytearray(n)
+        self.settled_count = 0
+        self.dist[source] = 0.0
+        self._heap = [(0.0, source)]
+        self._lock = threading.Lock()
+
+    @property
+    def graph(self) -> CSRGraph | None:
+        """Grafo del árbol, o None si ya se liberó."""
+        return self._graph()
+
+    @property
+    def complete(self) -> bool:
+        """True si ya no queda frontera (todo lo alcanzable está asentado)."""
+        return not self._heap
+
+    @property
+    def nbytes(self) -> int:
+        return (
+            self.dist.itemsize * len(self.dist)
+            + self.parent.itemsize * len(self.parent)
+            + len(self.settled)
+        )
+
+    def _settle_until(self, target: int) -> None:
+        graph = self.graph
+        indptr, indices, weights = graph.indptr, graph.indices, graph.weights
+        dist, parent, settled, heap = self.dist, self.parent, self.settled, self._heap
+
+        while heap and not settled[target]:
+            d, node = heapq.heappop(heap)
+            if settled[node]:
+                continue
+            settled[node] = 1
+            self.settled_count += 1
+
+            start_e, end_e = indptr[node], indptr[node + 1]
+            for neighbor, weight in zip(indices[start_e:end_e].tolist(), weights[start_e:end_e].tolist()):
+                new_cost = d + weight
+                if new_cost < dist[neighbor]:
+                    dist[neighbor] = new_cost
+                    parent[neighbor] = node
+                    heapq.heappush(heap, (new_cost, neighbor))
+
+    def ensure(self, target: int) -> bool:
+        """
+        Continúa la búsqueda hasta asentar `target` (o agotar la frontera si
+        no es alcanzable). Devuelve True si hubo que extender el árbol.
+        """
+        with self._lock:
+            if self.settled[target] or not self._heap:
+                return False
+            self._settle_until(target)
+            return True
+
+    def path(self, target: int) -> list[int]:
+        """Ruta origen -> target (solo [target] si no es alcanzable)."""
+        route = []
+        curr = target
+        while curr >= 0:
+            route.append(int(curr))
+            curr = self.parent[curr]
+        return list(reversed(route))
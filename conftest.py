@@ -0,0 +1,2 @@
+# Vacío a propósito: con este archivo pytest agrega la raíz del repo a
+# sys.path, así los tests importan algorithms/, graph/, etc. como la app.
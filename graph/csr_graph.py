@@ -0,0 +1,218 @@
+from collections.abc import Mapping
+
+import numpy as np
+from scipy import sparse
+
+
+class IdInterner:
+    """
+    Mapea códigos de nodo (P0001, H026, ...) a enteros consecutivos (int32)
+    y viceversa.
+
+    Varios interners pueden compartir la misma lista y el mismo dict (ver
+    extended): cada uno solo ve sus primeros len(self) códigos, así que el
+    de un grafo viejo no cambia cuando el grafo nuevo agrega nodos.
+    """
+
+    def __init__(self, ids=()):
+        self._ids: list[str] = list(ids)
+        self._index: dict[str, int] = dict(zip(self._ids, range(len(self._ids))))
+
+        if len(self._index) != len(self._ids):
+            # Había códigos repetidos: se internan uno por uno
+            codes, self._ids, self._index = self._ids, [], {}
+            for node_id in codes:
+                self.intern(node_id)
+        self._size = len(self._ids)
+
+    def copy(self) -> "IdInterner":
+        """Copia independiente (más barata que internar todo de nuevo)."""
+        other = IdInterner()
+        other._ids = self._ids[:self._size]
+        if self._size == len(self._ids):
+            other._index = self._index.copy()
+        else:
+            other._index = dict(zip(other._ids, range(self._size)))
+        other._size = self._size
+        return other
+
+    def extended(self, new_ids) -> "IdInterner":
+        """
+        Interner con estos códigos agregados al final. Si este es el más
+        nuevo de los que comparten la lista, el nuevo la comparte también
+        (O(códigos nuevos)); si no, parte de una copia.
+        """
+        other = IdInterner()
+        base = self if self._size == len(self._ids) else self.copy()
+        other._ids, other._index, other._size = base._ids, base._index, base._size
+        for node_id in new_ids:
+            other.intern(node_id)
+        return other
+
+    def intern(self, node_id: str) -> int:
+        """Devuelve el entero del código, registrándolo si es nuevo."""
+        idx = self.get(node_id)
+        if idx is None:
+            if self._size != len(self._ids):
+                # Otro interner ya agregó códigos a la lista compartida
+                detached = self.copy()
+                self._ids, self._index = detached._ids, detached._index
+            idx = self._size
+            self._ids.append(node_id)
+            self._index[node_id] = idx
+            self._size += 1
+        return idx
+
+    def index_of(self, node_id: str) -> int:
+        """Entero de un código existente (KeyError si no existe)."""
+        idx = self._index[node_id]
+        if idx >= self._size:
+            raise KeyError(node_id)
+        return idx
+
+    def get(self, node_id: str, default=None):
+        idx = self._index.get(node_id)
+        return idx if idx is not None and idx < self._size else default
+
+    def id_of(self, idx: int) -> str:
+        return self._ids[idx]
+
+    @property
+    def ids(self) -> list[str]:
+        return self._ids if self._size == len(self._ids) else self._ids[:self._size]
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, node_id) -> bool:
+        return self.get(node_id) is not None
+
+    def __iter__(self):
+        return iter(self.ids)
+
+
+class CSRGraph(Mapping):
+    """
+    Grafo dirigido compacto en formato CSR:
+      - ids: IdInterner (código <-> entero)
+      - indptr (int64): vecinos del nodo i en indices[indptr[i]:indptr[i+1]]
+      - indices (int32): nodo destino de cada arista
+      - weights (float64 o float32): peso (km) de cada arista
+
+    También se comporta como el dict de siempre
+    `{node_id: [(neighbor_id, weight), ...]}` (solo lectura), así que los
+    algoritmos existentes lo pueden usar sin cambios.
+    """
+
+    def __init__(self, ids: IdInterner, indptr, indices, weights):
+        self.ids = ids
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.weights = np.asarray(weights)
+        # Grafo traspuesto (aristas invertidas) y origen de cada arista: se
+        # arman la primera vez que se piden
+        self._reverse: "CSRGraph | None" = None
+        self._edge_sources: np.ndarray | None = None
+
+    # -----------------------------
+    # Construcción
+    # -----------------------------
+    @classmethod
+    def from_arrays(cls, ids: IdInterner, src, dst, weights, dtype=np.float64) -> "CSRGraph":
+        """
+        Arma el CSR a partir de arrays de aristas (enteros origen/destino).
+        Dentro de cada nodo se respeta el orden en que vienen las aristas.
+        """
+        n = len(ids)
+        src = np.asarray(src, dtype=np.int64)
+        order = np.argsort(src, kind="stable")
+
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=n), out=indptr[1:])
+
+        return cls(
+            ids,
+            indptr,
+            np.asarray(dst, dtype=np.int32)[order],
+            np.asarray(weights, dtype=dtype)[order],
+        )
+
+    @classmethod
+    def from_dict(cls, edges: dict, dtype=np.float64) -> "CSRGraph":
+        """Convierte un dict {id: [(vecino, peso), ...]} a CSR."""
+        ids = IdInterner(edges.keys())
+        src, dst, weights = [], [], []
+        for node_id, neighbors in edges.items():
+            i = ids.index_of(node_id)
+            for neighbor_id, w in neighbors:
+                src.append(i)
+                dst.append(ids.intern(neighbor_id))
+                weights.append(w)
+        return cls.from_arrays(ids, src, dst, weights, dtype=dtype)
+
+    # -----------------------------
+    # Acceso por enteros
+    # -----------------------------
+    @property
+    def num_nodes(self) -> int:
+        return len(self.indptr) - 1
+
+    @property
+    def num_edges(self) -> int:
+        return int(self.indptr[-1])
+
+    @property
+    def nbytes(self) -> int:
+        """Memoria ocupada por los arrays CSR (sin contar los códigos)."""
+        return self.indptr.nbytes + self.indices.nbytes + self.weights.nbytes
+
+    def neighbors(self, i: int):
+        """(indices, weights) de los vecinos del nodo entero i."""
+        start, end = self.indptr[i], self.indptr[i + 1]
+        return self.indices[start:end], self.weights[start:end]
+
+    def edge_sources(self) -> np.ndarray:
+        """Nodo origen (entero) de cada arista, alineado con indices/weights (solo lectura)."""
+        if self._edge_sources is None:
+            sources = np.repeat(np.arange(self.num_nodes, dtype=np.int32), np.diff(self.indptr))
+            sources.flags.writeable = False
+            self._edge_sources = sources
+        return self._edge_sources
+
+    def reverse(self) -> "CSRGraph":
+        """
+        Grafo con todas las aristas invertidas (vecinos de entrada), con los
+        mismos ids. Se calcula una sola vez por grafo.
+        """
+        if self._reverse is None:
+            rev = CSRGraph.from_arrays(
+                self.ids, self.indices, self.edge_sources(), self.weights, dtype=self.weights.dtype
+            )
+            rev._reverse = self
+            self._reverse = rev
+        return self._reverse
+
+    def to_scipy(self) -> sparse.csr_matrix:
+        """Vista como scipy.sparse.csr_matrix (para scipy.sparse.csgraph)."""
+        n = self.num_nodes
+        return sparse.csr_matrix((self.weights, self.indices, self.indptr), shape=(n, n))
+
+    def to_dict(self) -> dict:
+        return {node_id: self[node_id] for node_id in self.ids}
+
+    # -----------------------------
+    # Interfaz tipo dict (compatibilidad)
+    # -----------------------------
+    def __getitem__(self, node_id: str) -> list[tuple[str, float]]:
+        indices, weights = self.neighbors(self.ids.index_of(node_id))
+        id_of = self.ids.ids
+        return [(id_of[j], w) for j, w in zip(indices.tolist(), weights.tolist())]
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def __len__(self) -> int:
+        return self.num_nodes
+
+    def __contains__(self, node_id) -> bool:
+        return node_id in self.ids
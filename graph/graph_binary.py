@@ -0,0 +1,81 @@
+import json
+import struct
+
+import numpy as np
+
+from graph.csr_graph import CSRGraph
+
+# Formato binario compacto de un grafo (todo little-endian):
+#
+#   0   4s  magic b"GYFG"
+#   4   u32 versión del formato
+#   8   u32 bytes de meta (JSON utf-8)
+#   12  u32 bytes de la tabla de ids (utf-8, separados por "\n")
+#   16  u32 n (nodos)
+#   20  u32 m (aristas)
+#   24  meta, ids y relleno con ceros hasta múltiplo de 8
+#   ... f64[n] lat, f64[n] lon, i32[m] from, i32[m] to, f32[m] weight, u8[n] type
+#
+# from/to son posiciones en la tabla de ids; type indexa meta["node_types"].
+# Con el relleno, cada columna queda alineada para abrirla en el navegador
+# directo como Float64Array / Int32Array / Float32Array sin copiar.
+
+BINARY_MAGIC = b"GYFG"
+BINARY_FORMAT_VERSION = 1
+BINARY_MIMETYPE = "application/octet-stream"
+
+NODE_TYPES = ("patient", "hospital")
+
+_HEADER = struct.Struct("<4sIIIII")
+
+
+def encode_graph_binary(meta: dict, nodes: list[dict], graph: CSRGraph) -> bytes:
+    """Serializa nodos + aristas del CSR en el formato binario de columnas."""
+    ids = [n["id"] for n in nodes]
+    types = list(NODE_TYPES) + sorted({n["type"] for n in nodes} - set(NODE_TYPES))
+    type_code = {t: i for i, t in enumerate(types)}
+
+    meta_bytes = json.dumps({**meta, "node_types": types}, separators=(",", ":")).encode("utf-8")
+    ids_bytes = "\n".join(ids).encode("utf-8")
+    n, m = len(nodes), graph.num_edges
+
+    head = _HEADER.pack(BINARY_MAGIC, BINARY_FORMAT_VERSION, len(meta_bytes), len(ids_bytes), n, m)
+    prefix = head + meta_bytes + ids_bytes
+    padding = b"\0" * (-len(prefix) % 8)
+
+    columns = (
+        np.array([node["lat"] for node in nodes], dtype="<f8"),
+        np.array([node["lon"] for node in nodes], dtype="<f8"),
+        graph.edge_sources().astype("<i4", copy=False),
+        graph.indices.astype("<i4", copy=False),
+        graph.weights.astype("<f4", copy=False),
+        np.array([type_code[node["type"]] for node in nodes], dtype=np.uint8),
+    )
+    return b"".join([prefix, padding, *(c.tobytes() for c in columns)])
+
+
+def decode_graph_binary(data: bytes) -> dict:
+    """
+    Inverso de encode_graph_binary (para clientes Python y pruebas).
+    Devuelve {"meta", "ids", "lat", "lon", "from", "to", "weight", "type"}.
+    """
+    magic, version, meta_len, ids_len, n, m = _HEADER.unpack_from(data, 0)
+    if magic != BINARY_MAGIC or version != BINARY_FORMAT_VERSION:
+        raise ValueError("Formato binario de grafo desconocido")
+
+    offset = _HEADER.size
+    meta = json.loads(data[offset:offset + meta_len])
+    offset += meta_len
+    ids_blob = data[offset:offset + ids_len].decode("utf-8")
+    offset += ids_len
+    offset += -offset % 8
+
+    out = {"meta": meta, "ids": ids_blob.split("\n") if n else []}
+    for name, dtype, count in (
+        ("lat", "<f8", n), ("lon", "<f8", n),
+        ("from", "<i4", m), ("to", "<i4", m), ("weight", "<f4", m),
+        ("type", np.uint8, n),
+    ):
+        out[name] = np.frombuffer(data, dtype=dtype, count=count, offset=offset)
+        offset += out[name].nbytes
+    return out
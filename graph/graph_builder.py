@@ -1,8 +1,13 @@
+from collections.abc import Mapping
+
 import numpy as np
 
 from models import Patient, Hospital
 from shared.config import Config
-from graph.graph_utils import haversine
+from graph.csr_graph import CSRGraph, IdInterner
+from graph.graph_utils import block_rows_for_budget, haversine_blocks, haversine_fill
+from graph.incremental_knn import IncrementalKNN
+from graph.spatial_index import SpatialIndex
 
 
 class GraphBuilder:
@@ -13,14 +18,40 @@ class GraphBuilder:
       - KNN: cada nodo se conecta con sus k vecinos más cercanos.
       - RADIUS: se conecta solo si la distancia <= radio (km).
       - BIPARTITE_KNN: cada paciente se conecta a k hospitales más cercanos.
+
+    Métodos de construcción (parámetro `method`):
+      - "kdtree": índice espacial, O(n log n) y sin matriz n x n.
+      - "matrix": matriz de distancias completa, O(n^2) en tiempo y memoria.
+      - "blocked": O(n^2) en tiempo, pero por bloques de filas que se
+        reducen directo a aristas; la memoria pico la fija memory_budget_mb.
+
+    El resultado queda en self.graph (CSRGraph, ids enteros = posición en
+    self.nodes). self.edges apunta al mismo objeto, que se usa como el dict
+    node_id -> list[(neighbor_id, weight_km)] de siempre.
     """
 
-    def __init__(self, k: int | None = None):
+    METHODS = ("kdtree", "matrix", "blocked")
+
+    def __init__(
+        self,
+        k: int | None = None,
+        method: str | None = None,
+        weight_dtype: str | None = None,
+        memory_budget_mb: int | None = None,
+    ):
         # K por defecto viene de la configuración global
         self.k = k or Config.K_NEIGHBORS
+        self.method = method or Config.GRAPH_BUILD_METHOD
+        self.weight_dtype = np.dtype(weight_dtype or Config.GRAPH_WEIGHT_DTYPE)
+        self.memory_budget_mb = memory_budget_mb or Config.DISTANCE_MEMORY_BUDGET_MB
         self.nodes: list[dict] = []
-        # dict: node_id -> list[(neighbor_id, weight_km)]
-        self.edges: dict[str, list[tuple[str, float]]] = {}
+        self.graph: CSRGraph | None = None
+        # node_id -> list[(neighbor_id, weight_km)] (adaptador sobre self.graph)
+        self.edges: Mapping[str, list[tuple[str, float]]] = {}
+        # k del último grafo KNN (None si el último grafo no es KNN) y su
+        # estado incremental, que se arma recién en la primera actualización
+        self._knn_k: int | None = None
+        self._knn_state: IncrementalKNN | None = None
 
     # -----------------------------
     # Carga de nodos desde la BD
@@ -52,43 +83,114 @@ class GraphBuilder:
 
         print(f"✔️ Nodos cargados en GraphBuilder: {len(self.nodes)}")
 
+    def restore(self, nodes: list[dict], graph: CSRGraph, knn_k: int | None = None) -> CSRGraph:
+        """
+        Usa un grafo ya construido (p.ej. cargado de un snapshot) sin
+        recalcular nada. Con knn_k se habilitan las actualizaciones
+        incrementales del KNN.
+        """
+        self.nodes = nodes
+        self.graph = graph
+        self.edges = graph
+        self._knn_k = knn_k
+        self._knn_state = None
+        return self.edges
+
     def _ensure_nodes(self) -> None:
         """Si aún no se han cargado nodos, los carga desde la BD."""
         if not self.nodes:
             self.load_nodes_from_db()
 
+    def _resolve_method(self, method: str | None) -> str:
+        method = method or self.method
+        if method not in self.METHODS:
+            raise ValueError(f"method inválido: {method}")
+        return method
+
     # -----------------------------
-    # Utilidad interna: matriz de distancias
+    # Utilidad interna: coordenadas y matriz de distancias
     # -----------------------------
-    def _build_distance_matrix(self):
+    def _node_coords(self) -> np.ndarray:
+        """Devuelve las coordenadas de los nodos como array (n, 2): [lat, lon]."""
+        self._ensure_nodes()
+        n = len(self.nodes)
+        return np.array([(node["lat"], node["lon"]) for node in self.nodes], dtype=float).reshape(n, 2)
+
+    def _block_rows(self, n_cols: int) -> int:
+        """Filas por bloque de distancias según memory_budget_mb."""
+        return block_rows_for_budget(n_cols, self.memory_budget_mb * 1024 * 1024)
+
+    def _build_distance_matrix(self, memmap_path: str | None = None):
         """
         Construye la matriz de distancias geográficas entre TODOS los nodos.
+        Se llena por bloques; con memmap_path la matriz vive en un archivo
+        .npy mapeado a memoria en vez de en RAM.
         Devuelve:
           - n (int): número de nodos
           - coords (np.ndarray): [(lat, lon), ...]
-          - dist_matrix (np.ndarray): n x n
+          - dist_matrix (np.ndarray | np.memmap): n x n
         """
-        self._ensure_nodes()
-        n = len(self.nodes)
+        coords = self._node_coords()
+        n = len(coords)
 
-        coords = np.array([(node["lat"], node["lon"]) for node in self.nodes])
-        dist_matrix = np.zeros((n, n), dtype=float)
+        if memmap_path:
+            dist_matrix = np.lib.format.open_memmap(memmap_path, mode="w+", dtype=np.float64, shape=(n, n))
+        else:
+            dist_matrix = np.empty((n, n), dtype=np.float64)
 
-        for i in range(n):
-            for j in range(n):
-                if i == j:
-                    dist_matrix[i][j] = 0.0
-                else:
-                    lat1, lon1 = coords[i]
-                    lat2, lon2 = coords[j]
-                    dist_matrix[i][j] = haversine(lat1, lon1, lat2, lon2)
+        haversine_fill(dist_matrix, coords[:, 0], coords[:, 1], block_rows=self._block_rows(n))
+        if memmap_path:
+            dist_matrix.flush()
 
         return n, coords, dist_matrix
 
+    def build_distance_matrix(self, memmap_path: str | None = None) -> np.ndarray:
+        """
+        Matriz n x n completa, para quien realmente la necesita (p.ej.
+        Floyd-Warshall). Ver _build_distance_matrix.
+        """
+        self._ensure_nodes()
+        return self._build_distance_matrix(memmap_path)[2]
+
+    def _build_spatial_index(self) -> SpatialIndex:
+        """Construye el índice espacial (KD-tree) sobre los nodos actuales."""
+        coords = self._node_coords()
+        return SpatialIndex(coords[:, 0], coords[:, 1])
+
+    def _edges_from_arrays(self, src, dst, weights, ids: IdInterner | None = None) -> CSRGraph:
+        """
+        Arma self.graph (CSR) a partir de arrays de aristas (índices de nodo
+        origen/destino y peso en km). Dentro de cada nodo se respeta el orden
+        en que vienen las aristas. Si no se pasa `ids`, se internan los
+        códigos de self.nodes en orden.
+        """
+        if ids is None:
+            ids = IdInterner(node["id"] for node in self.nodes)
+        self.graph = CSRGraph.from_arrays(ids, src, dst, weights, dtype=self.weight_dtype)
+        self.edges = self.graph
+        self._knn_k = None
+        self._knn_state = None
+        return self.graph
+
+    def _knn_from_candidates(self, idx: np.ndarray, dist_km: np.ndarray, k: int) -> CSRGraph:
+        """
+        Recibe, por fila, los k+1 candidatos más cercanos (incluye al propio
+        nodo) ordenados por distancia y se queda con k vecinos sin el nodo.
+        """
+        n = len(idx)
+
+        # Si hay coordenadas duplicadas el nodo podría no aparecer: en ese
+        # caso el corte por cumsum descarta el vecino sobrante.
+        keep = idx != np.arange(n)[:, None]
+        keep &= np.cumsum(keep, axis=1) <= k
+
+        src = np.broadcast_to(np.arange(n)[:, None], idx.shape)[keep]
+        return self._edges_from_arrays(src, idx[keep], dist_km[keep])
+
     # -----------------------------
     # 1) Grafo KNN geográfico
     # -----------------------------
-    def build_knn_graph(self, k: int | None = None) -> dict:
+    def build_knn_graph(self, k: int | None = None, method: str | None = None) -> CSRGraph:
         """
         Construye un grafo KNN clásico:
           - Cada nodo se conecta con sus k vecinos más cercanos.
@@ -97,95 +199,300 @@ class GraphBuilder:
             k = self.k
 
         self._ensure_nodes()
-        n, _, dist_matrix = self._build_distance_matrix()
-
-        # Inicializar estructura de aristas
-        self.edges = {node["id"]: [] for node in self.nodes}
+        method = self._resolve_method(method)
+
+        if method == "kdtree":
+            dist_km, idx = self._build_spatial_index().query_knn(k + 1)
+        elif method == "blocked":
+            dist_km, idx = self._knn_candidates_blocked(k + 1)
+        else:
+            _, _, dist_matrix = self._build_distance_matrix()
+            # argsort ordena de menor a mayor, incluído i mismo en posición 0
+            idx = np.argsort(dist_matrix, axis=1)[:, :k + 1]
+            dist_km = np.take_along_axis(dist_matrix, idx, axis=1)
 
-        for i in range(n):
-            distances = dist_matrix[i]
+        self._knn_from_candidates(idx, dist_km, k)
+        self._knn_k = k
 
-            # argsort ordena de menor a mayor, incluído i mismo en posición 0
-            # Tomamos los primeros k+1 y luego filtramos i.
-            nearest_idx = np.argsort(distances)[:k + 1]
+        print(f"✔️ Grafo KNN ({method}) construido con k={k}. Nodos={len(self.nodes)}, aristas={self.graph.num_edges}")
+        return self.edges
 
-            for j in nearest_idx:
-                if i == j:
-                    continue
-                node_from = self.nodes[i]["id"]
-                node_to = self.nodes[j]["id"]
-                weight = dist_matrix[i][j]
+    def _knn_candidates_blocked(self, kk: int):
+        """
+        kk más cercanos por fila (incluye al propio nodo), calculando las
+        distancias por bloques de filas: cada bloque se reduce con
+        argpartition y se descarta, así que nunca existe la matriz n x n.
+        """
+        coords = self._node_coords()
+        n = len(coords)
+        kk = min(kk, n)
+
+        idx = np.empty((n, kk), dtype=np.intp)
+        dist_km = np.empty((n, kk), dtype=np.float64)
+
+        blocks = haversine_blocks(coords[:, 0], coords[:, 1], block_rows=self._block_rows(n))
+        for start, end, block in blocks:
+            if kk < n:
+                part = np.argpartition(block, kk - 1, axis=1)[:, :kk]
+            else:
+                part = np.broadcast_to(np.arange(n), block.shape)
+            d = np.take_along_axis(block, part, axis=1)
+            order = np.argsort(d, axis=1, kind="stable")
+            idx[start:end] = np.take_along_axis(part, order, axis=1)
+            dist_km[start:end] = np.take_along_axis(d, order, axis=1)
+
+        return dist_km, idx
 
-                self.edges[node_from].append((node_to, weight))
+    # -----------------------------
+    # 1b) Mantenimiento incremental del grafo KNN
+    # -----------------------------
+    def _incremental_knn(self) -> IncrementalKNN:
+        """Estado incremental del KNN actual (se arma la primera vez)."""
+        if self._knn_k is None or self.graph is None:
+            raise ValueError("Las actualizaciones incrementales requieren un grafo KNN construido")
+
+        if self._knn_state is None:
+            coords = self._node_coords()
+            self._knn_state = IncrementalKNN(
+                self._knn_k,
+                coords[:, 0],
+                coords[:, 1],
+                self.graph.edge_sources(),
+                self.graph.indices,
+                self.graph.weights,
+            )
+        return self._knn_state
+
+    def _refresh_from_knn_state(self, ids: IdInterner | None = None) -> CSRGraph:
+        """Vuelve a armar el CSR completo desde el estado incremental (O(n·k) vectorizado)."""
+        state, k = self._knn_state, self._knn_k
+        self._edges_from_arrays(*state.edge_arrays(), ids=ids)
+        self._knn_k, self._knn_state = k, state
+        return self.edges
 
-        print(f"✔️ Grafo KNN construido con k={k}. Nodos={n}, aristas={sum(len(v) for v in self.edges.values())}")
+    def _patch_from_knn_state(self, rows, ids: IdInterner) -> CSRGraph:
+        """
+        CSR nuevo con las filas `rows` (y las agregadas al final) tomadas del
+        estado incremental. El grafo anterior no se toca, porque puede haber
+        consultas usándolo: sus arrays se copian tal cual y solo se
+        reescriben esas filas. Si alguna cambió de largo (menos de k
+        vecinos), se arma el CSR completo.
+        """
+        state, old = self._knn_state, self.graph
+        n_old, n = old.num_nodes, len(state)
+        rows = np.array(sorted(set(rows) | set(range(n_old, n))), dtype=np.int64)
+        lengths = (state.idx[rows] >= 0).sum(axis=1)
+
+        existing = rows < n_old
+        old_rows = rows[existing]
+        if not np.array_equal(lengths[existing], old.indptr[old_rows + 1] - old.indptr[old_rows]):
+            return self._refresh_from_knn_state(ids)
+
+        indptr = np.concatenate((old.indptr, old.num_edges + np.cumsum(lengths[~existing])))
+        indices = np.empty(indptr[-1], dtype=old.indices.dtype)
+        weights = np.empty(indptr[-1], dtype=old.weights.dtype)
+        indices[:old.num_edges] = old.indices
+        weights[:old.num_edges] = old.weights
+        for row, length in zip(rows.tolist(), lengths.tolist()):
+            start = indptr[row]
+            indices[start:start + length] = state.idx[row, :length]
+            weights[start:start + length] = state.dist[row, :length]
+
+        self.graph = CSRGraph(ids, indptr, indices, weights)
+        self.edges = self.graph
         return self.edges
 
+    def _position_of(self, node_id: str) -> int:
+        pos = self.graph.ids.get(node_id)
+        if pos is None:
+            raise ValueError(f"Nodo {node_id} no existe en el grafo")
+        return pos
+
+    def update_nodes(self, inserted=(), moved=(), removed=()) -> CSRGraph:
+        """
+        Aplica varios cambios al grafo KNN actual y publica un solo CSR:
+          - inserted: nodos nuevos ({"id", "lat", "lon", "type"})
+          - moved: nodos existentes con sus coordenadas nuevas (mismo formato)
+          - removed: ids a eliminar
+        Solo se recalculan la fila de cada nodo y las filas cuyo k-ésimo
+        vecino cambia (ver IncrementalKNN); el CSR nuevo copia el anterior
+        y reescribe esas filas. Las eliminaciones corren las posiciones de
+        los nodos, así que con alguna se rearma el CSR completo (O(n·k)).
+        ValueError (sin aplicar nada) si un id no existe o ya existe.
+        """
+        state = self._incremental_knn()
+        inserted, moved, removed = list(inserted), list(moved), list(removed)
+
+        gone = {self._position_of(node_id) for node_id in removed}
+        for node in moved:
+            if self._position_of(node["id"]) in gone:
+                raise ValueError(f"Nodo {node['id']} no existe en el grafo")
+        new_ids = [node["id"] for node in inserted]
+        if len(set(new_ids)) != len(new_ids):
+            raise ValueError("Hay nodos insertados repetidos")
+        for node_id in new_ids:
+            if node_id in self.graph and self.graph.ids.index_of(node_id) not in gone:
+                raise ValueError(f"Nodo {node_id} ya existe en el grafo")
+
+        # Lista nueva: quien ya tiene la anterior la sigue viendo igual que su grafo
+        nodes = list(self.nodes)
+
+        # De mayor a menor posición: cada eliminación no corre a las que faltan
+        changed = set()
+        for pos in sorted(gone, reverse=True):
+            changed.update(state.remove(pos))
+            del nodes[pos]
+
+        if gone:
+            positions = {node["id"]: i for i, node in enumerate(nodes)}
+        else:
+            positions = self.graph.ids
+        for node in moved:
+            pos = positions.get(node["id"])
+            changed.update(state.move(pos, node["lat"], node["lon"]))
+            nodes[pos] = {**nodes[pos], **node}
+
+        for node in inserted:
+            _pos, rows = state.insert(node["lat"], node["lon"])
+            changed.update(rows)
+            nodes.append(node)
+        self.nodes = nodes
+
+        print(
+            f"✔️ KNN incremental: +{len(inserted)} ~{len(moved)} -{len(removed)} nodos. "
+            f"Filas actualizadas={len(changed)}"
+        )
+        if gone:
+            return self._refresh_from_knn_state()
+
+        # Interner nuevo que comparte los códigos del anterior (O(insertados))
+        ids = self.graph.ids.extended(new_ids) if new_ids else self.graph.ids
+        return self._patch_from_knn_state(changed, ids)
+
+    def insert_node(self, node: dict) -> CSRGraph:
+        """Agrega un nodo ({"id", "lat", "lon", "type"}) al grafo KNN actual (ver update_nodes)."""
+        return self.update_nodes(inserted=[node])
+
+    def move_node(self, node_id: str, lat: float, lon: float) -> CSRGraph:
+        """Actualiza las coordenadas de un nodo del grafo KNN actual (ver update_nodes)."""
+        return self.update_nodes(moved=[{"id": node_id, "lat": lat, "lon": lon}])
+
+    def remove_node(self, node_id: str) -> CSRGraph:
+        """Elimina un nodo del grafo KNN actual (ver update_nodes)."""
+        return self.update_nodes(removed=[node_id])
+
     # -----------------------------
     # 2) Grafo por radio (ε-vecindario)
     # -----------------------------
-    def build_radius_graph(self, radius_km: float) -> dict:
+    def build_radius_graph(self, radius_km: float, method: str | None = None) -> CSRGraph:
         """
         Construye un grafo donde se conecta una arista entre dos nodos
         solo si la distancia geográfica es <= radius_km.
+
+        Con "kdtree" solo se visitan los pares dentro del radio (consulta por
+        bola), así que el costo depende del número de aristas y no de n^2.
         """
         self._ensure_nodes()
-        n, _, dist_matrix = self._build_distance_matrix()
+        method = self._resolve_method(method)
+
+        if method == "kdtree":
+            src, dst, dist_km = self._build_spatial_index().query_pairs(radius_km)
+            # Mismo orden que la versión por matriz: origen y luego destino
+            order = np.lexsort((dst, src))
+            src, dst, dist_km = src[order], dst[order], dist_km[order]
+        elif method == "blocked":
+            src, dst, dist_km = self._radius_pairs_blocked(radius_km)
+        else:
+            n, _, dist_matrix = self._build_distance_matrix()
+            inside = dist_matrix <= radius_km
+            np.fill_diagonal(inside, False)
+            src, dst = np.nonzero(inside)
+            dist_km = dist_matrix[src, dst]
+
+        self._edges_from_arrays(src, dst, dist_km)
+
+        print(f"✔️ Grafo por radio ({method}) construido (R={radius_km} km). Nodos={len(self.nodes)}, aristas={self.graph.num_edges}")
+        return self.edges
 
-        self.edges = {node["id"]: [] for node in self.nodes}
+    def _radius_pairs_blocked(self, radius_km: float):
+        """Pares dentro del radio, reduciendo cada bloque de filas a aristas."""
+        coords = self._node_coords()
+        n = len(coords)
+        src_parts, dst_parts, w_parts = [], [], []
 
-        for i in range(n):
-            for j in range(n):
-                if i == j:
-                    continue
-                d = dist_matrix[i][j]
-                if d <= radius_km:
-                    node_from = self.nodes[i]["id"]
-                    node_to = self.nodes[j]["id"]
-                    self.edges[node_from].append((node_to, d))
+        blocks = haversine_blocks(coords[:, 0], coords[:, 1], block_rows=self._block_rows(n))
+        for start, end, block in blocks:
+            inside = block <= radius_km
+            rows = np.arange(end - start)
+            inside[rows, rows + start] = False  # sin lazos
 
-        print(f"✔️ Grafo por radio construido (R={radius_km} km). Nodos={n}, aristas={sum(len(v) for v in self.edges.values())}")
-        return self.edges
+            r, c = np.nonzero(inside)
+            src_parts.append(r + start)
+            dst_parts.append(c)
+            w_parts.append(block[r, c])
+
+        if not src_parts:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp), np.empty(0)
+        return np.concatenate(src_parts), np.concatenate(dst_parts), np.concatenate(w_parts)
 
     # -----------------------------
     # 3) Grafo bipartito KNN paciente→hospital
     # -----------------------------
-    def build_bipartite_knn_graph(self, k: int | None = None) -> dict:
+    def build_bipartite_knn_graph(self, k: int | None = None, block_rows: int | None = None) -> CSRGraph:
         """
         Construye un grafo bipartito donde:
           - Solo se crean aristas PACIENTE -> HOSPITAL.
           - Cada paciente se conecta con sus k hospitales más cercanos.
+
+        Las distancias P x H se calculan por bloques de `block_rows` pacientes
+        (por defecto, los que caben en memory_budget_mb); en cada bloque
+        argpartition elige los k hospitales más cercanos y solo esos k se
+        ordenan.
         """
         if k is None:
             k = self.k
 
         self._ensure_nodes()
 
-        # Separar nodos por tipo
-        patient_nodes = [n for n in self.nodes if n["type"] == "patient"]
-        hospital_nodes = [n for n in self.nodes if n["type"] == "hospital"]
-
-        self.edges = {node["id"]: [] for node in self.nodes}
+        # Separar nodos por tipo (índices dentro de self.nodes)
+        patient_idx = np.array([i for i, n in enumerate(self.nodes) if n["type"] == "patient"], dtype=np.intp)
+        hospital_idx = np.array([i for i, n in enumerate(self.nodes) if n["type"] == "hospital"], dtype=np.intp)
 
-        if not hospital_nodes:
+        if len(hospital_idx) == 0:
+            self._edges_from_arrays([], [], [])
             print("⚠️ No hay hospitales en la BD. Grafo bipartito vacío.")
             return self.edges
 
-        # Para cada paciente, calcular distancia a todos los hospitales
-        for p in patient_nodes:
-            dists = []
-            for h in hospital_nodes:
-                d = haversine(p["lat"], p["lon"], h["lat"], h["lon"])
-                dists.append((h["id"], d))
-
-            # Ordenar hospitales por distancia y tomar k más cercanos
-            dists.sort(key=lambda x: x[1])
-            nearest_hospitals = dists[:k]
-
-            for hid, d in nearest_hospitals:
-                self.edges[p["id"]].append((hid, d))
-                # Si quieres que sea completamente no dirigido, puedes agregar:
-                # self.edges[hid].append((p["id"], d))
-
-        print(f"✔️ Grafo bipartito KNN construido con k={k}. Pacientes={len(patient_nodes)}, hospitales={len(hospital_nodes)}")
+        coords = self._node_coords()
+        k = min(k, len(hospital_idx))
+        src_parts, dst_parts, w_parts = [], [], []
+
+        blocks = haversine_blocks(
+            coords[patient_idx, 0], coords[patient_idx, 1],
+            coords[hospital_idx, 0], coords[hospital_idx, 1],
+            block_rows=block_rows or self._block_rows(len(hospital_idx)),
+        )
+        for start, end, block in blocks:
+            rows = np.arange(end - start)[:, None]
+
+            # k más cercanos sin ordenar (O(H)) y luego orden solo de esos k
+            if k < block.shape[1]:
+                nearest = np.argpartition(block, k - 1, axis=1)[:, :k]
+            else:
+                nearest = np.broadcast_to(np.arange(block.shape[1]), block.shape)
+            order = np.argsort(block[rows, nearest], axis=1, kind="stable")
+            nearest = nearest[rows, order]
+
+            src_parts.append(np.repeat(patient_idx[start:end], k))
+            dst_parts.append(hospital_idx[nearest].ravel())
+            w_parts.append(block[rows, nearest].ravel())
+
+        if src_parts:
+            self._edges_from_arrays(
+                np.concatenate(src_parts), np.concatenate(dst_parts), np.concatenate(w_parts)
+            )
+        else:
+            self._edges_from_arrays([], [], [])
+
+        print(f"✔️ Grafo bipartito KNN construido con k={k}. Pacientes={len(patient_idx)}, hospitales={len(hospital_idx)}")
         return self.edges
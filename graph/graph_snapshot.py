@@ -0,0 +1,166 @@
+import glob
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from graph.csr_graph import CSRGraph, IdInterner
+
+# Subir este número si cambia el contenido del snapshot
+SNAPSHOT_FORMAT_VERSION = 2
+
+# Arrays grandes: se abren con mmap de solo lectura, así que todos los
+# procesos (workers de gunicorn) comparten las mismas páginas del page cache
+_MMAP_ARRAYS = ("lat", "lon", "indptr", "indices", "weights")
+
+
+def snapshot_prefix(mode: str, k: int | None = None, radius_km: float | None = None) -> str:
+    """Parte del nombre que identifica los parámetros de construcción."""
+    return f"{mode}-k{k}-r{radius_km}"
+
+
+def snapshot_path(
+    directory: str,
+    dataset_version: str,
+    mode: str,
+    k: int | None = None,
+    radius_km: float | None = None,
+) -> str:
+    """Carpeta del snapshot para (parámetros de construcción, versión de datos)."""
+    name = f"{snapshot_prefix(mode, k, radius_km)}-v{SNAPSHOT_FORMAT_VERSION}-{dataset_version}"
+    return os.path.join(directory, name)
+
+
+def save_snapshot(path: str, nodes: list[dict], graph: CSRGraph, meta: dict | None = None) -> None:
+    """
+    Guarda nodos + grafo CSR como una carpeta de .npy sin comprimir (uno por
+    array) más meta.json. Se escribe en una carpeta temporal y luego se
+    renombra, para que ningún worker lea un snapshot a medio escribir.
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+
+    meta = {**(meta or {}), "format_version": SNAPSHOT_FORMAT_VERSION}
+    tmp_dir = tempfile.mkdtemp(prefix=".snapshot-", dir=directory)
+
+    try:
+        arrays = {
+            "ids": np.array([n["id"] for n in nodes], dtype=str),
+            "types": np.array([n["type"] for n in nodes], dtype=str),
+            "lat": np.array([n["lat"] for n in nodes], dtype=np.float64),
+            "lon": np.array([n["lon"] for n in nodes], dtype=np.float64),
+            "indptr": graph.indptr,
+            "indices": graph.indices,
+            "weights": graph.weights,
+        }
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), np.ascontiguousarray(array))
+
+        with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+
+        try:
+            os.replace(tmp_dir, path)
+        except OSError:
+            # Otro worker ya dejó el mismo snapshot: nos quedamos con ese
+            if not os.path.isdir(path):
+                raise
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def load_snapshot(path: str):
+    """
+    Abre un snapshot. Los arrays grandes quedan como np.memmap de solo
+    lectura (no se copian a la memoria del proceso).
+    Devuelve (nodes, graph, meta) o None si no existe, es de otro formato o
+    está dañado.
+    """
+    meta_path = os.path.join(path, "meta.json")
+    if not os.path.exists(meta_path):
+        return None
+
+    try:
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+            return None
+
+        arrays = {
+            name: np.load(
+                os.path.join(path, f"{name}.npy"),
+                mmap_mode="r" if name in _MMAP_ARRAYS else None,
+                allow_pickle=False,
+            )
+            for name in ("ids", "types", *_MMAP_ARRAYS)
+        }
+    except (OSError, ValueError) as ex:
+        print(f"⚠️ Snapshot inválido {path}: {ex}")
+        return None
+
+    ids = arrays["ids"].tolist()
+    nodes = [
+        {"id": node_id, "lat": lat, "lon": lon, "type": node_type}
+        for node_id, lat, lon, node_type in zip(
+            ids, arrays["lat"].tolist(), arrays["lon"].tolist(), arrays["types"].tolist()
+        )
+    ]
+    graph = CSRGraph(IdInterner(ids), arrays["indptr"], arrays["indices"], arrays["weights"])
+
+    return nodes, graph, meta
+
+
+def save_snapshot_arrays(path: str, name: str, arrays: dict) -> None:
+    """
+    Agrega al snapshot `path` una subcarpeta `name` con arrays derivados del
+    grafo (p.ej. preprocesamiento de rutas). Misma escritura atómica que
+    save_snapshot.
+    """
+    tmp_dir = tempfile.mkdtemp(prefix=f".{name}-", dir=path)
+    try:
+        for array_name, array in arrays.items():
+            np.save(os.path.join(tmp_dir, f"{array_name}.npy"), np.ascontiguousarray(array))
+        try:
+            os.replace(tmp_dir, os.path.join(path, name))
+        except OSError:
+            if not os.path.isdir(os.path.join(path, name)):
+                raise
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def load_snapshot_arrays(path: str, name: str, array_names) -> dict | None:
+    """Arrays de la subcarpeta `name` (mmap de solo lectura) o None si no está."""
+    directory = os.path.join(path, name)
+    if not os.path.isdir(directory):
+        return None
+    try:
+        return {
+            array_name: np.load(
+                os.path.join(directory, f"{array_name}.npy"), mmap_mode="r", allow_pickle=False
+            )
+            for array_name in array_names
+        }
+    except (OSError, ValueError) as ex:
+        print(f"⚠️ Arrays {name} inválidos en {path}: {ex}")
+        return None
+
+
+def prune_snapshots(path: str, mode: str, k: int | None = None, radius_km: float | None = None) -> None:
+    """Borra snapshots de los mismos parámetros que no sean `path` (datos viejos)."""
+    directory = os.path.dirname(path) or "."
+    pattern = os.path.join(directory, glob.escape(snapshot_prefix(mode, k, radius_km)) + "-v*")
+    for old in glob.glob(pattern):
+        if os.path.abspath(old) == os.path.abspath(path):
+            continue
+        # Los workers que ya lo tienen mapeado siguen leyendo sin problema:
+        # el archivo se libera cuando el último lo suelta
+        if os.path.isdir(old):
+            shutil.rmtree(old, ignore_errors=True)
+        else:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
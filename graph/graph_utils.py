@@ -1,7 +1,20 @@
 from math import radians, sin, cos, sqrt, atan2
 
+import numpy as np
+
+# Radio medio de la Tierra (IUGG) en km, el mismo que usaba el paquete haversine
+R_EARTH_KM = 6371.0088
+
+# Tamaño por defecto de bloque (filas) para las versiones por bloques
+DEFAULT_BLOCK_ROWS = 1024
+
+# Copias de cada bloque que viven a la vez (temporales del núcleo vectorizado
+# más la reducción posterior con argpartition), para estimar memoria pico
+_TEMPORARIES_PER_CELL = 8
+
+
 def haversine(lat1, lon1, lat2, lon2):
-    R = 6371  # Radio de la Tierra en KM
+    R = R_EARTH_KM
 
     dLat = radians(lat2 - lat1)
     dLon = radians(lon2 - lon1)
@@ -13,3 +26,133 @@ def haversine(lat1, lon1, lat2, lon2):
     c = 2 * atan2(sqrt(a), sqrt(1-a))
 
     return R * c
+
+
+# -----------------------------
+# Versiones vectorizadas (NumPy broadcast)
+# -----------------------------
+def _haversine_rad(lat1, lon1, lat2, lon2, cos_lat1=None, cos_lat2=None):
+    """
+    Núcleo vectorizado: recibe coordenadas YA en radianes (arrays que
+    hacen broadcast entre sí) y devuelve la distancia en km.
+    """
+    if cos_lat1 is None:
+        cos_lat1 = np.cos(lat1)
+    if cos_lat2 is None:
+        cos_lat2 = np.cos(lat2)
+
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2 +
+        cos_lat1 * cos_lat2 * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    # arcsin(sqrt(a)) == atan2(sqrt(a), sqrt(1-a)); el clip evita NaN por redondeo
+    return 2 * R_EARTH_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def _as_radians(values, dtype):
+    return np.radians(np.asarray(values, dtype=dtype))
+
+
+def haversine_pairwise(lats1, lons1, lats2, lons2, dtype=np.float64) -> np.ndarray:
+    """
+    Distancia elemento a elemento: (lats1[i], lons1[i]) -> (lats2[i], lons2[i]).
+    Los arrays deben tener la misma forma (o hacer broadcast).
+    """
+    return _haversine_rad(
+        _as_radians(lats1, dtype), _as_radians(lons1, dtype),
+        _as_radians(lats2, dtype), _as_radians(lons2, dtype),
+    ).astype(dtype, copy=False)
+
+
+def haversine_one_to_many(lat, lon, lats, lons, dtype=np.float64) -> np.ndarray:
+    """
+    Distancia desde UN punto (lat, lon) hacia muchos puntos.
+    Devuelve un array de forma (len(lats),).
+    """
+    lat_r = np.radians(dtype(lat))
+    lon_r = np.radians(dtype(lon))
+    return _haversine_rad(
+        lat_r, lon_r,
+        _as_radians(lats, dtype), _as_radians(lons, dtype),
+    ).astype(dtype, copy=False)
+
+
+def haversine_matrix(lats_a, lons_a, lats_b=None, lons_b=None, dtype=np.float64) -> np.ndarray:
+    """
+    Matriz de distancias A x B (km) con broadcast.
+    Si no se pasa B, calcula A x A (la diagonal queda en 0).
+
+    Usar dtype=np.float32 reduce a la mitad la memoria de la matriz.
+    """
+    if lats_b is None:
+        lats_b, lons_b = lats_a, lons_a
+
+    lat_a = _as_radians(lats_a, dtype)[:, None]
+    lon_a = _as_radians(lons_a, dtype)[:, None]
+    lat_b = _as_radians(lats_b, dtype)[None, :]
+    lon_b = _as_radians(lons_b, dtype)[None, :]
+
+    return _haversine_rad(lat_a, lon_a, lat_b, lon_b).astype(dtype, copy=False)
+
+
+def haversine_blocks(
+    lats_a,
+    lons_a,
+    lats_b=None,
+    lons_b=None,
+    block_rows: int = DEFAULT_BLOCK_ROWS,
+    dtype=np.float64,
+):
+    """
+    Igual que haversine_matrix, pero por bloques de filas para acotar memoria.
+    Genera tuplas (start, end, block) donde block = dist[start:end, :].
+    """
+    if lats_b is None:
+        lats_b, lons_b = lats_a, lons_a
+
+    lat_a = _as_radians(lats_a, dtype)
+    lon_a = _as_radians(lons_a, dtype)
+    lat_b = _as_radians(lats_b, dtype)[None, :]
+    lon_b = _as_radians(lons_b, dtype)[None, :]
+    cos_b = np.cos(lat_b)
+
+    block_rows = max(1, int(block_rows))
+    n = len(lat_a)
+
+    for start in range(0, n, block_rows):
+        end = min(start + block_rows, n)
+        lat_blk = lat_a[start:end, None]
+        block = _haversine_rad(
+            lat_blk, lon_a[start:end, None],
+            lat_b, lon_b,
+            cos_lat2=cos_b,
+        ).astype(dtype, copy=False)
+        yield start, end, block
+
+
+def block_rows_for_budget(n_cols: int, budget_bytes: int, dtype=np.float64) -> int:
+    """
+    Cuántas filas por bloque caben en `budget_bytes`, contando los arrays
+    temporales que crea el cálculo de cada bloque.
+    """
+    per_row = max(1, n_cols) * np.dtype(dtype).itemsize * _TEMPORARIES_PER_CELL
+    return max(1, int(budget_bytes // per_row))
+
+
+def haversine_fill(
+    out,
+    lats_a,
+    lons_a,
+    lats_b=None,
+    lons_b=None,
+    block_rows: int = DEFAULT_BLOCK_ROWS,
+):
+    """
+    Llena `out` (A x B, puede ser un np.memmap) con la matriz de distancias,
+    bloque por bloque, sin materializar la matriz completa en RAM.
+    """
+    for start, end, block in haversine_blocks(
+        lats_a, lons_a, lats_b, lons_b, block_rows=block_rows, dtype=out.dtype
+    ):
+        out[start:end] = block
+    return out
@@ -0,0 +1,231 @@
+import numpy as np
+
+from graph.graph_utils import haversine_one_to_many
+from graph.spatial_index import DynamicSpatialIndex, RadiusIndex
+
+
+class IncrementalKNN:
+    """
+    Estado de un grafo KNN que se puede mantener nodo a nodo.
+
+    Por cada posición de nodo guarda sus k vecinos ordenados por distancia:
+      - idx (n, k): posición del vecino (-1 si hay menos de k)
+      - dist (n, k): distancia en km (inf si hay menos de k)
+
+    Al insertar, mover o eliminar un nodo solo se recalculan la fila de ese
+    nodo y las filas cuyo k-ésimo vecino cambia; los candidatos salen del
+    índice espacial dinámico, no de recorrer todos los pares.
+
+    Una fila solo puede ganar o perder un nodo que esté dentro de su
+    distancia al k-ésimo vecino: esas bolas se guardan en un RadiusIndex
+    (por niveles de radio), así que los candidatos salen de las bolas que
+    contienen al nodo y no de un radio global que fija el nodo más aislado.
+    """
+
+    def __init__(self, k: int, lats, lons, src, dst, dist_km):
+        """
+        src/dst/dist_km: aristas del KNN ya construido, agrupadas por origen
+        y ordenadas por distancia dentro de cada origen.
+        """
+        self.k = int(k)
+        lats = np.asarray(lats, dtype=float)
+        lons = np.asarray(lons, dtype=float)
+        n = len(lats)
+
+        # Los arrays por posición tienen capacidad de sobra (se duplica al
+        # llenarse): insertar no copia todo el estado; lats, idx, etc. son
+        # vistas de las primeras n filas
+        self._n = n
+        self._lats = lats.copy()
+        self._lons = lons.copy()
+        self._idx = np.full((n, self.k), -1, dtype=np.int64)
+        self._dist = np.full((n, self.k), np.inf)
+        self._slot_of = np.arange(n, dtype=np.int64)
+
+        src = np.asarray(src, dtype=np.int64)
+        first = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=n), out=first[1:])
+        col = np.arange(len(src)) - first[src]
+        self._idx[src, col] = dst
+        self._dist[src, col] = dist_km
+
+        self.index = DynamicSpatialIndex(self.lats, self.lons)
+        # Posición <-> slot en el índice espacial
+        self.pos_of_slot = np.arange(n, dtype=np.int64)
+
+        # Bola de cada fila: radio = distancia al k-ésimo vecino (inf si hay menos de k)
+        self.reach = RadiusIndex(self.index)
+        self.reach.set_many(self.slot_of, self.dist[:, -1])
+
+    def __len__(self) -> int:
+        return self._n
+
+    @property
+    def lats(self) -> np.ndarray:
+        return self._lats[:self._n]
+
+    @property
+    def lons(self) -> np.ndarray:
+        return self._lons[:self._n]
+
+    @property
+    def idx(self) -> np.ndarray:
+        return self._idx[:self._n]
+
+    @property
+    def dist(self) -> np.ndarray:
+        return self._dist[:self._n]
+
+    @property
+    def slot_of(self) -> np.ndarray:
+        return self._slot_of[:self._n]
+
+    def _reserve(self, n: int) -> None:
+        """Asegura capacidad para n posiciones (duplicando, O(1) amortizado)."""
+        if n <= len(self._lats):
+            return
+        capacity = max(n, 2 * len(self._lats), 16)
+
+        def grown(array, fill):
+            out = np.full((capacity, *array.shape[1:]), fill, dtype=array.dtype)
+            out[:self._n] = array[:self._n]
+            return out
+
+        self._lats = grown(self._lats, np.nan)
+        self._lons = grown(self._lons, np.nan)
+        self._idx = grown(self._idx, -1)
+        self._dist = grown(self._dist, np.inf)
+        self._slot_of = grown(self._slot_of, -1)
+
+    # -----------------------------
+    # Utilidades internas
+    # -----------------------------
+    def _knn_of(self, pos: int):
+        """k vecinos de la posición `pos` (sin incluirse a sí misma)."""
+        dist_km, slots = self.index.query_point_knn(self.lats[pos], self.lons[pos], self.k + 1)
+        neigh = self.pos_of_slot[slots]
+        keep = neigh != pos
+        return neigh[keep][:self.k], dist_km[keep][:self.k]
+
+    def _set_row(self, pos: int, neigh, dist_km) -> None:
+        self.idx[pos] = -1
+        self.dist[pos] = np.inf
+        self.idx[pos, :len(neigh)] = neigh
+        self.dist[pos, :len(neigh)] = dist_km
+        self._track(pos)
+
+    def _track(self, pos: int) -> None:
+        """Actualiza la bola de la fila `pos` después de cambiarla."""
+        self.reach.set(int(self.slot_of[pos]), float(self.dist[pos, -1]))
+
+    def _candidates(self, pos: int) -> np.ndarray:
+        """Posiciones cuya bola (k-ésimo vecino) puede contener a `pos`."""
+        cand = self.pos_of_slot[self.reach.query(self.lats[pos], self.lons[pos])]
+        return cand[(cand >= 0) & (cand != pos)]
+
+    def _attach(self, pos: int) -> list[int]:
+        """
+        Calcula los vecinos de `pos` (ya presente en el índice) y lo agrega
+        como vecino en las filas donde queda más cerca que el k-ésimo actual.
+        Devuelve las posiciones cuyas filas cambiaron.
+        """
+        neigh, dist_km = self._knn_of(pos)
+        self._set_row(pos, neigh, dist_km)
+
+        cand = self._candidates(pos)
+
+        changed = []
+        if len(cand) == 0:
+            return changed
+
+        # Distancia exacta desde cada candidato hacia el nodo
+        d_cand = haversine_one_to_many(self.lats[pos], self.lons[pos], self.lats[cand], self.lons[cand])
+        closer = d_cand < self.dist[cand, -1]
+        for a, d in zip(cand[closer].tolist(), d_cand[closer].tolist()):
+            j = int(np.searchsorted(self.dist[a], d, side="right"))
+            self.idx[a] = np.insert(self.idx[a], j, pos)[:self.k]
+            self.dist[a] = np.insert(self.dist[a], j, d)[:self.k]
+            self._track(a)
+            changed.append(a)
+        return changed
+
+    def _detach(self, pos: int) -> list[int]:
+        """
+        Saca `pos` del índice y recalcula las filas que lo tenían como vecino.
+        Devuelve esas posiciones.
+        """
+        cand = self._candidates(pos)
+
+        slot = int(self.slot_of[pos])
+        self.reach.discard(slot)
+        self.index.remove(slot)
+        self.pos_of_slot[slot] = -1
+
+        affected = [int(a) for a in cand if (self.idx[a] == pos).any()]
+        for a in affected:
+            neigh, dist_km = self._knn_of(a)
+            self._set_row(a, neigh, dist_km)
+        return affected
+
+    def _register(self, pos: int) -> None:
+        slot = self.index.insert(self.lats[pos], self.lons[pos])
+        self.slot_of[pos] = slot
+        if slot >= len(self.pos_of_slot):
+            grow = np.full(slot + 1 - len(self.pos_of_slot), -1, dtype=np.int64)
+            self.pos_of_slot = np.concatenate((self.pos_of_slot, grow))
+        self.pos_of_slot[slot] = pos
+
+    # -----------------------------
+    # Operaciones públicas
+    # -----------------------------
+    def insert(self, lat: float, lon: float) -> tuple[int, list[int]]:
+        """
+        Agrega un nodo al final. Devuelve (posición nueva, filas modificadas).
+        """
+        pos = len(self)
+        self._reserve(pos + 1)
+        self._n = pos + 1
+        self.lats[pos] = float(lat)
+        self.lons[pos] = float(lon)
+        self.idx[pos] = -1
+        self.dist[pos] = np.inf
+        self.slot_of[pos] = -1
+        self._register(pos)
+
+        changed = self._attach(pos)
+        return pos, [pos] + changed
+
+    def move(self, pos: int, lat: float, lon: float) -> list[int]:
+        """Cambia las coordenadas de un nodo. Devuelve las filas modificadas."""
+        changed = self._detach(pos)
+        self.lats[pos] = float(lat)
+        self.lons[pos] = float(lon)
+        self._register(pos)
+        changed += self._attach(pos)
+        return sorted(set(changed) | {pos})
+
+    def remove(self, pos: int) -> list[int]:
+        """
+        Elimina un nodo; las posiciones mayores bajan en uno.
+        Devuelve las filas modificadas (ya con la numeración nueva).
+        """
+        changed = self._detach(pos)
+
+        # Las filas posteriores bajan una posición (dentro de la capacidad)
+        n = self._n
+        for array in (self._lats, self._lons, self._idx, self._dist, self._slot_of):
+            array[pos:n - 1] = array[pos + 1:n]
+        self._n = n - 1
+
+        # Renumerar posiciones posteriores
+        idx = self.idx
+        idx[idx > pos] -= 1
+        self.pos_of_slot[self.pos_of_slot > pos] -= 1
+
+        return sorted(a - 1 if a > pos else a for a in changed)
+
+    def edge_arrays(self):
+        """(src, dst, dist_km) de todas las aristas, por fila y en orden de distancia."""
+        keep = self.idx >= 0
+        src = np.broadcast_to(np.arange(len(self))[:, None], self.idx.shape)[keep]
+        return src, self.idx[keep], self.dist[keep]
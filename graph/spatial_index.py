@@ -0,0 +1,316 @@
+import math
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from graph.graph_utils import R_EARTH_KM
+
+
+def latlon_to_xyz(lats, lons) -> np.ndarray:
+    """
+    Convierte (lat, lon) en grados a coordenadas 3D sobre la esfera unitaria.
+    Devuelve un array de forma (n, 3).
+    """
+    lat = np.radians(np.asarray(lats, dtype=float))
+    lon = np.radians(np.asarray(lons, dtype=float))
+    cos_lat = np.cos(lat)
+    return np.column_stack((cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)))
+
+
+def chord_to_km(chord):
+    """Cuerda en la esfera unitaria -> distancia de círculo máximo (km)."""
+    return 2 * R_EARTH_KM * np.arcsin(np.clip(np.asarray(chord) / 2, 0.0, 1.0))
+
+
+def km_to_chord(km):
+    """Distancia de círculo máximo (km) -> cuerda en la esfera unitaria."""
+    angle = np.minimum(np.asarray(km, dtype=float) / R_EARTH_KM, np.pi)
+    return 2 * np.sin(angle / 2)
+
+
+class SpatialIndex:
+    """
+    Índice espacial (KD-tree) sobre la esfera unitaria.
+
+    La distancia euclidiana (cuerda) entre puntos 3D es monótona con la
+    distancia de círculo máximo, así que los vecinos más cercanos por cuerda
+    son exactamente los vecinos más cercanos por haversine.
+    """
+
+    def __init__(self, lats, lons):
+        self.xyz = latlon_to_xyz(lats, lons)
+        self.tree = cKDTree(self.xyz)
+
+    def __len__(self) -> int:
+        return len(self.xyz)
+
+    def query_knn(self, k: int, lats=None, lons=None):
+        """
+        k vecinos más cercanos.
+        Si no se pasan coordenadas, consulta con los propios puntos del índice
+        (el punto mismo aparece como su vecino a distancia 0).
+
+        Devuelve:
+          - dist_km (np.ndarray): (m, k) distancias en km, ordenadas
+          - idx (np.ndarray): (m, k) índices de los vecinos
+        """
+        xyz = self.xyz if lats is None else latlon_to_xyz(lats, lons)
+        k = min(int(k), len(self))
+
+        if k <= 0 or len(xyz) == 0:
+            empty = np.empty((len(xyz), 0))
+            return empty, empty.astype(np.intp)
+
+        chord, idx = self.tree.query(xyz, k=k)
+        # Con k=1 scipy devuelve vectores; normalizamos a (m, k)
+        chord = np.asarray(chord).reshape(len(xyz), k)
+        idx = np.asarray(idx).reshape(len(xyz), k)
+        return chord_to_km(chord), idx
+
+    def query_pairs(self, radius_km: float):
+        """
+        Todos los pares (i, j), i != j, con distancia <= radius_km.
+        Usa la consulta por bola del KD-tree, así que el costo depende del
+        número de pares encontrados y no de n^2.
+
+        Devuelve arrays (src, dst, dist_km) con ambas direcciones de cada par.
+        """
+        pairs = self.tree.query_pairs(float(km_to_chord(radius_km)), output_type="ndarray")
+        i, j = pairs[:, 0], pairs[:, 1]
+
+        dist_km = chord_to_km(np.linalg.norm(self.xyz[i] - self.xyz[j], axis=1))
+        # Filtro exacto en km (la conversión cuerda <-> km redondea en el borde)
+        inside = dist_km <= radius_km
+        i, j, dist_km = i[inside], j[inside], dist_km[inside]
+
+        return (
+            np.concatenate((i, j)),
+            np.concatenate((j, i)),
+            np.concatenate((dist_km, dist_km)),
+        )
+
+
+class DynamicSpatialIndex:
+    """
+    Índice espacial que admite insertar y eliminar puntos uno a uno.
+
+    Cada punto tiene un "slot" entero estable. Los puntos nuevos quedan en un
+    buffer que se revisa por fuerza bruta y los eliminados se marcan como
+    muertos; cuando buffer + muertos superan `rebuild_ratio` del árbol, el
+    KD-tree se reconstruye solo con los slots vivos.
+    """
+
+    def __init__(self, lats, lons, rebuild_ratio: float = 0.05, min_rebuild: int = 32):
+        self.xyz = latlon_to_xyz(lats, lons)
+        self.alive = np.ones(len(self.xyz), dtype=bool)
+        self.rebuild_ratio = rebuild_ratio
+        self.min_rebuild = min_rebuild
+        self._rebuild()
+
+    def __len__(self) -> int:
+        return int(self.alive.sum())
+
+    def _rebuild(self) -> None:
+        self._tree_slots = np.flatnonzero(self.alive)
+        self.tree = cKDTree(self.xyz[self._tree_slots])
+        self._buffer_slots: list[int] = []
+        self._dead_in_tree = 0
+
+    def _maybe_rebuild(self) -> None:
+        pending = len(self._buffer_slots) + self._dead_in_tree
+        if pending > max(self.min_rebuild, self.rebuild_ratio * len(self._tree_slots)):
+            self._rebuild()
+
+    # -----------------------------
+    # Altas y bajas
+    # -----------------------------
+    def insert(self, lat: float, lon: float) -> int:
+        """Agrega un punto y devuelve su slot."""
+        slot = len(self.xyz)
+        self.xyz = np.vstack((self.xyz, latlon_to_xyz([lat], [lon])))
+        self.alive = np.append(self.alive, True)
+        self._buffer_slots.append(slot)
+        self._maybe_rebuild()
+        return slot
+
+    def remove(self, slot: int) -> None:
+        """Marca un slot como eliminado."""
+        if not self.alive[slot]:
+            return
+        self.alive[slot] = False
+        if slot in self._buffer_slots:
+            self._buffer_slots.remove(slot)
+        else:
+            self._dead_in_tree += 1
+        self._maybe_rebuild()
+
+    # -----------------------------
+    # Consultas de un punto
+    # -----------------------------
+    def query_point_knn(self, lat: float, lon: float, k: int):
+        """
+        k slots vivos más cercanos a (lat, lon).
+        Devuelve (dist_km, slots), ambos ordenados por distancia.
+        """
+        xyz = latlon_to_xyz([lat], [lon])[0]
+        chords, slots = [], []
+
+        # Árbol: se piden k + muertos para que sobren k vivos
+        k_tree = min(int(k) + self._dead_in_tree, len(self._tree_slots))
+        if k_tree > 0:
+            chord, pos = self.tree.query(xyz, k=k_tree)
+            chords.append(np.atleast_1d(chord))
+            slots.append(self._tree_slots[np.atleast_1d(pos)])
+
+        # Buffer: fuerza bruta
+        if self._buffer_slots:
+            buf = np.array(self._buffer_slots, dtype=np.intp)
+            chords.append(np.linalg.norm(self.xyz[buf] - xyz, axis=1))
+            slots.append(buf)
+
+        if not chords:
+            return np.empty(0), np.empty(0, dtype=np.intp)
+
+        chord = np.concatenate(chords)
+        slot = np.concatenate(slots)
+        live = self.alive[slot]
+        chord, slot = chord[live], slot[live]
+
+        order = np.argsort(chord, kind="stable")[:k]
+        return chord_to_km(chord[order]), slot[order]
+
+    def query_point_ball(self, lat: float, lon: float, radius_km: float):
+        """
+        Slots vivos a distancia <= radius_km de (lat, lon).
+        Devuelve (dist_km, slots) sin orden particular.
+        """
+        xyz = latlon_to_xyz([lat], [lon])[0]
+        slot = self._tree_slots[self.tree.query_ball_point(xyz, float(km_to_chord(radius_km)))]
+
+        if self._buffer_slots:
+            slot = np.concatenate((slot, np.array(self._buffer_slots, dtype=np.intp)))
+
+        slot = slot[self.alive[slot]]
+        dist_km = chord_to_km(np.linalg.norm(self.xyz[slot] - xyz, axis=1))
+        inside = dist_km <= radius_km
+        return dist_km[inside], slot[inside]
+
+
+# Radio del primer nivel de RadiusIndex (los demás lo duplican)
+RADIUS_BASE_KM = 0.5
+NO_LEVEL = -2
+
+
+class _RadiusLevel:
+    """Slots de un mismo nivel de radio: KD-tree + buffer de altas recientes."""
+
+    def __init__(self):
+        self.members: set[int] = set()
+        self.tree = None
+        self.tree_slots = np.empty(0, dtype=np.intp)
+        self.buffer: list[int] = []
+        self.stale = 0
+
+
+class RadiusIndex:
+    """
+    Índice de bolas: cada slot de un DynamicSpatialIndex tiene un radio y
+    query() devuelve los slots cuya bola (centro en el slot) contiene un
+    punto. Sirve para "qué filas del KNN pueden ganar o perder a este nodo",
+    con radio = distancia al k-ésimo vecino de cada fila.
+
+    Los slots se agrupan por niveles de radio (hasta RADIUS_BASE_KM·2^nivel; inf
+    aparte) y cada nivel tiene su propio KD-tree. En cada nivel se busca
+    con el radio del nivel, así que un nodo aislado con radio grande no
+    agranda la búsqueda de los demás; como las bolas de un nivel contienen
+    a lo sumo k puntos, en cada nivel aparecen pocos slots cerca del punto.
+
+    Igual que DynamicSpatialIndex, los cambios van a un buffer y las
+    entradas viejas del árbol se descartan al consultar; cada nivel se
+    reconstruye cuando buffer + viejas superan `rebuild_ratio` del nivel.
+    """
+
+    def __init__(self, points: DynamicSpatialIndex, rebuild_ratio: float = 0.05, min_rebuild: int = 32):
+        self.points = points
+        self.rebuild_ratio = rebuild_ratio
+        self.min_rebuild = min_rebuild
+        self._levels: dict[int, _RadiusLevel] = {}
+        # Nivel actual de cada slot (NO_LEVEL = sin radio); array para
+        # filtrar entradas viejas de a muchas
+        self._level_of = np.full(len(points.xyz), NO_LEVEL, dtype=np.int16)
+
+    def _level(self, radius_km: float) -> int:
+        """Nivel del radio (-1 = infinito)."""
+        if math.isinf(radius_km):
+            return -1
+        return max(0, math.ceil(math.log2(max(radius_km, RADIUS_BASE_KM) / RADIUS_BASE_KM)))
+
+    def set_many(self, slots, radii_km) -> None:
+        """Asigna radios a muchos slots a la vez (armado inicial)."""
+        for slot, radius_km in zip(np.asarray(slots).tolist(), np.asarray(radii_km, dtype=float).tolist()):
+            self.set(slot, radius_km)
+
+    def set(self, slot: int, radius_km: float) -> None:
+        level = self._level(radius_km)
+        if slot >= len(self._level_of):
+            grown = np.full(max(slot + 1, 2 * len(self._level_of)), NO_LEVEL, dtype=np.int16)
+            grown[:len(self._level_of)] = self._level_of
+            self._level_of = grown
+        old = int(self._level_of[slot])
+        if old == level:
+            return
+        if old != NO_LEVEL:
+            self.discard(slot)
+        entry = self._levels.setdefault(level, _RadiusLevel())
+        entry.members.add(slot)
+        entry.buffer.append(slot)
+        self._level_of[slot] = level
+
+    def discard(self, slot: int) -> None:
+        if slot >= len(self._level_of) or self._level_of[slot] == NO_LEVEL:
+            return
+        level = int(self._level_of[slot])
+        self._level_of[slot] = NO_LEVEL
+        entry = self._levels[level]
+        entry.members.discard(slot)
+        entry.stale += 1
+
+    def _maybe_rebuild(self, entry: _RadiusLevel) -> None:
+        pending = len(entry.buffer) + entry.stale
+        if pending > max(self.min_rebuild, self.rebuild_ratio * len(entry.members)):
+            entry.tree_slots = np.fromiter(entry.members, dtype=np.intp, count=len(entry.members))
+            entry.tree = cKDTree(self.points.xyz[entry.tree_slots]) if len(entry.tree_slots) else None
+            entry.buffer = []
+            entry.stale = 0
+
+    def query(self, lat: float, lon: float) -> np.ndarray:
+        """
+        Slots cuya bola puede contener (lat, lon): todos los que la contienen
+        y algunos más (se busca con el radio máximo de cada nivel).
+        """
+        xyz = latlon_to_xyz([lat], [lon])[0]
+        found = []
+        for level, entry in self._levels.items():
+            if not entry.members:
+                continue
+            if level < 0:
+                found.append(np.fromiter(entry.members, dtype=np.intp, count=len(entry.members)))
+                continue
+
+            self._maybe_rebuild(entry)
+            # Margen mínimo para el redondeo cuerda <-> haversine
+            chord = float(km_to_chord(RADIUS_BASE_KM * 2.0 ** level * (1 + 1e-9)))
+            hits = []
+            if entry.tree is not None:
+                hits.append(entry.tree_slots[entry.tree.query_ball_point(xyz, chord)])
+            if entry.buffer:
+                buf = np.array(entry.buffer, dtype=np.intp)
+                hits.append(buf[np.linalg.norm(self.points.xyz[buf] - xyz, axis=1) <= chord])
+            if hits:
+                slots = np.concatenate(hits)
+                # Entradas viejas: el slot cambió de nivel o se eliminó
+                found.append(slots[self._level_of[slots] == level])
+
+        if not found:
+            return np.empty(0, dtype=np.intp)
+        return np.unique(np.concatenate(found))
@@ -0,0 +1,95 @@
+import numpy as np
+
+# Zoom más fino del índice: cualquier tile de zoom <= MAX_ZOOM es un rango
+# contiguo de códigos
+MAX_ZOOM = 20
+# Latitud máxima representable en Web Mercator
+MAX_LAT = 85.05112878
+
+
+def lonlat_to_tile(lons, lats, zoom: int):
+    """Coordenadas (x, y) de tile Web Mercator (enteros) para el zoom dado."""
+    lat = np.radians(np.clip(np.asarray(lats, dtype=float), -MAX_LAT, MAX_LAT))
+    lon = np.asarray(lons, dtype=float)
+    n = 1 << zoom
+
+    x = np.floor((lon + 180.0) / 360.0 * n)
+    y = np.floor((1.0 - np.arcsinh(np.tan(lat)) / np.pi) / 2.0 * n)
+    return np.clip(x, 0, n - 1).astype(np.int64), np.clip(y, 0, n - 1).astype(np.int64)
+
+
+def tiles_for_bbox(min_lon, min_lat, max_lon, max_lat, zoom: int, max_tiles: int | None = None) -> list[tuple[int, int]]:
+    """
+    Tiles (x, y) del zoom dado que cubren el bbox.
+    ValueError si son más de max_tiles (se revisa antes de armar la lista).
+    """
+    (x0, x1), (y1, y0) = lonlat_to_tile([min_lon, max_lon], [min_lat, max_lat], zoom)
+    count = int(x1 - x0 + 1) * int(y1 - y0 + 1)
+    if max_tiles is not None and count > max_tiles:
+        raise ValueError(
+            f"El bbox cubre {count} tiles en zoom {zoom} (máximo {max_tiles}); usar un zoom menor"
+        )
+    return [(x, y) for y in range(int(y0), int(y1) + 1) for x in range(int(x0), int(x1) + 1)]
+
+
+def _spread_bits(v: np.ndarray) -> np.ndarray:
+    """Separa los bits de v (hasta 32 bits) dejando un cero entre cada uno."""
+    v = v.astype(np.uint64) & np.uint64(0xFFFFFFFF)
+    for shift, mask in (
+        (16, 0x0000FFFF0000FFFF),
+        (8, 0x00FF00FF00FF00FF),
+        (4, 0x0F0F0F0F0F0F0F0F),
+        (2, 0x3333333333333333),
+        (1, 0x5555555555555555),
+    ):
+        v = (v | (v << np.uint64(shift))) & np.uint64(mask)
+    return v
+
+
+def morton_code(x, y) -> np.ndarray:
+    """Código Z-order (quadkey numérico) de tiles (x, y)."""
+    return (_spread_bits(np.asarray(y)) << np.uint64(1)) | _spread_bits(np.asarray(x))
+
+
+class TileIndex:
+    """
+    Índice espacial por tiles (quadtree linealizado).
+
+    Cada nodo se ubica en su tile de zoom MAX_ZOOM y los nodos se ordenan
+    por código Z-order; como el código de un tile de zoom z es prefijo del
+    de todos sus sub-tiles, los nodos de cualquier tile son un rango
+    contiguo que se encuentra con dos búsquedas binarias.
+    """
+
+    def __init__(self, lats, lons):
+        x, y = lonlat_to_tile(lons, lats, MAX_ZOOM)
+        codes = morton_code(x, y)
+        self.order = np.argsort(codes, kind="stable")
+        self.codes = codes[self.order]
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def _range(self, zoom: int, x: int, y: int) -> tuple[int, int]:
+        shift = np.uint64(2 * (MAX_ZOOM - zoom))
+        prefix = morton_code(np.array([x]), np.array([y]))[0]
+        lo = prefix << shift
+        hi = (prefix + np.uint64(1)) << shift
+        return (
+            int(np.searchsorted(self.codes, lo, side="left")),
+            int(np.searchsorted(self.codes, hi, side="left")),
+        )
+
+    def nodes_in_tile(self, zoom: int, x: int, y: int) -> np.ndarray:
+        """Posiciones de los nodos dentro del tile (zoom, x, y)."""
+        start, end = self._range(zoom, x, y)
+        return self.order[start:end]
+
+    def cells_in_tile(self, zoom: int, x: int, y: int, cell_zoom: int):
+        """
+        Nodos del tile agrupados en sub-tiles de zoom `cell_zoom`.
+        Devuelve (posiciones, código de celda de cada posición), en orden.
+        """
+        start, end = self._range(zoom, x, y)
+        shift = np.uint64(2 * (MAX_ZOOM - cell_zoom))
+        return self.order[start:end], self.codes[start:end] >> shift
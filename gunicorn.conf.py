@@ -0,0 +1,29 @@
+# Configuración de gunicorn:  gunicorn -c gunicorn.conf.py app:app
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("GUNICORN_WORKERS", "4"))
+
+
+def on_starting(server):
+    """
+    Antes de crear los workers deja construido el snapshot del grafo KNN
+    por defecto. Así cada worker solo mapea los arrays del snapshot (solo
+    lectura, páginas compartidas) en vez de construir su propia copia.
+    Con GRAPH_CH_PRECOMPUTE=1 también arma ahí la jerarquía de contracción
+    (segundos; queda en el snapshot y los workers solo la cargan).
+    """
+    from app import app
+    from db import db
+    from services.routing_service import RoutingService
+    from shared.config import Config
+
+    try:
+        with app.app_context():
+            service = RoutingService()
+            if Config.GRAPH_CH_PRECOMPUTE:
+                service.contraction_hierarchy()
+            # Que los workers no hereden conexiones abiertas del master
+            db.engine.dispose()
+    except Exception as ex:
+        print(f"⚠️ No se pudo preparar el snapshot del grafo: {ex}")
@@ -3,7 +3,7 @@
 from flask import Blueprint, jsonify, request
 from db import db
 from models import Patient, Hospital
-from services.business_assignment_service import BusinessAssignmentService
+from services.business_assignment_service import BusinessAssignmentService, parse_path_algorithms
 
 business_bp = Blueprint("business", __name__, url_prefix="/api")
 
@@ -128,7 +128,9 @@ def post_api_assign_compare_patient():
 
     Para un paciente dado (por su código), ejecuta:
       - 3 algoritmos de asignación (Greedy, Hungarian, Min-Cost Max-Flow)
-      - Para cada asignación, 2 algoritmos de ruta (Dijkstra, Bellman-Ford)
+      - Para cada asignación, algoritmos de ruta (por defecto Dijkstra y
+        Bellman-Ford; path_algorithms permite agregar "spfa", "astar" y
+        "hospital_table")
       - 3 algoritmos de redes (Kruskal, Prim, Edmonds-Karp)
 
     Ahora también permite elegir el tipo de grafo:
@@ -160,6 +162,11 @@ def post_api_assign_compare_patient():
             radius_km:
               type: number
               example: 50.0
+            path_algorithms:
+              type: array
+              items:
+                type: string
+              example: ["dijkstra", "bellman_ford", "astar"]
     responses:
       200:
         description: Resultados de todos los algoritmos
@@ -176,6 +183,11 @@ def post_api_assign_compare_patient():
             "error": "Debe enviar 'patient_code' (ej. 'P0001')"
         }), 400
 
+    try:
+        path_algorithms = parse_path_algorithms(body.get("path_algorithms"))
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+
     graph_mode = body.get("graph_mode") or body.get("graph")  # opcional
     k = body.get("k")
     radius_km = body.get("radius_km") or body.get("radius")
@@ -186,7 +198,9 @@ def post_api_assign_compare_patient():
         # Configurar grafo según lo que pidió el front (si envía algo)
         service.configure_graph(graph_mode, k=k, radius_km=radius_km)
 
-        result = service.compare_all_algorithms_for_patient(patient_code)
+        result = service.compare_all_algorithms_for_patient(
+            patient_code, path_algorithms
+        )
         # opcional: incluir info del grafo usado
         result["graph_config"] = {
             "graph_mode": graph_mode,
@@ -210,7 +224,7 @@ def post_api_assign_patient_best():
 
     Además devuelve:
       - Distancia geográfica paciente-hospital
-      - Ruta Dijkstra y Bellman-Ford en el grafo
+      - Rutas en el grafo (Dijkstra y Bellman-Ford, o las de path_algorithms)
 
     Ahora también permite elegir el tipo de grafo:
       - graph_mode: "knn", "radius", "bipartite_knn"
@@ -241,11 +255,16 @@ def post_api_assign_patient_best():
             radius_km:
               type: number
               example: 50.0
+            path_algorithms:
+              type: array
+              items:
+                type: string
+              example: ["dijkstra", "astar"]
     responses:
       200:
         description: Hospital asignado y detalles de ruta
       400:
-        description: Petición inválida (falta patient_code)
+        description: Petición inválida (falta patient_code o path_algorithms inválido)
       404:
         description: Paciente no encontrado o sin hospital asignable
     """
@@ -257,6 +276,11 @@ def post_api_assign_patient_best():
             "error": "Debe enviar 'patient_code' (ej. 'P0001')"
         }), 400
 
+    try:
+        path_algorithms = parse_path_algorithms(body.get("path_algorithms"))
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+
     graph_mode = body.get("graph_mode") or body.get("graph")
     k = body.get("k")
     radius_km = body.get("radius_km") or body.get("radius")
@@ -267,7 +291,9 @@ def post_api_assign_patient_best():
         # Configurar grafo según selección del front
         service.configure_graph(graph_mode, k=k, radius_km=radius_km)
 
-        result = service.assign_best_hospital_for_patient(patient_code)
+        result = service.assign_best_hospital_for_patient(
+            patient_code, path_algorithms
+        )
         result["graph_config"] = {
             "graph_mode": graph_mode,
             "k": k,
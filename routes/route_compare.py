@@ -1,13 +1,12 @@
 from flask import Blueprint, jsonify
 import time
 
-from services.routing_service import RoutingService
+from services.graph_registry import graph_registry
 from db import db
 from models import Patient, Hospital
 
 from algorithms.dijkstra import dijkstra
 from algorithms.bellman_ford import bellman_ford
-from algorithms.floyd_warshall import floyd_warshall, get_fw_path
 
 from algorithms.greedy import greedy_assign
 from algorithms.hungarian import hungarian
@@ -19,17 +18,6 @@ from algorithms.edmonds_karp import edmonds_karp
 
 compare_bp = Blueprint("compare", __name__, url_prefix="/api/compare")
 
-_routing_service = None
-_graph_cache = None
-
-
-def get_graph():
-    global _routing_service, _graph_cache
-    if _graph_cache is None:
-        _routing_service = RoutingService()
-        _graph_cache = _routing_service.get_graph()
-    return _graph_cache
-
 
 def load_data_from_db():
     """Carga pacientes y hospitales para los algoritmos de asignación."""
@@ -55,8 +43,18 @@ def compare_all(start, end):
     Compara los 9 algoritmos principales.
     start y end son IDs de nodos del grafo: ej. 'P_1', 'H_3'
     """
-    graph = get_graph()
+    service = graph_registry.get_service()
+    graph = service.get_graph()
+    # Si start y end están en componentes distintas no hay camino: los
+    # algoritmos de ruta no se corren (igual que en /api/path/*)
+    components = service.components().pair_info(start, end)
+    if components is None:
+        for node in (start, end):
+            if node not in graph.ids:
+                return jsonify({"error": f"Nodo {node} no existe en el grafo"}), 404
+    connected = components is None or components["same"]
     results = {
+        "components": components,
         "paths": [],
         "assignment": [],
         "network": [],
@@ -66,41 +64,61 @@ def compare_all(start, end):
     #  A) ALGORITMOS DE RUTA
     # ======================
 
-    # 1) Dijkstra
-    t0 = time.time()
-    _dist_d, _path_d = dijkstra(graph, start, end)
-    t1 = time.time()
-    results["paths"].append({
-        "algorithm": "Dijkstra",
-        "category": "Ruta más corta",
-        "big_o": "O(E log V)",
-        "time_ms": (t1 - t0) * 1000,
-    })
-
-    # 2) Bellman-Ford
-    t0 = time.time()
-    _dist_b, _path_b = bellman_ford(graph, start, end)
-    t1 = time.time()
-    results["paths"].append({
-        "algorithm": "Bellman-Ford",
-        "category": "Ruta más corta",
-        "big_o": "O(V·E)",
-        "time_ms": (t1 - t0) * 1000,
-    })
-
-    # 3) Floyd-Warshall
-    # OJO: puede ser pesado con muchos nodos. Si se tarda demasiado,
-    # puedes limitar el grafo a un subconjunto de nodos.
-    #t0 = time.time()
-   #nodes, dist_matrix, next_hop = floyd_warshall(graph)
-    #_ = get_fw_path(start, end, nodes, next_hop)
-    #t1 = time.time()
-    #results["paths"].append({
-       # "algorithm": "Floyd-Warshall",
-      #  "category": "Ruta más corta",
-     #   "big_o": "O(n^3)",
-    #    "time_ms": (t1 - t0) * 1000,
-   # })
+    if not connected:
+        for algorithm, big_o in (("Dijkstra", "O(E log V)"), ("Bellman-Ford", "O(V·E)"), ("Floyd-Warshall", "O(n^3)")):
+            results["paths"].append({
+                "algorithm": algorithm,
+                "category": "Ruta más corta",
+                "big_o": big_o,
+                "time_ms": 0.0,
+                "skipped": "start y end están en componentes distintas (sin camino)",
+            })
+    else:
+        # 1) Dijkstra
+        t0 = time.time()
+        _dist_d, _path_d = dijkstra(graph, start, end)
+        t1 = time.time()
+        results["paths"].append({
+            "algorithm": "Dijkstra",
+            "category": "Ruta más corta",
+            "big_o": "O(E log V)",
+            "time_ms": (t1 - t0) * 1000,
+        })
+
+        # 2) Bellman-Ford
+        t0 = time.time()
+        _dist_b, _path_b = bellman_ford(graph, start, end)
+        t1 = time.time()
+        results["paths"].append({
+            "algorithm": "Bellman-Ford",
+            "category": "Ruta más corta",
+            "big_o": "O(V·E)",
+            "time_ms": (t1 - t0) * 1000,
+        })
+
+        # 3) Floyd-Warshall (vectorizado; la matriz se calcula una vez por
+        # versión del grafo y queda en el snapshot). Se informan por separado
+        # el preprocesamiento (solo la primera vez) y la consulta a la
+        # matriz, que es lo comparable con Dijkstra y Bellman-Ford.
+        floyd = {
+            "algorithm": "Floyd-Warshall",
+            "category": "Ruta más corta",
+            "big_o": "O(n^3) preproceso, O(largo de ruta) consulta",
+        }
+        t0 = time.time()
+        try:
+            all_pairs = service.all_pairs()
+        except ValueError as ve:
+            floyd["skipped"] = str(ve)
+            floyd["time_ms"] = 0.0
+        else:
+            t1 = time.time()
+            if start in all_pairs and end in all_pairs:
+                _ = all_pairs.path(start, end)
+            t2 = time.time()
+            floyd["preprocess_ms"] = (t1 - t0) * 1000
+            floyd["time_ms"] = (t2 - t1) * 1000
+        results["paths"].append(floyd)
 
     # ========================
     #  B) ALGORITMOS ASIGNACIÓN
@@ -1,9 +1,42 @@
 # routes/route_data.py
 from flask import Blueprint, jsonify, request
 from models import Patient, Hospital
+from utils.http_utils import requested_stream_format, stream_response
 
 data_bp = Blueprint("data", __name__, url_prefix="/api")
 
+# Filas que se traen de la BD por vuelta al hacer streaming
+STREAM_YIELD_PER = 1000
+
+
+def _patient_dict(p) -> dict:
+    return {
+        "code": p.code,
+        "severity": p.severity,
+        "department": p.department,
+        "lat": p.lat,
+        "lon": p.lon,
+        "disease": p.disease,
+    }
+
+
+def _hospital_dict(h) -> dict:
+    return {
+        "code": h.code,
+        "name": h.name,
+        "department": h.department,
+        "lat": h.lat,
+        "lon": h.lon,
+        "specialties": h.specialties,
+        "capacity": h.capacity,
+    }
+
+
+def _stream_rows(query, to_dict):
+    """Recorre la query de a STREAM_YIELD_PER filas, sin cargar la lista completa."""
+    for row in query.yield_per(STREAM_YIELD_PER):
+        yield to_dict(row)
+
 
 @data_bp.get("/patients")
 def get_patients():
@@ -24,6 +57,12 @@ def get_patients():
         type: string
         required: false
         description: Filtrar por departamento
+      - name: stream
+        in: query
+        type: string
+        required: false
+        enum: [json, ndjson]
+        description: Enviar la respuesta en streaming
     responses:
       200:
         description: Lista de pacientes
@@ -52,6 +91,10 @@ def get_patients():
     """
     limit = request.args.get("limit", 100, type=int)
     department = request.args.get("department", None, type=str)
+    try:
+        stream = requested_stream_format()
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
     
     query = Patient.query
     
@@ -63,19 +106,19 @@ def get_patients():
     total = query.count()
     
     # Limitar resultados
+    if stream:
+        return stream_response(
+            {"total": total, "returned": min(total, max(limit, 0))},
+            [("patients", "patient", _stream_rows(query.limit(limit), _patient_dict))],
+            stream,
+        )
+
     patients = query.limit(limit).all()
     
     return jsonify({
         "total": total,
         "returned": len(patients),
-        "patients": [{
-            "code": p.code,
-            "severity": p.severity,
-            "department": p.department,
-            "lat": p.lat,
-            "lon": p.lon,
-            "disease": p.disease,
-        } for p in patients]
+        "patients": [_patient_dict(p) for p in patients]
     })
 
 
@@ -92,6 +135,12 @@ def get_hospitals():
         type: string
         required: false
         description: Filtrar por departamento
+      - name: stream
+        in: query
+        type: string
+        required: false
+        enum: [json, ndjson]
+        description: Enviar la respuesta en streaming
     responses:
       200:
         description: Lista de hospitales
@@ -121,25 +170,28 @@ def get_hospitals():
                     type: integer
     """
     department = request.args.get("department", None, type=str)
+    try:
+        stream = requested_stream_format()
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
     
     query = Hospital.query
     
     if department:
         query = query.filter(Hospital.department == department)
     
+    if stream:
+        return stream_response(
+            {"total": query.count()},
+            [("hospitals", "hospital", _stream_rows(query, _hospital_dict))],
+            stream,
+        )
+
     hospitals = query.all()
     
     return jsonify({
         "total": len(hospitals),
-        "hospitals": [{
-            "code": h.code,
-            "name": h.name,
-            "department": h.department,
-            "lat": h.lat,
-            "lon": h.lon,
-            "specialties": h.specialties,
-            "capacity": h.capacity,
-        } for h in hospitals]
+        "hospitals": [_hospital_dict(h) for h in hospitals]
     })
 
 
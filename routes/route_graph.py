@@ -5,35 +5,109 @@ import time
 
 from shared.config import Config
 from graph.graph_builder import GraphBuilder
+from graph.graph_binary import BINARY_MIMETYPE, encode_graph_binary
 from models import Patient, Hospital
 from db import db
+from services.graph_registry import graph_registry
+from services.path_cache import sp_tree_cache
+from services.response_cache import ResponseCache
+from services.tile_service import TileService
+from graph.tile_index import MAX_ZOOM
+from utils.http_utils import EncodedPayload, parse_bbox, requested_stream_format, stream_response
 
 graph_bp = Blueprint("graph", __name__, url_prefix="/api/graph")
 
-# Cache global para evitar reconstruir grafos constantemente
-_graph_cache = {}
+# Cache de respuestas para no reconstruir grafos constantemente: acotada por
+# cantidad de entradas y bytes (LRU), con TTL, y se vacía cuando cambia la
+# versión de los datos. Guarda el JSON ya serializado y comprimido, así que
+# un hit no vuelve a pasar por jsonify
+_response_cache = ResponseCache(
+    max_entries=Config.GRAPH_RESPONSE_CACHE_MAX_ENTRIES,
+    max_bytes=Config.GRAPH_RESPONSE_CACHE_MAX_MB * 1024 * 1024,
+    ttl_seconds=Config.GRAPH_RESPONSE_CACHE_TTL_SECONDS,
+)
+graph_registry.add_version_listener(_response_cache.set_version)
 
+# Tiles del grafo KNN compartido (se rearma si el registro entrega otro grafo)
+_tile_service: TileService | None = None
 
-def _build_nodes_response(nodes, edges):
-    """Formatea nodos y aristas para la respuesta JSON."""
-    nodes_list = [
-        {
+
+def _cache_key(kind: str, *params):
+    """Clave de cache: tipo de grafo + parámetros + versión de datos."""
+    return (kind, *params, graph_registry.dataset_version())
+
+
+def _requested_output():
+    """
+    (stream, format) de la request: ?stream=json|ndjson y ?format=json|binary.
+    ValueError si algún valor no es válido o se piden ambos.
+    """
+    stream = requested_stream_format()
+    fmt = request.args.get("format", "json", type=str)
+    if fmt not in ("json", "binary"):
+        raise ValueError(f"format inválido: {fmt} (usar json o binary)")
+    if stream and fmt == "binary":
+        raise ValueError("stream solo aplica a format=json")
+    return stream, fmt
+
+
+def _graph_response(cache_key, header: dict, nodes, graph, stream, fmt: str):
+    """Arma la respuesta del grafo en el formato pedido y la guarda en cache."""
+    if stream:
+        return _stream_nodes_response(header, nodes, graph, stream)
+
+    if fmt == "binary":
+        body = encode_graph_binary(
+            {**header, "total_nodes": len(nodes), "total_edges": graph.num_edges}, nodes, graph
+        )
+        payload = EncodedPayload(body, mimetype=BINARY_MIMETYPE)
+    else:
+        payload = EncodedPayload.from_object({**header, **_build_nodes_response(nodes, graph)})
+
+    _response_cache.put(cache_key, payload, nbytes=payload.nbytes)
+    return payload.to_response()
+
+
+def _limited(query, limit: int | None):
+    """Aplica LIMIT a la query; limit=None significa sin límite (todos)."""
+    if limit is None:
+        return query
+    return query.limit(limit)
+
+
+def _iter_nodes(nodes):
+    """Genera los nodos en el formato de la respuesta."""
+    for n in nodes:
+        yield {
             "id": n["id"],
             "lat": n["lat"],
             "lon": n["lon"],
             "type": n["type"],
         }
-        for n in nodes
-    ]
-
-    edges_list = []
-    for node_id, neighbors in edges.items():
-        for neighbor_id, weight in neighbors:
-            edges_list.append({
-                "from": node_id,
-                "to": neighbor_id,
-                "weight": round(weight, 2),
-            })
+
+
+def _iter_edges(graph, chunk: int = 4096):
+    """Genera las aristas del CSR en el formato de la respuesta, de a bloques."""
+    id_of = graph.ids.ids
+    sources = graph.edge_sources()
+    for start in range(0, graph.num_edges, chunk):
+        end = start + chunk
+        for i, j, w in zip(
+            sources[start:end].tolist(),
+            graph.indices[start:end].tolist(),
+            graph.weights[start:end].tolist(),
+        ):
+            yield {
+                "from": id_of[i],
+                "to": id_of[j],
+                "weight": round(w, 2),
+            }
+
+
+def _build_nodes_response(nodes, edges):
+    """Formatea nodos y aristas para la respuesta JSON."""
+    nodes_list = list(_iter_nodes(nodes))
+    edges_list = list(_iter_edges(edges))
 
     return {
         "nodes": nodes_list,
@@ -43,6 +117,15 @@ def _build_nodes_response(nodes, edges):
     }
 
 
+def _stream_nodes_response(header: dict, nodes, edges, fmt: str):
+    """Igual que _build_nodes_response, pero en streaming (sin armar las listas)."""
+    header = {**header, "total_nodes": len(nodes), "total_edges": edges.num_edges}
+    return stream_response(header, [
+        ("nodes", "node", _iter_nodes(nodes)),
+        ("edges", "edge", _iter_edges(edges)),
+    ], fmt)
+
+
 @graph_bp.get("/knn")
 def graph_knn():
     """
@@ -62,12 +145,25 @@ def graph_knn():
         type: integer
         required: false
         default: 500
-        description: Máximo número de nodos a incluir
+        description: Máximo número de nodos a incluir (0 = todos)
       - name: department
         in: query
         type: string
         required: false
         description: Filtrar por departamento
+      - name: stream
+        in: query
+        type: string
+        required: false
+        enum: [json, ndjson]
+        description: Enviar la respuesta en streaming (sin cache)
+      - name: format
+        in: query
+        type: string
+        required: false
+        default: json
+        enum: [json, binary]
+        description: "binary: columnas little-endian (ver graph/graph_binary.py)"
     responses:
       200:
         description: Grafo KNN con nodos y aristas
@@ -93,18 +189,38 @@ def graph_knn():
     limit = request.args.get("limit", 500, type=int)
     department = request.args.get("department", None, type=str)
 
-    cache_key = f"knn_{k}_{limit}_{department}"
-    
-    if cache_key in _graph_cache:
-        return jsonify(_graph_cache[cache_key])
+    try:
+        stream, fmt = _requested_output()
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+
+    cache_key = _cache_key("knn", fmt, k, limit, department)
+    cached = None if stream else _response_cache.get(cache_key)
+    if cached is not None:
+        return cached.to_response()
 
     t0 = time.time()
 
+    if limit <= 0 and not department:
+        # Grafo completo: el del registro, que se mantiene al día con
+        # actualizaciones incrementales en vez de reconstruirse desde la BD
+        service = graph_registry.get_service("knn", k)
+        nodes, edges = service.nodes_and_graph()
+        header = {
+            "algorithm": "KNN Graph",
+            "big_o": "O(n log n)" if service.graph_builder.method == "kdtree" else "O(n^2 log n)",
+            "time_ms": round((time.time() - t0) * 1000, 2),
+        }
+        return _graph_response(cache_key, header, nodes, edges, stream, fmt)
+
+    # limit <= 0 -> todos los nodos (el KD-tree no necesita el tope)
+    per_type = limit // 2 if limit > 0 else None
+
     builder = GraphBuilder(k=k)
     
     # Cargar nodos con filtro de departamento
     if department:
-        patients = Patient.query.filter_by(department=department).limit(limit // 2).all()
+        patients = _limited(Patient.query.filter_by(department=department), per_type).all()
         hospitals = Hospital.query.filter_by(department=department).all()
         
         builder.nodes = []
@@ -125,8 +241,8 @@ def graph_knn():
             })
     else:
         # Cargar nodos limitados
-        patients = Patient.query.limit(limit // 2).all()
-        hospitals = Hospital.query.limit(limit // 2).all()
+        patients = _limited(Patient.query, per_type).all()
+        hospitals = _limited(Hospital.query, per_type).all()
         
         builder.nodes = []
         for p in patients:
@@ -148,15 +264,12 @@ def graph_knn():
     edges = builder.build_knn_graph(k=k)
     t1 = time.time()
 
-    response = {
+    header = {
         "algorithm": "KNN Graph",
-        "big_o": "O(n^2 log k)",
+        "big_o": "O(n log n)" if builder.method == "kdtree" else "O(n^2 log n)",
         "time_ms": round((t1 - t0) * 1000, 2),
-        **_build_nodes_response(builder.nodes, edges),
     }
-
-    _graph_cache[cache_key] = response
-    return jsonify(response)
+    return _graph_response(cache_key, header, builder.nodes, edges, stream, fmt)
 
 
 @graph_bp.get("/radius")
@@ -179,12 +292,25 @@ def graph_radius():
         type: integer
         required: false
         default: 500
-        description: Máximo número de nodos
+        description: Máximo número de nodos (0 = todos)
       - name: department
         in: query
         type: string
         required: false
         description: Filtrar por departamento
+      - name: stream
+        in: query
+        type: string
+        required: false
+        enum: [json, ndjson]
+        description: Enviar la respuesta en streaming (sin cache)
+      - name: format
+        in: query
+        type: string
+        required: false
+        default: json
+        enum: [json, binary]
+        description: "binary: columnas little-endian (ver graph/graph_binary.py)"
     responses:
       200:
         description: Grafo por radio
@@ -193,22 +319,28 @@ def graph_radius():
     limit = request.args.get("limit", 500, type=int)
     department = request.args.get("department", None, type=str)
 
-    cache_key = f"radius_{radius_km}_{limit}_{department}"
-    
-    if cache_key in _graph_cache:
-        return jsonify(_graph_cache[cache_key])
+    try:
+        stream, fmt = _requested_output()
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+
+    cache_key = _cache_key("radius", fmt, radius_km, limit, department)
+    cached = None if stream else _response_cache.get(cache_key)
+    if cached is not None:
+        return cached.to_response()
 
     t0 = time.time()
 
     builder = GraphBuilder()
+    per_type = limit // 2 if limit > 0 else None
     
     # Cargar nodos filtrados
     if department:
-        patients = Patient.query.filter_by(department=department).limit(limit // 2).all()
+        patients = _limited(Patient.query.filter_by(department=department), per_type).all()
         hospitals = Hospital.query.filter_by(department=department).all()
     else:
-        patients = Patient.query.limit(limit // 2).all()
-        hospitals = Hospital.query.limit(limit // 2).all()
+        patients = _limited(Patient.query, per_type).all()
+        hospitals = _limited(Hospital.query, per_type).all()
 
     builder.nodes = []
     for p in patients:
@@ -230,16 +362,13 @@ def graph_radius():
     edges = builder.build_radius_graph(radius_km=radius_km)
     t1 = time.time()
 
-    response = {
+    header = {
         "algorithm": "Radius Graph",
-        "big_o": "O(n^2)",
+        "big_o": "O(n log n + E)" if builder.method == "kdtree" else "O(n^2)",
         "time_ms": round((t1 - t0) * 1000, 2),
         "radius_km": radius_km,
-        **_build_nodes_response(builder.nodes, edges),
     }
-
-    _graph_cache[cache_key] = response
-    return jsonify(response)
+    return _graph_response(cache_key, header, builder.nodes, edges, stream, fmt)
 
 
 @graph_bp.get("/bipartite")
@@ -269,6 +398,19 @@ def graph_bipartite():
         type: string
         required: false
         description: Filtrar por departamento
+      - name: stream
+        in: query
+        type: string
+        required: false
+        enum: [json, ndjson]
+        description: Enviar la respuesta en streaming (sin cache)
+      - name: format
+        in: query
+        type: string
+        required: false
+        default: json
+        enum: [json, binary]
+        description: "binary: columnas little-endian (ver graph/graph_binary.py)"
     responses:
       200:
         description: Grafo bipartito
@@ -277,10 +419,15 @@ def graph_bipartite():
     limit = request.args.get("limit", 500, type=int)
     department = request.args.get("department", None, type=str)
 
-    cache_key = f"bipartite_{k}_{limit}_{department}"
-    
-    if cache_key in _graph_cache:
-        return jsonify(_graph_cache[cache_key])
+    try:
+        stream, fmt = _requested_output()
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+
+    cache_key = _cache_key("bipartite", fmt, k, limit, department)
+    cached = None if stream else _response_cache.get(cache_key)
+    if cached is not None:
+        return cached.to_response()
 
     t0 = time.time()
 
@@ -314,15 +461,12 @@ def graph_bipartite():
     edges = builder.build_bipartite_knn_graph(k=k)
     t1 = time.time()
 
-    response = {
+    header = {
         "algorithm": "Bipartite KNN",
         "big_o": "O(P·H)",
         "time_ms": round((t1 - t0) * 1000, 2),
-        **_build_nodes_response(builder.nodes, edges),
     }
-
-    _graph_cache[cache_key] = response
-    return jsonify(response)
+    return _graph_response(cache_key, header, builder.nodes, edges, stream, fmt)
 
 
 @graph_bp.get("/compare")
@@ -365,7 +509,7 @@ def graph_compare():
     
     results.append({
         "algorithm": "KNN",
-        "big_o": "O(n^2 log k)",
+        "big_o": "O(n log n)" if builder_knn.method == "kdtree" else "O(n^2 log n)",
         "time_ms": round((t1 - t0) * 1000, 2),
         "nodes": len(builder_knn.nodes),
         "edges": sum(len(v) for v in edges_knn.values()),
@@ -380,7 +524,7 @@ def graph_compare():
     
     results.append({
         "algorithm": "Radius",
-        "big_o": "O(n^2)",
+        "big_o": "O(n log n + E)" if builder_radius.method == "kdtree" else "O(n^2)",
         "time_ms": round((t1 - t0) * 1000, 2),
         "nodes": len(builder_radius.nodes),
         "edges": sum(len(v) for v in edges_radius.values()),
@@ -404,4 +548,74 @@ def graph_compare():
     return jsonify({
         "comparison": results,
         "total_nodes_used": limit,
-    })
\ No newline at end of file
+    })
+
+
+def _get_tile_service() -> TileService:
+    global _tile_service
+    nodes, graph = graph_registry.get_service().nodes_and_graph()
+    if _tile_service is None or _tile_service.graph is not graph:
+        _tile_service = TileService(nodes, graph)
+    return _tile_service
+
+
+@graph_bp.get("/tile")
+def graph_tile():
+    """
+    Nodos y aristas del grafo KNN visibles en un bbox, para el mapa.
+    En zoom bajo los pacientes se agrupan en clusters (type=cluster, count).
+    Cada tile se calcula una vez (índice espacial por tiles) y queda en cache.
+    ---
+    tags:
+      - Grafo
+    parameters:
+      - name: bbox
+        in: query
+        type: string
+        required: true
+        description: min_lon,min_lat,max_lon,max_lat
+        example: -77.2,-12.3,-76.8,-11.9
+      - name: zoom
+        in: query
+        type: integer
+        required: true
+        description: Zoom del mapa (0-20)
+    responses:
+      200:
+        description: Nodos (o clusters) y aristas de los tiles que cubren el bbox
+      400:
+        description: bbox/zoom inválidos o demasiados tiles
+    """
+    zoom = request.args.get("zoom", None, type=int)
+    try:
+        bbox = parse_bbox(request.args.get("bbox"))
+        if zoom is None or not 0 <= zoom <= MAX_ZOOM:
+            raise ValueError(f"zoom inválido: debe estar entre 0 y {MAX_ZOOM}")
+
+        t0 = time.time()
+        response = _get_tile_service().view(bbox, zoom)
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+
+    response["time_ms"] = round((time.time() - t0) * 1000, 2)
+    return jsonify(response)
+
+
+@graph_bp.get("/cache/stats")
+def graph_cache_stats():
+    """
+    Contadores de la cache de respuestas de grafos (hits, misses,
+    desalojos, bytes usados) y grafos compartidos cargados en el proceso.
+    ---
+    tags:
+      - Grafo
+    responses:
+      200:
+        description: Estadísticas de cache
+    """
+    return jsonify({
+        "response_cache": _response_cache.stats(),
+        "tile_cache": _tile_service.cache.stats() if _tile_service else None,
+        "sp_tree_cache": sp_tree_cache.stats(),
+        "graphs": graph_registry.stats(),
+    })
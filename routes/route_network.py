@@ -1,28 +1,17 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, request
 import time
 
-from services.routing_service import RoutingService
+from services.graph_registry import get_graph, graph_registry
 from algorithms.kruskal import kruskal
 from algorithms.prim import prim
 from algorithms.edmonds_karp import edmonds_karp
 
 network_bp = Blueprint("network", __name__, url_prefix="/api/network")
 
-_network_routing = None
-_network_graph_cache = None
-
-
-def get_network_graph():
-    global _network_routing, _network_graph_cache
-    if _network_graph_cache is None:
-        _network_routing = RoutingService()
-        _network_graph_cache = _network_routing.get_graph()
-    return _network_graph_cache
-
 
 @network_bp.get("/kruskal")
 def mst_kruskal():
-    graph = get_network_graph()
+    graph = get_graph()
 
     t0 = time.time()
     mst, cost = kruskal(graph)
@@ -39,7 +28,7 @@ def mst_kruskal():
 
 @network_bp.get("/prim/<start>")
 def mst_prim(start):
-    graph = get_network_graph()
+    graph = get_graph()
 
     t0 = time.time()
     mst, cost = prim(graph, start)
@@ -56,7 +45,7 @@ def mst_prim(start):
 
 @network_bp.get("/flow/<source>/<sink>")
 def max_flow(source, sink):
-    graph = get_network_graph()
+    graph = get_graph()
 
     # Construir matriz de capacidades a partir del grafo KNN
     capacity = {u: {} for u in graph}
@@ -76,3 +65,62 @@ def max_flow(source, sink):
         "time_ms": (t1 - t0) * 1000,
         "max_flow": result,
     })
+
+
+@network_bp.get("/catchment")
+def catchment():
+    """
+    Área de influencia de cada hospital por la red: pacientes cuyo hospital
+    más cercano (camino mínimo en el grafo) es ese. Sale de la tabla de
+    distancias precalculada. Con ?nodes=1 se incluyen los ids.
+    """
+    service = graph_registry.get_service()
+    include_nodes = bool(request.args.get("nodes", 0, type=int))
+
+    t0 = time.time()
+    table = service.hospital_distances()
+    areas, unreachable = table.catchment()
+    ids = table.ids.ids
+
+    hospitals = []
+    for hospital, nodes in zip(table.hospitals.tolist(), areas):
+        dists = table.nearest_dist[nodes]
+        entry = {
+            "hospital": ids[hospital],
+            "count": len(nodes),
+            "mean_km": float(dists.mean()) if len(nodes) else None,
+            "max_km": float(dists.max()) if len(nodes) else None,
+        }
+        if include_nodes:
+            entry["nodes"] = [ids[i] for i in nodes.tolist()]
+        hospitals.append(entry)
+    t1 = time.time()
+
+    return jsonify({
+        "time_ms": (t1 - t0) * 1000,
+        "hospitals": hospitals,
+        "unreachable": [ids[i] for i in unreachable.tolist()],
+    })
+
+
+@network_bp.get("/nearest/<node_id>")
+def nearest_hospital(node_id):
+    """Hospital más cercano por la red y distancia a cada hospital (tabla precalculada)."""
+    table = graph_registry.get_service().hospital_distances()
+    if node_id not in table.ids:
+        return jsonify({"error": f"Nodo {node_id} no existe en el grafo"}), 404
+
+    hospital, distance = table.nearest_hospital(node_id)
+    return jsonify({
+        "node": node_id,
+        "hospital": hospital,
+        "distance": distance,
+        "distances": table.distances_from(node_id),
+    })
+
+
+@network_bp.get("/components")
+def components():
+    """Componentes débilmente conexas del grafo: cantidad y tamaños de las más grandes."""
+    index = graph_registry.get_service().components()
+    return jsonify(index.summary(top=request.args.get("top", 20, type=int)))
@@ -1,35 +1,69 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, request
 import time
 
-from services.routing_service import RoutingService
-from algorithms.dijkstra import dijkstra
-from algorithms.bellman_ford import bellman_ford
-from algorithms.floyd_warshall import floyd_warshall, get_fw_path
+import numpy as np
+
+from models import Patient, Hospital
+from services.graph_registry import graph_registry
+from services.path_batch import batch_shortest_paths, parse_pairs
+from services.path_cache import sp_tree_cache
+from shared.config import Config
+from algorithms.bellman_ford import BELLMAN_FORD_MODES, bellman_ford
+from algorithms.astar import astar
+from algorithms.bidirectional_dijkstra import bidirectional_dijkstra
+from utils.http_utils import STREAM_FORMATS, parse_bbox, stream_response
 
 path_bp = Blueprint("paths", __name__, url_prefix="/api/path")
 
-_routing_service = None
-_graph_cache = None
+# Con datos nuevos los árboles de caminos mínimos en cache ya no sirven
+graph_registry.add_version_listener(sp_tree_cache.set_version)
+
+
+def _missing_node(graph, start, end):
+    """404 si start o end no están en el grafo (None si ambos están)."""
+    for node in (start, end):
+        if node not in graph.ids:
+            return jsonify({"error": f"Nodo {node} no existe en el grafo"}), 404
+    return None
 
 
-def get_graph():
+def _unreachable(service, start, end, algorithm, big_o, result=None):
     """
-    Construye el grafo la primera vez que se llama
-    y luego reutiliza la misma instancia (cache en memoria).
+    (componentes del par, respuesta). Si start o end no existen la respuesta
+    es el 404 de _missing_node; si están en componentes distintas ya está
+    armada sin correr el algoritmo, con `result` = (distancia, ruta) de "sin
+    camino" (por defecto (inf, [end]), como dijkstra()). Si no, es None y el
+    endpoint sigue normalmente.
     """
-    global _routing_service, _graph_cache
-    if _graph_cache is None:
-        _routing_service = RoutingService()
-        _graph_cache = _routing_service.get_graph()
-    return _graph_cache
+    components = service.components().pair_info(start, end)
+    if components is None:
+        return None, _missing_node(service.get_graph(), start, end)
+    if components["same"]:
+        return components, None
+
+    distance, path = result or (float("inf"), [end])
+    return components, jsonify({
+        "algorithm": algorithm,
+        "big_o": big_o,
+        "time_ms": 0.0,
+        "distance": distance,
+        "path": path,
+        "components": components,
+    })
 
 
 @path_bp.get("/dijkstra/<start>/<end>")
 def path_dijkstra(start, end):
-    graph = get_graph()
+    service = graph_registry.get_service()
+    components, response = _unreachable(service, start, end, "Dijkstra", "O(E log V)")
+    if response is not None:
+        return response
+    graph = service.get_graph()
 
+    # Árbol de caminos mínimos del origen en cache: las consultas repetidas
+    # desde el mismo origen solo reconstruyen la ruta
     t0 = time.time()
-    dist, path = dijkstra(graph, start, end)
+    dist, path, tree_cache = sp_tree_cache.shortest_path(graph, start, end)
     t1 = time.time()
 
     return jsonify({
@@ -38,50 +72,356 @@ def path_dijkstra(start, end):
         "time_ms": (t1 - t0) * 1000,
         "distance": dist,
         "path": path,
+        "tree_cache": tree_cache,
+        "components": components,
+    })
+
+
+@path_bp.post("/batch")
+def path_batch():
+    """
+    Muchos caminos mínimos en una sola request.
+
+    Body: {"pairs": [[start, end], ...], "workers": 4, "paths": true}
+    Los pares se agrupan por origen (una búsqueda por origen distinto:
+    árbol de la cache de /dijkstra si ya está, si no Dijkstra multi-origen
+    de scipy por tandas) y, con workers > 1, las tandas se reparten en un
+    pool de hilos (máximo PATH_BATCH_MAX_WORKERS).
+    La respuesta sale en streaming como NDJSON (?stream=json para un solo
+    JSON): primero una línea "meta" y luego un resultado por par, en el
+    orden de la request.
+    """
+    body = request.get_json(silent=True) or {}
+    fmt = request.args.get("stream", "ndjson")
+    try:
+        if fmt not in STREAM_FORMATS:
+            raise ValueError(f"stream inválido: {fmt} (usar {' o '.join(STREAM_FORMATS)})")
+        pairs = parse_pairs(body, Config.PATH_BATCH_MAX_PAIRS)
+        workers = int(body.get("workers", 1))
+    except (TypeError, ValueError) as ve:
+        return jsonify({"error": str(ve)}), 400
+
+    workers = max(1, min(workers, Config.PATH_BATCH_MAX_WORKERS))
+    service = graph_registry.get_service()
+
+    header = {
+        "algorithm": "Dijkstra",
+        "pairs": len(pairs),
+        "sources": len({start for start, _end in pairs}),
+        "workers": workers,
+    }
+    results = batch_shortest_paths(
+        service.get_graph(), service.components(), pairs,
+        workers=workers, with_paths=bool(body.get("paths", True)),
+    )
+    return stream_response(header, [("results", "path", results)], fmt)
+
+
+# Heurísticas de /astar: "geo" = línea recta, "alt" = máximo entre la
+# línea recta y la cota de los landmarks (ambas admisibles)
+ASTAR_HEURISTICS = ("geo", "alt")
+
+
+@path_bp.get("/astar/<start>/<end>")
+def path_astar(start, end):
+    """
+    A* con heurística de distancia en línea recta (círculo máximo) o, con
+    ?heuristic=alt, además con la cota inferior de los landmarks ALT.
+    Con ?compare=1 también corre Dijkstra con corte temprano (y, con alt,
+    A* solo con línea recta) para mostrar cuántos nodos se ahorra la
+    heurística.
+    """
+    kind = request.args.get("heuristic", "geo")
+    if kind not in ASTAR_HEURISTICS:
+        return jsonify({"error": f"heuristic inválida: {kind} (usar {' o '.join(ASTAR_HEURISTICS)})"}), 400
+
+    service = graph_registry.get_service()
+    components, response = _unreachable(service, start, end, "A*", "O(E log V)")
+    if response is not None:
+        return response
+    graph = service.get_graph()
+    lats, lons = service.node_coords()
+
+    t0 = time.time()
+    # Con alt, la cota de los landmarks se evalúa solo en los nodos que toca
+    # la búsqueda (ver astar) y se combina con la de línea recta
+    bound = service.landmarks().heuristic(graph.ids.index_of(end)) if kind == "alt" else None
+    dist, path, settled = astar(graph, start, end, lats, lons, bound=bound)
+    t1 = time.time()
+
+    response = {
+        "algorithm": "A*",
+        "big_o": "O(E log V)",
+        "heuristic": kind,
+        "time_ms": (t1 - t0) * 1000,
+        "distance": dist,
+        "path": path,
+        "settled_nodes": settled,
+        "components": components,
+    }
+
+    if request.args.get("compare", 0, type=int):
+        t0 = time.time()
+        _dist, _path, settled_dijkstra = astar(graph, start, end)
+        t1 = time.time()
+        response["dijkstra"] = {
+            "time_ms": (t1 - t0) * 1000,
+            "settled_nodes": settled_dijkstra,
+        }
+        if kind == "alt":
+            t0 = time.time()
+            _dist, _path, settled_geo = astar(graph, start, end, lats, lons)
+            t1 = time.time()
+            response["geo"] = {
+                "time_ms": (t1 - t0) * 1000,
+                "settled_nodes": settled_geo,
+            }
+
+    return jsonify(response)
+
+
+@path_bp.get("/estimate/<start>/<end>")
+def path_estimate(start, end):
+    """
+    Cotas inferior y superior de la distancia por la red en O(#landmarks),
+    sin correr ninguna búsqueda (landmarks ALT guardados con el snapshot).
+    """
+    service = graph_registry.get_service()
+    response = _missing_node(service.get_graph(), start, end)
+    if response is not None:
+        return response
+
+    t0 = time.time()
+    oracle = service.landmarks()
+    lower, upper = oracle.estimate(start, end)
+    t1 = time.time()
+
+    return jsonify({
+        "algorithm": "ALT",
+        "big_o": "O(L)",
+        "time_ms": (t1 - t0) * 1000,
+        "landmarks": len(oracle.landmarks),
+        "lower": lower,
+        "upper": upper,
+    })
+
+
+@path_bp.post("/estimate")
+def path_estimate_batch():
+    """
+    Cotas de distancia para muchos pares (p.ej. paciente -> hospital en los
+    dashboards). Body: {"pairs": [[start, end], ...]} como /batch; la
+    respuesta sale en streaming (NDJSON por defecto, ?stream=json).
+    Los pares con un nodo inexistente salen con "error".
+    """
+    body = request.get_json(silent=True) or {}
+    fmt = request.args.get("stream", "ndjson")
+    try:
+        if fmt not in STREAM_FORMATS:
+            raise ValueError(f"stream inválido: {fmt} (usar {' o '.join(STREAM_FORMATS)})")
+        pairs = parse_pairs(body, Config.PATH_BATCH_MAX_PAIRS)
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+
+    service = graph_registry.get_service()
+    graph = service.get_graph()
+    oracle = service.landmarks()
+
+    known = [i for i, (a, b) in enumerate(pairs) if a in graph.ids and b in graph.ids]
+    lower, upper = oracle.estimate_many([pairs[i] for i in known])
+    bounds = dict(zip(known, zip(lower.tolist(), upper.tolist())))
+
+    def results():
+        for i, (start, end) in enumerate(pairs):
+            result = {"index": i, "start": start, "end": end}
+            if i in bounds:
+                result["lower"], result["upper"] = bounds[i]
+            else:
+                missing = start if start not in graph.ids else end
+                result["error"] = f"Nodo {missing} no existe en el grafo"
+            yield result
+
+    header = {
+        "algorithm": "ALT",
+        "pairs": len(pairs),
+        "landmarks": len(oracle.landmarks),
+    }
+    return stream_response(header, [("results", "estimate", results())], fmt)
+
+
+@path_bp.get("/bidirectional/<start>/<end>")
+def path_bidirectional(start, end):
+    """
+    Dijkstra bidireccional (desde el origen y, sobre el grafo invertido,
+    desde el destino). Con ?compare=1 también corre Dijkstra con corte
+    temprano para comparar nodos asentados.
+    """
+    service = graph_registry.get_service()
+    components, response = _unreachable(service, start, end, "Bidirectional Dijkstra", "O(E log V)")
+    if response is not None:
+        return response
+    graph = service.get_graph()
+
+    t0 = time.time()
+    dist, path, settled = bidirectional_dijkstra(graph, start, end, return_settled=True)
+    t1 = time.time()
+
+    response = {
+        "algorithm": "Bidirectional Dijkstra",
+        "big_o": "O(E log V)",
+        "time_ms": (t1 - t0) * 1000,
+        "distance": dist,
+        "path": path,
+        "settled_nodes": settled,
+        "components": components,
+    }
+
+    if request.args.get("compare", 0, type=int):
+        t0 = time.time()
+        _dist, _path, settled_dijkstra = astar(graph, start, end)
+        t1 = time.time()
+        response["dijkstra"] = {
+            "time_ms": (t1 - t0) * 1000,
+            "settled_nodes": settled_dijkstra,
+        }
+
+    return jsonify(response)
+
+
+@path_bp.get("/ch/<start>/<end>")
+def path_contraction_hierarchy(start, end):
+    """
+    Consulta sobre la jerarquía de contracción del grafo (búsqueda
+    bidireccional hacia arriba y desempaquetado de atajos).
+
+    La jerarquía es opcional (GRAPH_CH_PRECOMPUTE=1): se construye al
+    arrancar gunicorn y queda en el snapshot. Nunca se arma dentro de la
+    request; si el grafo actual todavía no la tiene (p.ej. después de un
+    cambio de datos) se construye en segundo plano y se responde 503.
+    """
+    service = graph_registry.get_service()
+    components, response = _unreachable(
+        service, start, end, "Contraction Hierarchy", "O(E log V) preprocesamiento, consulta sublineal"
+    )
+    if response is not None:
+        return response
+
+    t0 = time.time()
+    ch = service.contraction_hierarchy(build=False)
+    t1 = time.time()
+    if ch is None:
+        if not Config.GRAPH_CH_PRECOMPUTE:
+            return jsonify({"error": "Jerarquía de contracción desactivada (GRAPH_CH_PRECOMPUTE=1)"}), 503
+        service.build_contraction_hierarchy_in_background()
+        response = jsonify({"error": "Jerarquía de contracción en construcción, reintentar en unos segundos"})
+        return response, 503, {"Retry-After": "10"}
+    dist, path, settled = ch.query(start, end, return_settled=True)
+    t2 = time.time()
+
+    return jsonify({
+        "algorithm": "Contraction Hierarchy",
+        "big_o": "O(E log V) preprocesamiento, consulta sublineal",
+        "time_ms": (t2 - t1) * 1000,
+        "preprocess_ms": (t1 - t0) * 1000,
+        "distance": dist,
+        "path": path,
+        "settled_nodes": settled,
+        "shortcuts": ch.num_shortcuts,
+        "components": components,
     })
 
 
 @path_bp.get("/bellman/<start>/<end>")
 def path_bellman(start, end):
-    graph = get_graph()
+    """
+    Bellman-Ford sobre los arrays del CSR: ?mode=sweep (por defecto, todas
+    las aristas por pasada con NumPy) o ?mode=spfa (cola de nodos cambiados).
+    """
+    mode = request.args.get("mode", "sweep")
+    if mode not in BELLMAN_FORD_MODES:
+        return jsonify({"error": f"mode inválido: {mode}"}), 400
+
+    service = graph_registry.get_service()
+    components, response = _unreachable(service, start, end, "Bellman-Ford", "O(V·E)")
+    if response is not None:
+        return response
+    graph = service.get_graph()
 
     t0 = time.time()
-    dist, path = bellman_ford(graph, start, end)
+    dist, path = bellman_ford(graph, start, end, mode=mode)
     t1 = time.time()
 
     return jsonify({
-        "algorithm": "Bellman-Ford",
+        "algorithm": "Bellman-Ford" if mode == "sweep" else "SPFA",
+        "mode": mode,
         "big_o": "O(V·E)",
         "time_ms": (t1 - t0) * 1000,
         "distance": dist,
         "path": path,
+        "components": components,
     })
 
 
+def _floyd_subset(service):
+    """
+    (ids, cache) del subconjunto pedido para Floyd-Warshall: ?department=,
+    ?bbox=min_lon,min_lat,max_lon,max_lat o todo el grafo (ids None).
+    Los bbox son arbitrarios (los elige el cliente), así que se calculan en
+    cada consulta sin cache ni snapshot, con un tope de nodos mucho menor
+    (FLOYD_BBOX_MAX_NODES).
+    ValueError si el bbox es inválido.
+    """
+    department = request.args.get("department")
+    if department:
+        codes = [code for (code,) in Patient.query.filter_by(department=department).with_entities(Patient.code)]
+        codes += [code for (code,) in Hospital.query.filter_by(department=department).with_entities(Hospital.code)]
+        return codes, True
+
+    if request.args.get("bbox"):
+        min_lon, min_lat, max_lon, max_lat = parse_bbox(request.args.get("bbox"))
+        lats, lons = service.node_coords()
+        inside = (lons >= min_lon) & (lons <= max_lon) & (lats >= min_lat) & (lats <= max_lat)
+        ids = service.get_graph().ids
+        return [ids.id_of(int(i)) for i in np.flatnonzero(inside)], False
+
+    return None, True
+
+
 @path_bp.get("/floyd/<start>/<end>")
 def path_floyd(start, end):
     """
-    OJO: Floyd-Warshall es O(n^3). Si el grafo es muy grande
-    puede demorar bastante. Si pasa, conviene limitar a subgrafo.
+    Floyd-Warshall vectorizado sobre todo el grafo o sobre el subgrafo de
+    un departamento (?department=) o de un bbox (?bbox=). La matriz de cada
+    subconjunto (salvo los bbox) se calcula una vez por versión del grafo y
+    queda en el snapshot; las consultas siguientes son lecturas de la matriz.
     """
-    graph = get_graph()
+    service = graph_registry.get_service()
+    components, response = _unreachable(service, start, end, "Floyd-Warshall", "O(n^3)", result=(None, None))
+    if response is not None:
+        return response
 
     t0 = time.time()
-    nodes, dist_matrix, next_hop = floyd_warshall(graph)
-    path = get_fw_path(start, end, nodes, next_hop)
+    try:
+        nodes, cache = _floyd_subset(service)
+        all_pairs = service.all_pairs(nodes, cache=cache)
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    t1 = time.time()
 
-    dist = None
-    if path:
-        i = nodes.index(start)
-        j = nodes.index(end)
-        dist = float(dist_matrix[i][j])
+    if start not in all_pairs or end not in all_pairs:
+        return jsonify({"error": "start y end deben estar dentro del subconjunto"}), 400
 
-    t1 = time.time()
+    path = all_pairs.path(start, end)
+    dist = all_pairs.distance(start, end) if path else None
+    t2 = time.time()
 
     return jsonify({
         "algorithm": "Floyd-Warshall",
         "big_o": "O(n^3)",
-        "time_ms": (t1 - t0) * 1000,
+        "time_ms": (t2 - t1) * 1000,
+        "preprocess_ms": (t1 - t0) * 1000,
+        "subset_nodes": len(all_pairs.nodes),
         "distance": dist,
         "path": path,
+        "components": components,
     })
@@ -5,7 +5,8 @@ import time
 
 from db import db
 from models import Patient, Hospital
-from services.routing_service import RoutingService
+from services.graph_registry import graph_registry
+from services.routing_service import RoutingService, graph_params
 
 # Algoritmos de asignación
 from algorithms.greedy import greedy_assign
@@ -15,6 +16,7 @@ from algorithms.min_cost_flow import min_cost_flow
 # Algoritmos de ruta
 from algorithms.dijkstra import dijkstra
 from algorithms.bellman_ford import bellman_ford
+from algorithms.astar import astar
 
 # Algoritmos de redes
 from algorithms.kruskal import kruskal
@@ -24,10 +26,41 @@ from algorithms.edmonds_karp import edmonds_karp
 # Distancia geográfica
 from utils.geo_utils import distancia_km
 
-# Construcción de grafos (3 algoritmos)
-from graph.graph_builder import GraphBuilder
 from shared.config import Config
 
+# Algoritmos de ruta disponibles en compute_path_algorithms y los que se
+# corren si no se elige nada
+PATH_ALGORITHMS = ("dijkstra", "bellman_ford", "spfa", "astar", "hospital_table")
+DEFAULT_PATH_ALGORITHMS = ("dijkstra", "bellman_ford")
+
+
+
+def parse_path_algorithms(value) -> Optional[List[str]]:
+    """
+    Valida path_algorithms del body: None (los de por defecto) o una lista de
+    nombres de PATH_ALGORITHMS. ValueError si no es lista o hay uno inválido.
+    """
+    if value is None:
+        return None
+    if not isinstance(value, list) or not all(isinstance(a, str) for a in value):
+        raise ValueError("path_algorithms debe ser una lista de nombres de algoritmo")
+    unknown = [a for a in value if a not in PATH_ALGORITHMS]
+    if unknown:
+        raise ValueError(
+            f"Algoritmo de ruta inválido: {', '.join(unknown)} (usar {', '.join(PATH_ALGORITHMS)})"
+        )
+    return value
+
+
+# (nombre, big-O) de cada algoritmo de ruta, para las respuestas sin búsqueda
+_PATH_ALGORITHM_INFO = {
+    "dijkstra": ("Dijkstra", "O(E log V)"),
+    "bellman_ford": ("Bellman-Ford", "O(V·E)"),
+    "spfa": ("SPFA", "O(V·E)"),
+    "astar": ("A*", "O(E log V)"),
+    "hospital_table": ("Tabla de distancias a hospitales", "O(1) distancia, O(L·grado) ruta"),
+}
+
 
 class BusinessAssignmentService:
     """
@@ -39,9 +72,17 @@ class BusinessAssignmentService:
     """
 
     def __init__(self):
-        # Grafo por defecto (ej: KNN o bipartito, lo decide RoutingService o luego configure_graph)
-        self.routing_service = RoutingService()
-        self.graph = self.routing_service.get_graph()
+        # Parámetros del grafo en uso (por defecto KNN; se cambian con
+        # configure_graph). El grafo en sí vive en el registro compartido.
+        self.graph_params = graph_params()
+
+    @property
+    def routing_service(self) -> RoutingService:
+        return graph_registry.get_service(*self.graph_params)
+
+    @property
+    def graph(self):
+        return self.routing_service.get_graph()
 
     # ------------------------
     # 0. Configurar grafo a usar
@@ -74,17 +115,10 @@ class BusinessAssignmentService:
         if radius_km is None:
             radius_km = 50.0
 
-        builder = GraphBuilder(k=k)
-        builder.load_nodes_from_db()
-
-        if graph_mode == "knn":
-            self.graph = builder.build_knn_graph(k=k)
-        elif graph_mode == "radius":
-            self.graph = builder.build_radius_graph(radius_km=radius_km)
-        elif graph_mode == "bipartite_knn":
-            self.graph = builder.build_bipartite_knn_graph(k=k)
-        else:
-            raise ValueError(f"graph_mode inválido: {graph_mode}")
+        # El registro construye el grafo una sola vez por proceso (o lo carga
+        # del snapshot) y lo comparte con los demás blueprints
+        self.graph_params = graph_params(graph_mode, k, radius_km)
+        graph_registry.get_service(*self.graph_params)
 
     # ------------------------
     # 1. Inferir especialidad
@@ -276,53 +310,132 @@ class BusinessAssignmentService:
         return results
 
     # ------------------------
-    # 4. Ejecutar algoritmos de ruta (2) para un par paciente-hospital
+    # 4. Ejecutar algoritmos de ruta para un par paciente-hospital
     # ------------------------
     def compute_path_algorithms(
         self,
         patient_id: str,
-        hospital_id: str
+        hospital_id: str,
+        algorithms: Optional[List[str]] = None,
     ) -> Dict[str, Any]:
         """
-        Ejecuta Dijkstra y Bellman-Ford en el grafo actual para el par
-        (patient_id, hospital_id).
+        Ejecuta los algoritmos de ruta elegidos (por defecto Dijkstra y
+        Bellman-Ford; también "spfa", "astar" y "hospital_table", que lee la tabla
+        precalculada de distancias a hospitales) en el grafo actual para el
+        par (patient_id, hospital_id).
         """
-        if patient_id not in self.graph or hospital_id not in self.graph:
+        algorithms = parse_path_algorithms(algorithms) or list(DEFAULT_PATH_ALGORITHMS)
+
+        service = self.routing_service
+        graph = service.get_graph()
+        if patient_id not in graph or hospital_id not in graph:
+            return {name: None for name in algorithms}
+
+        # Componentes distintas: no hay camino, no hace falta correr nada
+        components = service.components().pair_info(patient_id, hospital_id)
+        if not components["same"]:
             return {
-                "dijkstra": None,
-                "bellman_ford": None,
+                name: {
+                    "algorithm": _PATH_ALGORITHM_INFO[name][0],
+                    "category": "Ruta más corta",
+                    "big_o": _PATH_ALGORITHM_INFO[name][1],
+                    "time_ms": 0.0,
+                    "distance": float("inf"),
+                    "path_nodes": [hospital_id],
+                    "components": components,
+                }
+                for name in algorithms
             }
 
+        results: Dict[str, Any] = {}
+
         # Dijkstra
-        t0 = time.perf_counter()
-        dist_d, path_d = dijkstra(self.graph, patient_id, hospital_id)
-        t1 = time.perf_counter()
-        dijkstra_res = {
-            "algorithm": "Dijkstra",
-            "category": "Ruta más corta",
-            "big_o": "O(E log V)",
-            "time_ms": round((t1 - t0) * 1000.0, 6),
-            "distance": dist_d,
-            "path_nodes": path_d,
-        }
+        if "dijkstra" in algorithms:
+            t0 = time.perf_counter()
+            dist_d, path_d = dijkstra(graph, patient_id, hospital_id)
+            t1 = time.perf_counter()
+            results["dijkstra"] = {
+                "algorithm": "Dijkstra",
+                "category": "Ruta más corta",
+                "big_o": "O(E log V)",
+                "time_ms": round((t1 - t0) * 1000.0, 6),
+                "distance": dist_d,
+                "path_nodes": path_d,
+            }
 
         # Bellman-Ford
-        t0 = time.perf_counter()
-        dist_b, path_b = bellman_ford(self.graph, patient_id, hospital_id)
-        t1 = time.perf_counter()
-        bellman_res = {
-            "algorithm": "Bellman-Ford",
-            "category": "Ruta más corta",
-            "big_o": "O(V·E)",
-            "time_ms": round((t1 - t0) * 1000.0, 6),
-            "distance": dist_b,
-            "path_nodes": path_b,
-        }
+        if "bellman_ford" in algorithms:
+            t0 = time.perf_counter()
+            dist_b, path_b = bellman_ford(graph, patient_id, hospital_id)
+            t1 = time.perf_counter()
+            results["bellman_ford"] = {
+                "algorithm": "Bellman-Ford",
+                "category": "Ruta más corta",
+                "big_o": "O(V·E)",
+                "time_ms": round((t1 - t0) * 1000.0, 6),
+                "distance": dist_b,
+                "path_nodes": path_b,
+            }
 
-        return {
-            "dijkstra": dijkstra_res,
-            "bellman_ford": bellman_res,
-        }
+        # SPFA (Bellman-Ford con cola: solo relaja aristas de nodos que cambiaron)
+        if "spfa" in algorithms:
+            t0 = time.perf_counter()
+            dist_s, path_s = bellman_ford(graph, patient_id, hospital_id, mode="spfa")
+            t1 = time.perf_counter()
+            results["spfa"] = {
+                "algorithm": "SPFA",
+                "category": "Ruta más corta",
+                "big_o": "O(V·E)",
+                "time_ms": round((t1 - t0) * 1000.0, 6),
+                "distance": dist_s,
+                "path_nodes": path_s,
+            }
+
+        # A* (heurística: distancia en línea recta al hospital)
+        if "astar" in algorithms:
+            lats, lons = service.node_coords()
+            t0 = time.perf_counter()
+            dist_a, path_a, settled = astar(graph, patient_id, hospital_id, lats, lons)
+            t1 = time.perf_counter()
+            results["astar"] = {
+                "algorithm": "A*",
+                "category": "Ruta más corta",
+                "big_o": "O(E log V)",
+                "time_ms": round((t1 - t0) * 1000.0, 6),
+                "distance": dist_a,
+                "path_nodes": path_a,
+                "settled_nodes": settled,
+            }
+
+        # Tabla de distancias a hospitales (sin búsqueda: lectura + descenso)
+        if "hospital_table" in algorithms:
+            table = service.hospital_distances()
+            t0 = time.perf_counter()
+            dist_t, path_t = table.route(graph, patient_id, hospital_id)
+            t1 = time.perf_counter()
+            results["hospital_table"] = {
+                "algorithm": "Tabla de distancias a hospitales",
+                "category": "Ruta más corta",
+                "big_o": "O(1) distancia, O(L·grado) ruta",
+                "time_ms": round((t1 - t0) * 1000.0, 6),
+                "distance": dist_t,
+                "path_nodes": path_t,
+            }
+
+        return results
+
+    def network_distance(self, patient_id: str, hospital_id: str) -> Optional[float]:
+        """
+        Distancia por la red paciente -> hospital leída de la tabla
+        precalculada (None si alguno no está en el grafo o no es hospital).
+        """
+        table = self.routing_service.hospital_distances()
+        if patient_id not in table.ids:
+            return None
+        try:
+            return table.distance(patient_id, hospital_id)
+        except KeyError:
+            return None
 
     # ------------------------
     # 5. Ejecutar algoritmos de redes (3) globales
@@ -333,10 +446,11 @@ class BusinessAssignmentService:
         Sirve para comparar tiempos/orden de complejidad.
         """
         results: List[Dict[str, Any]] = []
+        graph = self.graph
 
         # 5.1 Kruskal (MST)
         t0 = time.perf_counter()
-        mst_k, cost_k = kruskal(self.graph)
+        mst_k, cost_k = kruskal(graph)
         t1 = time.perf_counter()
         results.append({
             "name": "Kruskal",
@@ -347,15 +461,15 @@ class BusinessAssignmentService:
         })
 
         # Para Prim necesitamos un nodo de inicio cualquiera
-        if self.graph:
-            any_node = next(iter(self.graph.keys()))
+        if graph:
+            any_node = next(iter(graph.keys()))
         else:
             any_node = None
 
         if any_node is not None:
             # 5.2 Prim (MST)
             t0 = time.perf_counter()
-            mst_p, cost_p = prim(self.graph, any_node)
+            mst_p, cost_p = prim(graph, any_node)
             t1 = time.perf_counter()
             results.append({
                 "name": "Prim",
@@ -366,14 +480,14 @@ class BusinessAssignmentService:
             })
 
         # 5.3 Edmonds-Karp (Flujo máximo) – armamos capacidades simples = 1
-        nodes_list = list(self.graph.keys())
+        nodes_list = list(graph.keys())
         if len(nodes_list) >= 2:
             source = nodes_list[0]
             sink = nodes_list[1]
 
-            capacity = {u: {} for u in self.graph}
-            for u in self.graph:
-                for v, _w in self.graph[u]:
+            capacity = {u: {} for u in graph}
+            for u in graph:
+                for v, _w in graph[u]:
                     capacity[u][v] = 1
                     if u not in capacity.get(v, {}):
                         capacity.setdefault(v, {})[u] = 0
@@ -399,15 +513,22 @@ class BusinessAssignmentService:
     # ------------------------
     # 6. Método principal para comparar los 8 algoritmos en un paciente
     # ------------------------
-    def compare_all_algorithms_for_patient(self, patient_code: str) -> Dict[str, Any]:
+    def compare_all_algorithms_for_patient(
+        self,
+        patient_code: str,
+        path_algorithms: Optional[List[str]] = None,
+    ) -> Dict[str, Any]:
         """
         Lógica principal:
           - Construye entrada (paciente + hospitales candidatos).
           - Ejecuta 3 algoritmos de asignación para ese paciente.
-          - Para cada asignación, ejecuta 2 algoritmos de ruta (Dijkstra, Bellman-Ford).
+          - Para cada asignación, ejecuta los algoritmos de ruta elegidos (por defecto Dijkstra y Bellman-Ford).
           - Ejecuta 3 algoritmos de redes en el grafo completo.
           - Devuelve todo listo para que el front lo pinte.
         """
+        # Se valida antes de correr las asignaciones
+        path_algorithms = parse_path_algorithms(path_algorithms)
+
         patient, hospitals = self.build_single_patient_inputs(patient_code)
         patient_id = patient["id"]
         specialty = patient["specialty_required"]
@@ -431,6 +552,7 @@ class BusinessAssignmentService:
                     "time_ms": ar["time_ms"],
                     "hospital": None,
                     "distance_geo_km": None,
+                    "distance_network_km": None,
                     "paths": None,
                 })
                 continue
@@ -457,6 +579,7 @@ class BusinessAssignmentService:
                     "time_ms": ar["time_ms"],
                     "hospital": None,
                     "distance_geo_km": None,
+                    "distance_network_km": None,
                     "paths": None,
                 })
                 continue
@@ -471,6 +594,7 @@ class BusinessAssignmentService:
                     "time_ms": ar["time_ms"],
                     "hospital": None,
                     "distance_geo_km": None,
+                    "distance_network_km": None,
                     "paths": None,
                 })
                 continue
@@ -481,8 +605,9 @@ class BusinessAssignmentService:
                 hosp["lat"], hosp["lon"]
             )
 
-            # Rutas en el grafo: Dijkstra vs Bellman-Ford
-            path_results = self.compute_path_algorithms(patient_id, hosp_id)
+            # Distancia por la red (tabla precalculada) y rutas en el grafo
+            d_net = self.network_distance(patient_id, hosp_id)
+            path_results = self.compute_path_algorithms(patient_id, hosp_id, path_algorithms)
 
             assignment_algos_final.append({
                 "name": ar["name"],
@@ -499,6 +624,7 @@ class BusinessAssignmentService:
                     "specialties": hosp.get("specialties"),
                 },
                 "distance_geo_km": d_geo,
+                "distance_network_km": d_net,
                 "paths": path_results,
             })
 
@@ -523,7 +649,11 @@ class BusinessAssignmentService:
     # ------------------------
     # 7. Método para elegir un único hospital "mejor"
     # ------------------------
-    def assign_best_hospital_for_patient(self, patient_code: str) -> Dict[str, Any]:
+    def assign_best_hospital_for_patient(
+        self,
+        patient_code: str,
+        path_algorithms: Optional[List[str]] = None,
+    ) -> Dict[str, Any]:
         """
         Usa compare_all_algorithms_for_patient y aplica la prioridad:
           1) Min-Cost Max-Flow
@@ -535,10 +665,10 @@ class BusinessAssignmentService:
           - Especialidad requerida
           - Algoritmo usado
           - Hospital asignado
-          - Distancia geográfica
+          - Distancia geográfica y por la red
           - Rutas Dijkstra / Bellman-Ford
         """
-        full = self.compare_all_algorithms_for_patient(patient_code)
+        full = self.compare_all_algorithms_for_patient(patient_code, path_algorithms)
         algos = full.get("assignment_algorithms", [])
 
         priority = ["Min-Cost Max-Flow", "Hungarian", "Greedy"]
@@ -561,5 +691,6 @@ class BusinessAssignmentService:
             "algorithm_used": chosen["name"],
             "hospital": chosen["hospital"],
             "distance_geo_km": chosen["distance_geo_km"],
+            "distance_network_km": chosen["distance_network_km"],
             "paths": chosen["paths"],
         }
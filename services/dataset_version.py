@@ -0,0 +1,29 @@
+# services/dataset_version.py
+
+import hashlib
+
+from sqlalchemy import func
+
+from db import db
+from models import Patient, Hospital
+
+
+def get_dataset_version() -> str:
+    """
+    Huella corta de los datos de pacientes y hospitales.
+
+    Se calcula con agregados baratos en SQL (cantidad, id máximo y suma de
+    coordenadas de cada tabla), así que cambia cuando se inserta, elimina o
+    mueve un registro, sin tener que leer todas las filas.
+    """
+    parts = []
+    for model in (Patient, Hospital):
+        row = db.session.query(
+            func.count(model.id),
+            func.max(model.id),
+            func.sum(model.lat),
+            func.sum(model.lon),
+        ).one()
+        parts.append("|".join(repr(v) for v in row))
+
+    return hashlib.sha1(";".join(parts).encode("utf-8")).hexdigest()[:16]
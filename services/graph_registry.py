@@ -0,0 +1,172 @@
+# services/graph_registry.py
+
+import threading
+import time
+
+from services.dataset_version import get_dataset_version
+from services.routing_service import RoutingService, graph_params
+from shared.config import Config
+
+
+class GraphRegistry:
+    """
+    Registro único (por proceso) de los grafos de rutas.
+
+    Cada grafo se identifica por (mode, k, radius_km, versión de datos) y se
+    construye (o se carga del snapshot) una sola vez, la primera vez que se
+    pide. Todos los blueprints y servicios reciben la misma referencia.
+
+    - La construcción es perezosa y thread-safe: si varios hilos piden el
+      mismo grafo a la vez, solo uno lo construye y los demás esperan.
+    - Los arrays del grafo quedan en solo lectura; las actualizaciones
+      incrementales de RoutingService arman un CSRGraph nuevo, así que una
+      referencia ya entregada nunca cambia.
+    - La versión de datos se revisa cada GRAPH_VERSION_CHECK_SECONDS; cuando
+      cambia, los grafos KNN se actualizan con los nodos nuevos, movidos o
+      eliminados (RoutingService.sync_nodes) en vez de reconstruirse, los
+      demás se descartan, y se avisa a los listeners registrados (p.ej.
+      caches de respuestas).
+    """
+
+    def __init__(self, version_check_seconds: float | None = None):
+        if version_check_seconds is None:
+            version_check_seconds = Config.GRAPH_VERSION_CHECK_SECONDS
+        self.version_check_seconds = version_check_seconds
+
+        self._lock = threading.Lock()
+        self._services: dict[tuple, RoutingService] = {}
+        self._building: dict[tuple, threading.Lock] = {}
+        self._version: str | None = None
+        self._version_checked_at = 0.0
+        self._listeners: list = []
+
+    # -----------------------------
+    # Versión de datos
+    # -----------------------------
+    def dataset_version(self) -> str:
+        """Versión de datos actual (consulta la BD como mucho cada N segundos)."""
+        now = time.monotonic()
+        with self._lock:
+            if self._version is not None and now - self._version_checked_at < self.version_check_seconds:
+                return self._version
+
+        version = get_dataset_version()
+
+        with self._lock:
+            changed = version != self._version
+            to_sync = []
+            if changed:
+                # Datos nuevos: los grafos KNN pasan a la versión nueva y se
+                # actualizan con los cambios (siguen respondiendo mientras
+                # tanto); los demás se descartan y se reconstruyen al pedirlos
+                services = {}
+                for key, service in self._services.items():
+                    if key[3] == version:
+                        services[key] = service
+                    elif service.mode == "knn":
+                        new_key = (*key[:3], version)
+                        services[new_key] = service
+                        to_sync.append((new_key, service))
+                self._services = services
+                self._version = version
+            self._version_checked_at = now
+            listeners = list(self._listeners) if changed else []
+
+        for key, service in to_sync:
+            self._sync(key, service, version)
+        for listener in listeners:
+            listener(version)
+        return version
+
+    def _sync(self, key: tuple, service: RoutingService, version: str) -> None:
+        """Actualiza un grafo KNN a `version`; si no se puede, se descarta (se reconstruye al pedirlo)."""
+        t0 = time.time()
+        try:
+            synced = service.sync_nodes(version)
+        except Exception as ex:
+            print(f"⚠️ No se pudo actualizar el grafo {key[:3]}: {ex}")
+            synced = False
+
+        if synced:
+            _freeze(service.graph)
+            print(f"✔️ Grafo {key[:3]} actualizado a {version} en {(time.time() - t0) * 1000:.1f} ms")
+            return
+        with self._lock:
+            if self._services.get(key) is service:
+                del self._services[key]
+
+    def add_version_listener(self, listener) -> None:
+        """Registra listener(version), que se llama cada vez que cambia la versión de datos."""
+        with self._lock:
+            self._listeners.append(listener)
+
+    # -----------------------------
+    # Acceso a los grafos
+    # -----------------------------
+    def get_service(
+        self,
+        mode: str = "knn",
+        k: int | None = None,
+        radius_km: float | None = None,
+    ) -> RoutingService:
+        """RoutingService compartido para esos parámetros (ValueError si el modo no existe)."""
+        params = graph_params(mode, k, radius_km)
+        version = self.dataset_version()
+        key = (*params, version)
+
+        with self._lock:
+            service = self._services.get(key)
+            if service is not None:
+                return service
+            build_lock = self._building.setdefault(key, threading.Lock())
+
+        # Un lock por clave: grafos distintos se pueden construir en paralelo
+        try:
+            with build_lock:
+                with self._lock:
+                    service = self._services.get(key)
+                if service is None:
+                    service = RoutingService(*params, dataset_version=version)
+                    _freeze(service.graph)
+                    with self._lock:
+                        self._services[key] = service
+        finally:
+            with self._lock:
+                self._building.pop(key, None)
+        return service
+
+    def get_graph(self, mode: str = "knn", k: int | None = None, radius_km: float | None = None):
+        """Grafo (CSRGraph) compartido para esos parámetros."""
+        return self.get_service(mode, k, radius_km).get_graph()
+
+    def clear(self) -> None:
+        """Descarta todos los grafos (se vuelven a cargar al pedirlos)."""
+        with self._lock:
+            self._services.clear()
+            self._version = None
+
+    def stats(self) -> list[dict]:
+        with self._lock:
+            return [{
+                "mode": mode,
+                "k": k,
+                "radius_km": radius_km,
+                "dataset_version": version,
+                "nodes": service.graph.num_nodes,
+                "edges": service.graph.num_edges,
+                "bytes": service.graph.nbytes,
+            } for (mode, k, radius_km, version), service in self._services.items()]
+
+
+def _freeze(graph) -> None:
+    """Marca los arrays del CSR como solo lectura (los del snapshot ya lo son)."""
+    for array in (graph.indptr, graph.indices, graph.weights):
+        array.flags.writeable = False
+
+
+# Instancia única del proceso
+graph_registry = GraphRegistry()
+
+
+def get_graph(mode: str = "knn", k: int | None = None, radius_km: float | None = None):
+    return graph_registry.get_graph(mode, k, radius_km)
@@ -0,0 +1,175 @@
+# services/path_batch.py
+
+from concurrent.futures import ThreadPoolExecutor
+
+from scipy.sparse import csgraph
+
+from algorithms.components import ComponentIndex
+from graph.csr_graph import CSRGraph
+from services.path_cache import ShortestPathTreeCache, sp_tree_cache
+
+# Celdas (orígenes × nodos) por llamada a Dijkstra multi-origen: acota la
+# memoria de cada tanda (distancias float64 + predecesores int32)
+BATCH_MAX_CELLS = 1 << 22
+
+
+def parse_pairs(body, max_pairs: int) -> list[tuple[str, str]]:
+    """
+    Pares del body: [[start, end], ...] o [{"start": ..., "end": ...}, ...].
+    ValueError si el formato es inválido o son más de max_pairs.
+    """
+    raw = (body or {}).get("pairs")
+    if not isinstance(raw, list) or not raw:
+        raise ValueError("pairs debe ser una lista no vacía de [start, end]")
+    if len(raw) > max_pairs:
+        raise ValueError(f"Demasiados pares: {len(raw)} (máximo {max_pairs})")
+
+    pairs = []
+    for i, pair in enumerate(raw):
+        if isinstance(pair, dict):
+            pair = (pair.get("start"), pair.get("end"))
+        if not isinstance(pair, (list, tuple)) or len(pair) != 2 or not all(isinstance(p, str) for p in pair):
+            raise ValueError(f"Par inválido en la posición {i}: usar [start, end]")
+        pairs.append((pair[0], pair[1]))
+    return pairs
+
+
+def group_by_source(pairs: list[tuple[str, str]]) -> list[tuple[str, list[int]]]:
+    """[(origen, índices de sus pares)] en orden de primera aparición."""
+    groups: dict[str, list[int]] = {}
+    for i, (start, _end) in enumerate(pairs):
+        groups.setdefault(start, []).append(i)
+    return list(groups.items())
+
+
+def _route(predecessors, target: int) -> list[int]:
+    """Ruta origen -> target a partir de una fila de predecesores de scipy."""
+    route = []
+    curr = target
+    while curr >= 0:
+        route.append(int(curr))
+        curr = predecessors[curr]
+    return list(reversed(route))
+
+
+def batch_shortest_paths(
+    graph: CSRGraph,
+    components: ComponentIndex,
+    pairs: list[tuple[str, str]],
+    workers: int = 1,
+    with_paths: bool = True,
+    trees: ShortestPathTreeCache = sp_tree_cache,
+):
+    """
+    Genera un resultado por par, en el orden de `pairs`.
+
+    Los pares se agrupan por origen y cada origen hace una sola búsqueda.
+    Si el origen ya tiene su árbol en la cache compartida de /dijkstra se
+    usa ese; los demás no pasan por la cache (un batch con miles de
+    orígenes la vaciaría) y se resuelven en tandas con el Dijkstra
+    multi-origen de scipy (árbol completo, hasta BATCH_MAX_CELLS celdas por
+    tanda). Con workers > 1 las tandas se reparten en un pool de hilos; los
+    resultados que llegan adelantados se guardan hasta que les toca salir.
+    """
+    ids = graph.ids
+
+    def resolve(start, indexes, search):
+        """search(t) -> (distancia, ruta en posiciones); solo para pares con camino posible."""
+        results = {}
+        s = ids.get(start)
+        for i in indexes:
+            end = pairs[i][1]
+            result = {"index": i, "start": start, "end": end}
+            t = ids.get(end)
+            if s is None or t is None:
+                result["error"] = f"Nodo {start if s is None else end} no existe en el grafo"
+            elif not components.reachable(start, end):
+                result["distance"] = float("inf")
+                if with_paths:
+                    result["path"] = [end]
+            else:
+                distance, route = search(t)
+                result["distance"] = distance
+                if with_paths:
+                    result["path"] = [ids.id_of(p) for p in route]
+            results[i] = result
+        return results
+
+    def needs_search(start, indexes) -> bool:
+        return start in ids and any(
+            pairs[i][1] in ids and components.reachable(start, pairs[i][1]) for i in indexes
+        )
+
+    def from_tree(group, tree):
+        def search(t):
+            tree.ensure(t)
+            return float(tree.dist[t]), tree.path(t)
+
+        return resolve(*group, search)
+
+    def from_scipy(chunk):
+        sources = [ids.index_of(start) for start, _indexes in chunk]
+        dist, pred = csgraph.dijkstra(
+            graph.to_scipy(), directed=True, indices=sources, return_predecessors=True,
+        )
+        results = {}
+        for row, group in enumerate(chunk):
+            results.update(resolve(*group, lambda t: (float(dist[row, t]), _route(pred[row], t))))
+        return results
+
+    # Grupos sin búsqueda o con árbol en cache van solos; el resto se junta
+    # en tandas (acotadas por BATCH_MAX_CELLS y repartidas entre los workers)
+    classified = []
+    for group in group_by_source(pairs):
+        tree = None
+        if not needs_search(*group):
+            kind = "none"
+        else:
+            tree = trees.cached(graph, ids.index_of(group[0]))
+            kind = "scipy" if tree is None else "tree"
+        classified.append((group, kind, tree))
+
+    fresh = sum(1 for _group, kind, _tree in classified if kind == "scipy")
+    chunk_size = max(1, min(
+        BATCH_MAX_CELLS // max(graph.num_nodes, 1),
+        -(-fresh // max(workers, 1)),
+    ))
+
+    # Tareas en orden de primera aparición, para ir emitiendo en orden
+    tasks = []
+    chunk = []
+    for group, kind, tree in classified:
+        if kind == "none":
+            tasks.append((resolve, (*group, None)))
+        elif kind == "tree":
+            tasks.append((from_tree, (group, tree)))
+        else:
+            chunk.append(group)
+            if len(chunk) == chunk_size:
+                tasks.append((from_scipy, (chunk,)))
+                chunk = []
+    if chunk:
+        tasks.append((from_scipy, (chunk,)))
+
+    pending: dict[int, dict] = {}
+    next_index = 0
+
+    def ready():
+        nonlocal next_index
+        while next_index in pending:
+            yield pending.pop(next_index)
+            next_index += 1
+
+    def run(task):
+        solve, args = task
+        return solve(*args)
+
+    if workers > 1 and len(tasks) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for results in pool.map(run, tasks):
+                pending.update(results)
+                yield from ready()
+    else:
+        for task in tasks:
+            pending.update(run(task))
+            yield from ready()
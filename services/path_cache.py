@@ -0,0 +1,70 @@
+# services/path_cache.py
+
+from algorithms.sp_tree import ShortestPathTree
+from graph.csr_graph import CSRGraph
+from services.response_cache import ResponseCache
+from shared.config import Config
+
+
+class ShortestPathTreeCache:
+    """
+    Cache LRU de árboles de caminos mínimos, por (grafo, origen).
+    Se acota por cantidad de árboles y por bytes (dist + parent). Los
+    árboles no mantienen vivo su grafo y se descartan todos cuando cambia
+    la versión de datos (set_version).
+    """
+
+    def __init__(self, max_entries: int | None = None, max_mb: int | None = None):
+        self._trees = ResponseCache(
+            max_entries=max_entries or Config.SP_TREE_CACHE_MAX_ENTRIES,
+            max_bytes=(max_mb or Config.SP_TREE_CACHE_MAX_MB) * 1024 * 1024,
+            ttl_seconds=float("inf"),
+        )
+
+    def cached(self, graph: CSRGraph, source: int) -> ShortestPathTree | None:
+        """
+        Árbol de ese origen si ya está en la cache. No crea ni agrega nada,
+        ni cuenta en las estadísticas de /dijkstra.
+        """
+        tree = self._trees.peek((id(graph), source))
+        # id() se puede reutilizar cuando un grafo viejo se libera
+        return tree if tree is not None and tree.graph is graph else None
+
+    def tree(self, graph: CSRGraph, source: int) -> tuple[ShortestPathTree, bool]:
+        """(árbol, hit) para ese origen; el árbol se crea vacío si no estaba."""
+        key = (id(graph), source)
+        tree = self._trees.get(key)
+        # id() se puede reutilizar cuando un grafo viejo se libera
+        if tree is not None and tree.graph is graph:
+            return tree, True
+
+        tree = ShortestPathTree(graph, source)
+        self._trees.put(key, tree, nbytes=tree.nbytes)
+        return tree, False
+
+    def shortest_path(self, graph: CSRGraph, start: str, end: str):
+        """
+        Igual que dijkstra(graph, start, end), reutilizando el árbol del
+        origen. Devuelve (distancia, ruta, estado) con estado "hit" (solo
+        reconstrucción), "resumed" (árbol extendido) o "miss" (árbol nuevo).
+        """
+        s = graph.ids.index_of(start)
+        t = graph.ids.index_of(end)
+
+        tree, hit = self.tree(graph, s)
+        grew = tree.ensure(t)
+
+        status = "miss" if not hit else ("resumed" if grew else "hit")
+        route = [graph.ids.id_of(i) for i in tree.path(t)]
+        return float(tree.dist[t]), route, status
+
+    def set_version(self, version: str) -> None:
+        """Listener del registro de grafos: con datos nuevos se descartan los árboles."""
+        self._trees.set_version(version)
+
+    def stats(self) -> dict:
+        return self._trees.stats()
+
+
+# Cache compartida del proceso
+sp_tree_cache = ShortestPathTreeCache()
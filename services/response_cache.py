@@ -0,0 +1,120 @@
+# services/response_cache.py
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """
+    Cache LRU acotada para respuestas ya calculadas.
+
+    - max_entries / max_bytes: al pasarse de cualquiera de los dos se
+      descartan las entradas usadas hace más tiempo.
+    - ttl_seconds: una entrada más vieja que esto se considera vencida.
+    - version: las entradas quedan asociadas a una versión de datos; al
+      cambiar la versión (set_version) se descarta todo.
+
+    Cada entrada guarda su tamaño aproximado en bytes (lo informa quien la
+    agrega). Es thread-safe.
+    """
+
+    def __init__(self, max_entries: int = 64, max_bytes: int = 128 * 1024 * 1024, ttl_seconds: float = 600):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+
+        self._lock = threading.Lock()
+        # key -> (value, nbytes, expires_at)
+        self._entries: OrderedDict = OrderedDict()
+        self._bytes = 0
+        self._version: str | None = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        """Valor guardado para `key`, o None si no está o ya venció."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, nbytes, expires_at = entry
+            if time.monotonic() >= expires_at:
+                self._drop(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def peek(self, key):
+        """Como get() pero sin contar hit/miss ni mover la entrada en el LRU."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() >= entry[2]:
+                return None
+            return entry[0]
+
+    def put(self, key, value, nbytes: int) -> None:
+        """Agrega (o reemplaza) una entrada y descarta las menos usadas si no cabe."""
+        if nbytes > self.max_bytes:
+            # Una sola respuesta más grande que todo el presupuesto no se guarda
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+
+            self._entries[key] = (value, nbytes, time.monotonic() + self.ttl_seconds)
+            self._bytes += nbytes
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def _drop(self, key) -> None:
+        _value, nbytes, _expires_at = self._entries.pop(key)
+        self._bytes -= nbytes
+
+    def clear(self) -> None:
+        """Descarta todas las entradas (p.ej. cuando cambian los datos)."""
+        with self._lock:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._bytes = 0
+
+    def set_version(self, version: str) -> None:
+        """Asocia la cache a una versión de datos; si cambió, se vacía."""
+        with self._lock:
+            changed = self._version is not None and version != self._version
+            self._version = version
+        if changed:
+            self.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "dataset_version": self._version,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
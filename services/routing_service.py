@@ -1,11 +1,363 @@
+import hashlib
+import threading
+import time
+
+import numpy as np
+
+from algorithms.components import COMPONENT_ARRAYS, ComponentIndex
+from algorithms.contraction_hierarchy import CH_ARRAYS, ContractionHierarchy
+from algorithms.floyd_warshall import FW_ARRAYS, AllPairsShortestPaths
+from algorithms.hospital_distances import TABLE_ARRAYS, HospitalDistanceTable
+from algorithms.landmarks import LANDMARK_ARRAYS, LandmarkIndex
 from graph.graph_builder import GraphBuilder
+from graph.graph_snapshot import (
+    load_snapshot,
+    load_snapshot_arrays,
+    prune_snapshots,
+    save_snapshot,
+    save_snapshot_arrays,
+    snapshot_path,
+)
+from services.dataset_version import get_dataset_version
+from services.response_cache import ResponseCache
+from shared.config import Config
+
+GRAPH_MODES = ("knn", "radius", "bipartite_knn")
+
+
+def graph_params(mode: str = "knn", k: int | None = None, radius_km: float | None = None):
+    """
+    Normaliza (mode, k, radius_km): solo se conservan los parámetros que usa
+    cada modo, que son los que identifican al grafo (snapshot, registro).
+    """
+    if mode not in GRAPH_MODES:
+        raise ValueError(f"graph_mode inválido: {mode}")
+
+    k = (k or Config.K_NEIGHBORS) if mode != "radius" else None
+    radius_km = float(radius_km or 50.0) if mode == "radius" else None
+    return mode, k, radius_km
+
 
 class RoutingService:
-    
-    def __init__(self):
-        self.graph_builder = GraphBuilder()
+    """
+    Grafo de rutas para un modo de construcción dado.
+
+    Antes de construir busca un snapshot en disco para la misma versión de
+    datos y los mismos parámetros; si no hay, construye el grafo y lo deja
+    guardado para los próximos workers.
+
+    Los arrays del grafo se abren desde el snapshot con mmap de solo
+    lectura: todos los workers de gunicorn comparten las mismas páginas,
+    así que la memoria del host no crece con el número de workers.
+
+    Cuando cambian los datos, el grafo KNN se actualiza en memoria con
+    sync_nodes (solo las filas afectadas) en lugar de reconstruirse.
+    """
+
+    def __init__(
+        self,
+        mode: str = "knn",
+        k: int | None = None,
+        radius_km: float | None = None,
+        dataset_version: str | None = None,
+    ):
+        self.mode, self.k, self.radius_km = graph_params(mode, k, radius_km)
+
+        self.graph_builder = GraphBuilder(k=self.k)
+        self.dataset_version = dataset_version or get_dataset_version()
+        # Grafo tal como quedó en el snapshot (los derivados solo se guardan para ese)
+        self._snapshot_graph = None
+        self.graph = self._load_or_build()
+        # (grafo, lats, lons) de la última llamada a node_coords
+        self._coords = None
+        # Datos derivados del grafo: nombre -> (grafo, objeto)
+        self._derived = {}
+        # _derived_lock solo protege los dicts; cada construcción usa su
+        # propio lock (clave -> Lock), como GraphRegistry
+        self._derived_lock = threading.Lock()
+        self._building: dict = {}
+        # Matrices de Floyd-Warshall por subconjunto de nodos: (id(grafo), nombre) -> (grafo, resultado)
+        self._all_pairs = ResponseCache(
+            max_entries=Config.FLOYD_CACHE_MAX_ENTRIES,
+            max_bytes=Config.FLOYD_CACHE_MAX_MB * 1024 * 1024,
+            ttl_seconds=float("inf"),
+        )
+        # (grafo, hilo) de la construcción en segundo plano de la jerarquía
+        self._ch_thread = None
+        # Serializa las actualizaciones incrementales del grafo
+        self._update_lock = threading.Lock()
+
+    def _snapshot_path(self) -> str | None:
+        if not Config.GRAPH_SNAPSHOT_DIR:
+            return None
+        return snapshot_path(
+            Config.GRAPH_SNAPSHOT_DIR, self.dataset_version, self.mode, self.k, self.radius_km
+        )
+
+    def _build(self):
         self.graph_builder.load_nodes_from_db()
-        self.graph = self.graph_builder.build_knn_graph()
+        if self.mode == "knn":
+            return self.graph_builder.build_knn_graph(k=self.k)
+        if self.mode == "radius":
+            return self.graph_builder.build_radius_graph(radius_km=self.radius_km)
+        return self.graph_builder.build_bipartite_knn_graph(k=self.k)
+
+    def _attach_snapshot(self, path: str):
+        """Usa el grafo del snapshot (arrays compartidos). None si no existe."""
+        t0 = time.time()
+        snapshot = load_snapshot(path)
+        if snapshot is None:
+            return None
+
+        nodes, graph, _meta = snapshot
+        knn_k = self.k if self.mode == "knn" else None
+        print(f"✔️ Grafo {self.mode} cargado de snapshot en {(time.time() - t0) * 1000:.1f} ms")
+        self._snapshot_graph = self.graph_builder.restore(nodes, graph, knn_k=knn_k)
+        return self._snapshot_graph
+
+    def _load_or_build(self):
+        path = self._snapshot_path()
+
+        if path:
+            graph = self._attach_snapshot(path)
+            if graph is not None:
+                return graph
+
+        graph = self._build()
+
+        if path:
+            try:
+                save_snapshot(path, self.graph_builder.nodes, graph, meta={
+                    "dataset_version": self.dataset_version,
+                    "mode": self.mode,
+                    "k": self.k,
+                    "radius_km": self.radius_km,
+                })
+                prune_snapshots(path, self.mode, self.k, self.radius_km)
+            except OSError as ex:
+                print(f"⚠️ No se pudo guardar el snapshot {path}: {ex}")
+            else:
+                # Se cambia la copia privada recién construida por la versión
+                # mapeada, igual que en los demás workers
+                graph = self._attach_snapshot(path) or graph
+
+        return graph
 
     def get_graph(self):
         return self.graph
+
+    def node_coords(self):
+        """
+        (lats, lons) como arrays alineados con los ids enteros del grafo
+        actual (para heurísticas geográficas). Se arman una vez por grafo.
+        """
+        nodes, graph = self.nodes_and_graph()
+        if self._coords is None or self._coords[0] is not graph:
+            lats = np.array([n["lat"] for n in nodes], dtype=float)
+            lons = np.array([n["lon"] for n in nodes], dtype=float)
+            self._coords = (graph, lats, lons)
+        return self._coords[1], self._coords[2]
+
+    def _build_once(self, key, lookup, build):
+        """
+        lookup() devuelve el objeto ya construido (o None); build() lo arma y
+        lo guarda. Si varios hilos piden la misma clave solo uno construye y
+        los demás esperan; claves distintas no se bloquean entre sí (una
+        construcción lenta no frena a components() ni a las demás consultas).
+        """
+        with self._derived_lock:
+            data = lookup()
+            if data is not None:
+                return data
+            build_lock = self._building.setdefault(key, threading.Lock())
+
+        try:
+            with build_lock:
+                with self._derived_lock:
+                    data = lookup()
+                if data is None:
+                    data = build()
+        finally:
+            with self._derived_lock:
+                self._building.pop(key, None)
+        return data
+
+    def _derived_data(self, name: str, array_names, load, build, build_missing: bool = True):
+        """
+        Preprocesamiento del grafo actual guardado en la subcarpeta `name` del
+        snapshot. Se carga de ahí si ya está; si no, se construye (una vez por
+        grafo) y se guarda para los demás workers. Para un grafo con
+        actualizaciones incrementales se construye en memoria.
+        Con build_missing=False nunca se construye: None si no está.
+        """
+        graph = self.graph
+
+        def lookup():
+            cached = self._derived.get(name)
+            return cached[1] if cached is not None and cached[0] is graph else None
+
+        def build_and_store():
+            data = self._load_or_build_derived(graph, name, array_names, load, build, build_missing)
+            if data is not None:
+                with self._derived_lock:
+                    self._derived[name] = (graph, data)
+            return data
+
+        return self._build_once(("derived", name), lookup, build_and_store)
+
+    def _load_or_build_derived(self, graph, name: str, array_names, load, build, build_missing: bool = True):
+        path = self._snapshot_path() if graph is self._snapshot_graph else None
+        arrays = load_snapshot_arrays(path, name, array_names) if path else None
+        if arrays is not None:
+            return load(graph.ids, arrays)
+        if not build_missing:
+            return None
+
+        data = build(graph)
+        if path:
+            try:
+                save_snapshot_arrays(path, name, data.to_arrays())
+            except OSError as ex:
+                print(f"⚠️ No se pudo guardar {name} en {path}: {ex}")
+        return data
+
+    def components(self) -> ComponentIndex:
+        """Componentes débilmente conexas del grafo actual (ver _derived_data)."""
+        return self._derived_data(
+            "components", COMPONENT_ARRAYS, ComponentIndex.from_arrays, ComponentIndex.build
+        )
+
+    def contraction_hierarchy(self, build: bool = True) -> ContractionHierarchy | None:
+        """
+        Jerarquía de contracción del grafo actual (ver _derived_data). Con
+        build=False solo se devuelve si ya está en memoria o en el snapshot
+        (None si no): construirla es Python puro y cuesta segundos (~5 s
+        con 1.400 nodos), así que no se hace dentro de una request.
+        """
+        return self._derived_data(
+            "ch", CH_ARRAYS, ContractionHierarchy.from_arrays, ContractionHierarchy.build,
+            build_missing=build,
+        )
+
+    def build_contraction_hierarchy_in_background(self) -> None:
+        """Construye la jerarquía del grafo actual en un hilo aparte (uno por grafo)."""
+        graph = self.graph
+        with self._derived_lock:
+            if self._ch_thread is not None and self._ch_thread[0] is graph:
+                return
+            thread = threading.Thread(target=self.contraction_hierarchy, name="ch-build", daemon=True)
+            self._ch_thread = (graph, thread)
+        thread.start()
+
+    def hospital_distances(self) -> HospitalDistanceTable:
+        """Tabla H×n de distancias por la red a cada hospital (ver _derived_data)."""
+        def build(graph):
+            # Por código: la lista de nodos puede ser de una actualización posterior
+            hospitals = [
+                graph.ids.index_of(n["id"]) for n in self.graph_builder.nodes
+                if n["type"] == "hospital" and n["id"] in graph.ids
+            ]
+            return HospitalDistanceTable.build(graph, hospitals)
+
+        return self._derived_data(
+            "hospitals", TABLE_ARRAYS, HospitalDistanceTable.from_arrays, build
+        )
+
+    def landmarks(self) -> LandmarkIndex:
+        """Landmarks ALT (ALT_LANDMARKS) del grafo actual (ver _derived_data)."""
+        return self._derived_data(
+            "landmarks", LANDMARK_ARRAYS, LandmarkIndex.from_arrays,
+            lambda graph: LandmarkIndex.build(graph, Config.ALT_LANDMARKS),
+        )
+
+    def all_pairs(self, nodes=None, cache: bool = True) -> AllPairsShortestPaths:
+        """
+        Floyd-Warshall sobre el subgrafo inducido por `nodes` (ids; None =
+        todo el grafo). Con cache, cada subconjunto se calcula una vez por
+        grafo y queda en una cache LRU y en el snapshot (carpeta
+        floyd-<hash de los nodos>). Sin cache (subconjuntos arbitrarios
+        como un bbox) se calcula para esta consulta y se descarta.
+        ValueError si el subconjunto supera FLOYD_MAX_NODES (sin cache,
+        FLOYD_BBOX_MAX_NODES: ese costo se paga en cada request).
+        """
+        graph = self.graph
+        if nodes is None:
+            positions = np.arange(graph.num_nodes, dtype=np.int32)
+        else:
+            positions = np.unique([graph.ids.index_of(node) for node in nodes if node in graph.ids]).astype(np.int32)
+        max_nodes = Config.FLOYD_MAX_NODES if cache else Config.FLOYD_BBOX_MAX_NODES
+        if len(positions) > max_nodes:
+            raise ValueError(
+                f"Floyd-Warshall sobre {len(positions)} nodos (máximo {max_nodes}); "
+                + ("restringir por departamento o bbox" if cache else "achicar el bbox o usar ?department=")
+            )
+        if not cache:
+            return AllPairsShortestPaths.build(graph, positions)
+
+        name = "floyd-" + hashlib.sha1(positions.tobytes()).hexdigest()[:16]
+        key = (id(graph), name)
+
+        def lookup():
+            cached = self._all_pairs.get(key)
+            # id() se puede reutilizar cuando un grafo viejo se libera
+            return cached[1] if cached is not None and cached[0] is graph else None
+
+        def build_and_store():
+            result = self._load_or_build_derived(
+                graph, name, FW_ARRAYS, AllPairsShortestPaths.from_arrays,
+                lambda g: AllPairsShortestPaths.build(g, positions),
+            )
+            self._all_pairs.put(key, (graph, result), nbytes=result.nbytes)
+            return result
+
+        return self._build_once(key, lookup, build_and_store)
+
+    # -----------------------------
+    # Actualizaciones incrementales (sin reconstruir todo el KNN)
+    # -----------------------------
+    def nodes_and_graph(self):
+        """(nodos, grafo) de la misma versión (no se cruzan con una actualización)."""
+        with self._update_lock:
+            return self.graph_builder.nodes, self.graph
+
+    def update_nodes(self, inserted=(), moved=(), removed=()):
+        """Aplica cambios de nodos al grafo KNN (ver GraphBuilder.update_nodes)."""
+        with self._update_lock:
+            self.graph = self.graph_builder.update_nodes(inserted, moved, removed)
+            return self.graph
+
+    def sync_nodes(self, version: str) -> bool:
+        """
+        Lleva el grafo a la versión de datos `version` aplicando solo los
+        cambios de la BD (nodos nuevos, movidos y eliminados) en vez de
+        reconstruirlo: una lectura de los nodos y O(k) filas por cambio.
+
+        Devuelve False sin tocar nada si el grafo no es KNN o si hay más de
+        GRAPH_INCREMENTAL_MAX_CHANGES cambios (ahí conviene reconstruir).
+        El grafo actualizado vive en memoria del worker; el snapshot se
+        rearma en la próxima construcción completa.
+        """
+        if self.mode != "knn":
+            return False
+
+        loader = GraphBuilder(k=self.k)
+        loader.load_nodes_from_db()
+
+        with self._update_lock:
+            current = {node["id"]: node for node in self.graph_builder.nodes}
+            latest = {node["id"]: node for node in loader.nodes}
+
+            removed = [node_id for node_id in current if node_id not in latest]
+            inserted = [node for node_id, node in latest.items() if node_id not in current]
+            moved = [
+                node for node_id, node in latest.items()
+                if node_id in current
+                and (node["lat"], node["lon"]) != (current[node_id]["lat"], current[node_id]["lon"])
+            ]
+            if len(inserted) + len(moved) + len(removed) > Config.GRAPH_INCREMENTAL_MAX_CHANGES:
+                return False
+
+            if inserted or moved or removed:
+                self.graph = self.graph_builder.update_nodes(inserted, moved, removed)
+            self.dataset_version = version
+        return True
@@ -0,0 +1,155 @@
+# services/tile_service.py
+
+import numpy as np
+
+from graph.csr_graph import CSRGraph
+from graph.tile_index import MAX_ZOOM, TileIndex, tiles_for_bbox
+from services.response_cache import ResponseCache
+from shared.config import Config
+
+# Bytes aproximados de cada nodo/arista de un tile en cache (dict de Python)
+_ITEM_BYTES = 300
+
+
+class TileService:
+    """
+    Tiles (zoom, x, y) de un grafo ya construido, para el mapa.
+
+    - Zoom >= cluster_max_zoom: nodos del tile + aristas que salen de ellos
+      (con los nodos destino, aunque estén fuera del tile).
+    - Zoom menor: los pacientes se agrupan en clusters (un punto por
+      sub-tile de zoom + cluster_levels, con la cantidad y el centroide);
+      los hospitales se envían siempre sueltos y solo se dibujan las
+      aristas entre hospitales.
+
+    Los nodos de cada tile salen de un TileIndex (rango contiguo, sin
+    recorrer todo el grafo) y cada tile calculado queda en una cache LRU.
+    """
+
+    def __init__(self, nodes: list[dict], graph: CSRGraph):
+        self.nodes = nodes
+        self.graph = graph
+        self.cluster_max_zoom = Config.TILE_CLUSTER_MAX_ZOOM
+        self.cluster_levels = Config.TILE_CLUSTER_LEVELS
+
+        self.lats = np.array([n["lat"] for n in nodes], dtype=float)
+        self.lons = np.array([n["lon"] for n in nodes], dtype=float)
+        self.is_patient = np.array([n["type"] == "patient" for n in nodes], dtype=bool)
+        self.index = TileIndex(self.lats, self.lons)
+
+        self.cache = ResponseCache(
+            max_entries=Config.TILE_CACHE_MAX_ENTRIES,
+            max_bytes=Config.TILE_CACHE_MAX_MB * 1024 * 1024,
+            ttl_seconds=Config.GRAPH_RESPONSE_CACHE_TTL_SECONDS,
+        )
+
+    # -----------------------------
+    # Un tile
+    # -----------------------------
+    def tile(self, zoom: int, x: int, y: int) -> dict:
+        """{"nodes": [...], "edges": [...]} del tile (desde la cache si está)."""
+        key = (zoom, x, y)
+        content = self.cache.get(key)
+        if content is None:
+            if zoom >= self.cluster_max_zoom:
+                content = self._detail_tile(zoom, x, y)
+            else:
+                content = self._clustered_tile(zoom, x, y)
+            items = len(content["nodes"]) + len(content["edges"])
+            self.cache.put(key, content, nbytes=256 + items * _ITEM_BYTES)
+        return content
+
+    def _out_edges(self, pos: np.ndarray):
+        """(src, dst, weight) de todas las aristas que salen de `pos` (vectorizado)."""
+        indptr = self.graph.indptr
+        starts = indptr[pos]
+        counts = indptr[pos + 1] - starts
+        # Índices de arista: concatenación de los rangos [start, start + count)
+        first = np.repeat(np.cumsum(counts) - counts, counts)
+        edge_idx = np.repeat(starts, counts) + (np.arange(counts.sum()) - first)
+        return np.repeat(pos, counts), self.graph.indices[edge_idx], self.graph.weights[edge_idx]
+
+    def _node_dicts(self, pos) -> list[dict]:
+        return [
+            {"id": n["id"], "lat": n["lat"], "lon": n["lon"], "type": n["type"]}
+            for n in (self.nodes[p] for p in pos.tolist())
+        ]
+
+    def _edge_dicts(self, src, dst, weights) -> list[dict]:
+        id_of = self.graph.ids.ids
+        return [
+            {"from": id_of[i], "to": id_of[j], "weight": round(w, 2)}
+            for i, j, w in zip(src.tolist(), dst.tolist(), weights.tolist())
+        ]
+
+    def _detail_tile(self, zoom: int, x: int, y: int) -> dict:
+        pos = self.index.nodes_in_tile(zoom, x, y)
+        src, dst, weights = self._out_edges(pos)
+        return {
+            "nodes": self._node_dicts(np.union1d(pos, dst)),
+            "edges": self._edge_dicts(src, dst, weights),
+        }
+
+    def _clustered_tile(self, zoom: int, x: int, y: int) -> dict:
+        cell_zoom = min(zoom + self.cluster_levels, MAX_ZOOM)
+        pos, cells = self.index.cells_in_tile(zoom, x, y, cell_zoom)
+
+        # Pacientes: las celdas quedan contiguas (orden Z), así que se suman con reduceat
+        patient = self.is_patient[pos]
+        p_pos, p_cells = pos[patient], cells[patient]
+        nodes = []
+        if len(p_pos):
+            starts = np.flatnonzero(np.r_[True, p_cells[1:] != p_cells[:-1]])
+            counts = np.diff(np.r_[starts, len(p_pos)])
+            lat = np.add.reduceat(self.lats[p_pos], starts) / counts
+            lon = np.add.reduceat(self.lons[p_pos], starts) / counts
+            for start, count, cell, la, lo in zip(
+                starts.tolist(), counts.tolist(), p_cells[starts].tolist(), lat.tolist(), lon.tolist()
+            ):
+                if count == 1:
+                    nodes.extend(self._node_dicts(p_pos[start:start + 1]))
+                else:
+                    nodes.append({
+                        "id": f"cluster/{cell_zoom}/{cell}",
+                        "lat": la,
+                        "lon": lo,
+                        "type": "cluster",
+                        "count": count,
+                    })
+
+        # Hospitales sueltos y solo aristas hospital -> hospital
+        h_pos = pos[~patient]
+        src, dst, weights = self._out_edges(h_pos)
+        keep = ~self.is_patient[dst]
+        src, dst, weights = src[keep], dst[keep], weights[keep]
+
+        nodes.extend(self._node_dicts(np.union1d(h_pos, dst)))
+        return {"nodes": nodes, "edges": self._edge_dicts(src, dst, weights)}
+
+    # -----------------------------
+    # Vista (bbox + zoom)
+    # -----------------------------
+    def view(self, bbox: tuple[float, float, float, float], zoom: int) -> dict:
+        """
+        Une los tiles que cubren el bbox (nodos sin repetir).
+        ValueError si el bbox cubre más de TILE_MAX_TILES tiles.
+        """
+        tiles = tiles_for_bbox(*bbox, zoom, max_tiles=Config.TILE_MAX_TILES)
+
+        nodes: dict[str, dict] = {}
+        edges: list[dict] = []
+        for x, y in tiles:
+            content = self.tile(zoom, x, y)
+            for node in content["nodes"]:
+                nodes.setdefault(node["id"], node)
+            edges.extend(content["edges"])
+
+        return {
+            "zoom": zoom,
+            "tiles": len(tiles),
+            "clustered": zoom < self.cluster_max_zoom,
+            "nodes": list(nodes.values()),
+            "edges": edges,
+            "total_nodes": len(nodes),
+            "total_edges": len(edges),
+        }
@@ -3,6 +3,8 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
 class Config:
     SECRET_KEY = os.getenv("SECRET_KEY", "dev-secret")
     SQLALCHEMY_DATABASE_URI = os.getenv(
@@ -13,3 +15,57 @@ class Config:
 
     # Parámetros para Graph KNN
     K_NEIGHBORS = 10
+    # "kdtree" (índice espacial, O(n log n)), "matrix" (matriz n x n) o
+    # "blocked" (matriz por bloques dentro de DISTANCE_MEMORY_BUDGET_MB)
+    GRAPH_BUILD_METHOD = os.getenv("GRAPH_BUILD_METHOD", "kdtree")
+    # dtype de los pesos en el grafo CSR ("float64" o "float32")
+    GRAPH_WEIGHT_DTYPE = os.getenv("GRAPH_WEIGHT_DTYPE", "float64")
+    # Memoria máxima (MB) para los bloques de distancias al construir grafos
+    DISTANCE_MEMORY_BUDGET_MB = int(os.getenv("DISTANCE_MEMORY_BUDGET_MB", "256"))
+
+    # Carpeta de snapshots de grafos ("" desactiva los snapshots)
+    GRAPH_SNAPSHOT_DIR = os.getenv("GRAPH_SNAPSHOT_DIR", os.path.join(BASE_DIR, "data", "snapshots"))
+    # Cada cuántos segundos el registro de grafos revisa si cambiaron los datos
+    GRAPH_VERSION_CHECK_SECONDS = float(os.getenv("GRAPH_VERSION_CHECK_SECONDS", "30"))
+    # Cuando cambian los datos, los grafos KNN cargados se actualizan nodo a
+    # nodo (~1-3 ms por cambio) si hay hasta esta cantidad de cambios; con
+    # más se reconstruyen completos
+    GRAPH_INCREMENTAL_MAX_CHANGES = int(os.getenv("GRAPH_INCREMENTAL_MAX_CHANGES", "256"))
+    # Jerarquía de contracción (/api/path/ch), opcional: se construye en el
+    # on_starting de gunicorn y queda en el snapshot. Es Python puro: ~5 s
+    # con 1.400 nodos y crece más que linealmente, así que nunca se arma
+    # dentro de una request (sin ella /api/path/ch responde 503)
+    GRAPH_CH_PRECOMPUTE = os.getenv("GRAPH_CH_PRECOMPUTE", "0") == "1"
+
+    # Cache de respuestas de /api/graph (LRU acotada por entradas y MB, con TTL)
+    GRAPH_RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("GRAPH_RESPONSE_CACHE_MAX_ENTRIES", "64"))
+    GRAPH_RESPONSE_CACHE_MAX_MB = int(os.getenv("GRAPH_RESPONSE_CACHE_MAX_MB", "128"))
+    GRAPH_RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("GRAPH_RESPONSE_CACHE_TTL_SECONDS", "600"))
+
+    # Tiles del mapa (/api/graph/tile): debajo de TILE_CLUSTER_MAX_ZOOM los
+    # pacientes se agrupan en 4^TILE_CLUSTER_LEVELS celdas por tile
+    TILE_CLUSTER_MAX_ZOOM = int(os.getenv("TILE_CLUSTER_MAX_ZOOM", "11"))
+    TILE_CLUSTER_LEVELS = int(os.getenv("TILE_CLUSTER_LEVELS", "3"))
+    TILE_MAX_TILES = int(os.getenv("TILE_MAX_TILES", "64"))
+    TILE_CACHE_MAX_ENTRIES = int(os.getenv("TILE_CACHE_MAX_ENTRIES", "2048"))
+    TILE_CACHE_MAX_MB = int(os.getenv("TILE_CACHE_MAX_MB", "64"))
+
+    # Cache de árboles de caminos mínimos por origen (/api/path/dijkstra)
+    SP_TREE_CACHE_MAX_ENTRIES = int(os.getenv("SP_TREE_CACHE_MAX_ENTRIES", "256"))
+    SP_TREE_CACHE_MAX_MB = int(os.getenv("SP_TREE_CACHE_MAX_MB", "256"))
+    # POST /api/path/batch: máximo de pares por request y de hilos por request
+    PATH_BATCH_MAX_PAIRS = int(os.getenv("PATH_BATCH_MAX_PAIRS", "10000"))
+    PATH_BATCH_MAX_WORKERS = int(os.getenv("PATH_BATCH_MAX_WORKERS", "4"))
+
+    # Landmarks ALT (/api/path/estimate y A* con ?heuristic=alt): cantidad de
+    # landmarks; las tablas (2×L×n float32) quedan en el snapshot
+    ALT_LANDMARKS = int(os.getenv("ALT_LANDMARKS", "16"))
+
+    # Floyd-Warshall (/api/path/floyd): máximo de nodos del subgrafo y cache
+    # de matrices ya calculadas (además quedan en el snapshot)
+    FLOYD_MAX_NODES = int(os.getenv("FLOYD_MAX_NODES", "2000"))
+    # Los bbox (sin cache) se calculan en cada request: tope mucho menor
+    # (~300 nodos conectados son ~60 ms; 1400 son varios segundos)
+    FLOYD_BBOX_MAX_NODES = int(os.getenv("FLOYD_BBOX_MAX_NODES", "300"))
+    FLOYD_CACHE_MAX_ENTRIES = int(os.getenv("FLOYD_CACHE_MAX_ENTRIES", "16"))
+    FLOYD_CACHE_MAX_MB = int(os.getenv("FLOYD_CACHE_MAX_MB", "256"))
@@ -0,0 +1,143 @@
+"""
+Los motores sobre CSR contra las implementaciones de siempre con dicts,
+sobre un grafo fijo (semilla constante).
+
+Correr desde la raíz del repo: python -m pytest -q (conftest.py agrega la
+raíz a sys.path).
+"""
+import math
+import random
+
+import pytest
+
+from algorithms.astar import astar
+from algorithms.bellman_ford import BELLMAN_FORD_MODES, bellman_ford
+from algorithms.bidirectional_dijkstra import bidirectional_dijkstra
+from algorithms.contraction_hierarchy import ContractionHierarchy
+from algorithms.dijkstra import _dijkstra_csr, dijkstra
+from algorithms.kruskal import _kruskal_csr, kruskal
+from algorithms.prim import prim
+from algorithms.sp_tree import ShortestPathTree
+from graph.csr_graph import CSRGraph
+
+NUM_NODES = 40
+SEED = 7
+
+
+def _fixed_graph() -> dict:
+    """
+    Grafo simétrico {id: [(vecino, peso), ...]}: un camino que conecta a
+    todos más aristas al azar. Los pesos son floats al azar, así que no hay
+    empates y la ruta mínima es única. "AISLADO" no tiene aristas.
+    """
+    rng = random.Random(SEED)
+    ids = [f"N{i:02d}" for i in range(NUM_NODES)]
+    weights = {}
+    for a, b in zip(ids, ids[1:]):
+        weights[(a, b)] = rng.uniform(1.0, 10.0)
+    while len(weights) < 3 * NUM_NODES:
+        a, b = rng.sample(ids, 2)
+        if (a, b) not in weights and (b, a) not in weights:
+            weights[(a, b)] = rng.uniform(1.0, 10.0)
+
+    graph = {node_id: [] for node_id in ids}
+    for (a, b), w in weights.items():
+        graph[a].append((b, w))
+        graph[b].append((a, w))
+    graph["AISLADO"] = []
+    return graph
+
+
+@pytest.fixture(scope="module")
+def graph() -> dict:
+    return _fixed_graph()
+
+
+@pytest.fixture(scope="module")
+def csr(graph) -> CSRGraph:
+    return CSRGraph.from_dict(graph)
+
+
+PAIRS = [("N00", "N39"), ("N05", "N22"), ("N31", "N02"), ("N17", "N17")]
+
+
+def test_from_dict_round_trip(graph, csr):
+    assert csr.num_nodes == len(graph)
+    assert csr.num_edges == sum(len(v) for v in graph.values())
+    assert csr.to_dict() == graph
+    for node_id, neighbors in graph.items():
+        assert csr[node_id] == neighbors
+
+
+@pytest.mark.parametrize("start,end", PAIRS)
+def test_dijkstra_csr_matches_dict(graph, csr, start, end):
+    expected_dist, expected_route = dijkstra(graph, start, end)
+    dist, route = _dijkstra_csr(csr, start, end)
+    assert dist == pytest.approx(expected_dist)
+    assert route == expected_route
+
+
+@pytest.mark.parametrize("start,end", PAIRS)
+def test_path_engines_match_dict_dijkstra(graph, csr, start, end):
+    expected_dist, expected_route = dijkstra(graph, start, end)
+
+    results = {
+        "bidirectional": bidirectional_dijkstra(csr, start, end),
+        "astar": astar(csr, start, end)[:2],
+    }
+    for mode in BELLMAN_FORD_MODES:
+        results[f"bellman_ford/{mode}"] = bellman_ford(csr, start, end, mode=mode)
+
+    for name, (dist, route) in results.items():
+        assert dist == pytest.approx(expected_dist), name
+        assert route == expected_route, name
+
+
+def test_unreachable_node(graph, csr):
+    expected_dist, _ = dijkstra(graph, "N00", "AISLADO")
+    dist, route = _dijkstra_csr(csr, "N00", "AISLADO")
+    assert math.isinf(expected_dist) and math.isinf(dist)
+    assert route == ["AISLADO"]
+    assert math.isinf(bidirectional_dijkstra(csr, "N00", "AISLADO")[0])
+
+
+def test_sp_tree_matches_dict_dijkstra(graph, csr):
+    source = csr.ids.index_of("N00")
+    tree = ShortestPathTree(csr, source)
+    # Primero un destino cercano y después el resto: el árbol retoma la
+    # frontera y tiene que dar lo mismo que un Dijkstra desde cero
+    for node_id in ["N01", *graph]:
+        if node_id == "AISLADO":
+            continue
+        target = csr.ids.index_of(node_id)
+        tree.ensure(target)
+        expected_dist, expected_route = dijkstra(graph, "N00", node_id)
+        assert tree.dist[target] == pytest.approx(expected_dist)
+        assert [csr.ids.id_of(i) for i in tree.path(target)] == expected_route
+
+
+def test_contraction_hierarchy_matches_dict_dijkstra(graph, csr):
+    ch = ContractionHierarchy.build(csr)
+    for start, end in PAIRS:
+        expected_dist, expected_route = dijkstra(graph, start, end)
+        dist, route = ch.query(start, end)
+        assert dist == pytest.approx(expected_dist)
+        assert route == expected_route
+
+
+def test_kruskal_csr_matches_dict(graph, csr):
+    expected_mst, expected_cost = kruskal(graph)
+    mst, cost = _kruskal_csr(csr)
+    assert cost == pytest.approx(expected_cost)
+    # Pesos sin empates: el árbol es único (salvo el sentido de cada arista)
+    assert {frozenset((u, v)) for u, v, _w in mst} == {
+        frozenset((u, v)) for u, v, _w in expected_mst
+    }
+    # Bosque: una arista menos que nodos por componente (AISLADO va aparte)
+    assert len(mst) == csr.num_nodes - 2
+
+
+def test_kruskal_csr_matches_dict_prim(graph, csr):
+    _mst, expected_cost = prim(graph, "N00")
+    _mst, cost = _kruskal_csr(csr)
+    assert cost == pytest.approx(expected_cost)
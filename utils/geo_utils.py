@@ -1,12 +1,13 @@
 # utils/geo_utils.py - VERSIÓN ORIGINAL (sin ORS)
 from typing import List
 import pandas as pd
-from haversine import haversine
+
+from graph.graph_utils import haversine, haversine_one_to_many
 
 
 def distancia_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     """Devuelve distancia en km entre dos coordenadas."""
-    return haversine((lat1, lon1), (lat2, lon2))
+    return haversine(lat1, lon1, lat2, lon2)
 
 
 def hospitales_cercanos(paciente_row: pd.Series, hospitales_df: pd.DataFrame, top_k: int = 5) -> pd.DataFrame:
@@ -15,8 +16,10 @@ def hospitales_cercanos(paciente_row: pd.Series, hospitales_df: pd.DataFrame, to
     """
     lat_p, lon_p = float(paciente_row["Latitud"]), float(paciente_row["Longitud"])
     hosp = hospitales_df.copy()
-    hosp["dist_km"] = hosp.apply(
-        lambda r: distancia_km(lat_p, lon_p, float(r["Latitud"]), float(r["Longitud"])),
-        axis=1,
+    hosp["dist_km"] = haversine_one_to_many(
+        lat_p,
+        lon_p,
+        hosp["Latitud"].astype(float).to_numpy(),
+        hosp["Longitud"].astype(float).to_numpy(),
     )
-    return hosp.sort_values("dist_km").reset_index(drop=True).head(top_k)
\ No newline at end of file
+    return hosp.sort_values("dist_km").reset_index(drop=True).head(top_k)
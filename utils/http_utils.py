@@ -0,0 +1,178 @@
+# utils/http_utils.py
+import gzip
+import hashlib
+import math
+from itertools import islice
+
+from flask import Response, current_app, request, stream_with_context
+
+try:
+    # Opcional: si está instalado, también se guarda la variante brotli
+    import brotli
+except ImportError:
+    brotli = None
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+# Formatos de streaming (?stream=json | ?stream=ndjson)
+STREAM_FORMATS = ("json", "ndjson")
+# Registros serializados por chunk enviado
+STREAM_CHUNK_RECORDS = 1000
+
+
+class EncodedPayload:
+    """
+    Respuesta JSON ya serializada (bytes), con sus variantes comprimidas
+    (gzip y, si está disponible, brotli) y un ETag calculado sobre el JSON.
+
+    Se arma una sola vez al guardar en cache; cada hit solo elige la
+    variante según Accept-Encoding y devuelve los bytes tal cual.
+    """
+
+    def __init__(self, body: bytes, mimetype: str = "application/json"):
+        self.mimetype = mimetype
+        self.variants = {"identity": body, "gzip": gzip.compress(body, compresslevel=GZIP_LEVEL)}
+        if brotli is not None:
+            self.variants["br"] = brotli.compress(body, quality=BROTLI_QUALITY)
+        self.etag = hashlib.sha1(body).hexdigest()
+
+    @classmethod
+    def from_object(cls, obj) -> "EncodedPayload":
+        """Serializa exactamente igual que jsonify."""
+        return cls(current_app.json.response(obj).get_data())
+
+    @property
+    def nbytes(self) -> int:
+        return sum(len(v) for v in self.variants.values())
+
+    def _choose_encoding(self) -> str:
+        accepted = request.accept_encodings
+        for encoding in ("br", "gzip"):
+            if encoding in self.variants and accepted[encoding] > 0:
+                return encoding
+        return "identity"
+
+    def to_response(self) -> Response:
+        """
+        Response para la request actual: variante comprimida según
+        Accept-Encoding, ETag, y 304 si coincide If-None-Match.
+        """
+        encoding = self._choose_encoding()
+        response = Response(self.variants[encoding], mimetype=self.mimetype)
+        if encoding != "identity":
+            response.headers["Content-Encoding"] = encoding
+        response.vary.add("Accept-Encoding")
+        # Débil: el mismo JSON viaja con distintas codificaciones
+        response.set_etag(self.etag, weak=True)
+        return response.make_conditional(request)
+
+
+# -----------------------------
+# Respuestas en streaming
+# -----------------------------
+def _finite(obj):
+    """Copia de obj con los floats no finitos (inf, nan) cambiados por None."""
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {k: _finite(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_finite(v) for v in obj]
+    return obj
+
+
+def _dumps(obj) -> str:
+    """
+    Igual que jsonify (claves ordenadas, mismos tipos extra), compacto, y
+    con inf/nan como null: "Infinity" no es JSON válido para los clientes.
+    """
+    dumps = current_app.json.dumps
+    try:
+        return dumps(obj, separators=(",", ":"), allow_nan=False)
+    except ValueError:
+        return dumps(_finite(obj), separators=(",", ":"), allow_nan=False)
+
+
+def _chunks(records, size: int = STREAM_CHUNK_RECORDS):
+    records = iter(records)
+    while batch := list(islice(records, size)):
+        yield batch
+
+
+def _stream_json(header: dict, sections):
+    """
+    Un solo objeto JSON con los campos de `header` y cada sección como
+    lista, serializada de a STREAM_CHUNK_RECORDS registros. Las claves van
+    ordenadas, como en jsonify, así que el documento es el mismo que sin
+    streaming.
+    """
+    fields = [(k, v, None) for k, v in header.items()]
+    fields += [(name, None, records) for name, _kind, records in sections]
+    fields.sort(key=lambda field: field[0])
+
+    yield "{"
+    for i, (name, value, records) in enumerate(fields):
+        prefix = ("," if i else "") + _dumps(name) + ":"
+        if records is None:
+            yield prefix + _dumps(value)
+            continue
+        yield prefix + "["
+        first = True
+        for batch in _chunks(records):
+            yield ("" if first else ",") + ",".join(_dumps(r) for r in batch)
+            first = False
+        yield "]"
+    yield "}\n"
+
+
+def _stream_ndjson(header: dict, sections):
+    """
+    Un objeto JSON por línea: primero {"kind": "meta", ...header} y luego
+    un registro por línea con su "kind" (p.ej. "node", "edge").
+    """
+    yield _dumps({"kind": "meta", **header}) + "\n"
+    for _name, kind, records in sections:
+        for batch in _chunks(records):
+            yield "".join(_dumps({"kind": kind, **r}) + "\n" for r in batch)
+
+
+def stream_response(header: dict, sections, fmt: str) -> Response:
+    """
+    Respuesta en streaming (chunked) sin armar la lista completa en memoria.
+
+    header: campos escalares de la respuesta (totales, tiempos, ...).
+    sections: lista de (nombre, kind, iterable de dicts); los iterables se
+    consumen recién al enviar, así que pueden ser generadores (p.ej. una
+    query con yield_per).
+    fmt: "json" (mismo formato que la versión sin streaming) o "ndjson".
+    """
+    if fmt == "ndjson":
+        chunks, mimetype = _stream_ndjson(header, sections), "application/x-ndjson"
+    else:
+        chunks, mimetype = _stream_json(header, sections), "application/json"
+    return Response(stream_with_context(chunks), mimetype=mimetype)
+
+
+def requested_stream_format():
+    """
+    Lee ?stream= de la request. Devuelve None (sin streaming), "json" o
+    "ndjson"; ValueError si el valor no es válido.
+    """
+    fmt = request.args.get("stream", None, type=str)
+    if not fmt:
+        return None
+    if fmt not in STREAM_FORMATS:
+        raise ValueError(f"stream inválido: {fmt} (usar {' o '.join(STREAM_FORMATS)})")
+    return fmt
+
+
+def parse_bbox(value: str | None) -> tuple[float, float, float, float]:
+    """bbox=min_lon,min_lat,max_lon,max_lat -> tupla de floats (ValueError si es inválido)."""
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(v) for v in (value or "").split(","))
+    except ValueError:
+        raise ValueError("bbox inválido: usar min_lon,min_lat,max_lon,max_lat")
+    if min_lon > max_lon or min_lat > max_lat:
+        raise ValueError("bbox inválido: el mínimo debe ser menor que el máximo")
+    return min_lon, min_lat, max_lon, max_lat